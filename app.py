@@ -14,6 +14,7 @@ import numpy as np
 
 # --- Step 1: Initialize Extensions (but don't configure them yet) ---
 from models import db, AccountPrediction
+from extensions import cache
 from flask_migrate import Migrate
 from dotenv import load_dotenv
 from pipeline import recalculate_predictions_and_metrics, safe_float
@@ -53,6 +54,7 @@ def create_app():
     # From this point on, 'db' is LIVE and correctly configured.
     db.init_app(app)
     migrate.init_app(app, db)
+    cache.init_app(app)
 
     # --- Step 4: Import and Register Blueprints ---
     # Because we do this *after* db.init_app(), they get the live, working db object.
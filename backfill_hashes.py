@@ -1,16 +1,19 @@
 # backfill_hashes.py
-import hashlib
 import pandas as pd
 from sqlalchemy import create_engine, text
 from app import create_app
+from pipeline import get_transaction_hash_constructor
 import time
 
+# Same algorithm (TRANSACTION_HASH_ALGO) as the webhook and reprocess_history.py
+hash_constructor = get_transaction_hash_constructor()
+
 def generate_hash(row):
     # Use .get() with default values to handle potential None/NaN in source data
     unique_string = (f"{row.get('canonical_code', '')}|{row.get('posting_date', '')}|"
                      f"{row.get('item_code', '')}|{row.get('revenue', '')}|{row.get('quantity', '')}|"
                      f"{row.get('duplicate_rank', '')}")
-    return hashlib.sha256(unique_string.encode()).hexdigest()
+    return hash_constructor(unique_string.encode()).hexdigest()
 
 def run_backfill():
     app = create_app()
@@ -96,6 +96,15 @@ if not SQLALCHEMY_DATABASE_URI:
     raise ValueError("FATAL: SQLALCHEMY_DATABASE_URI environment variable is not set.")
 
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# SQLAlchemy caches compiled SQL per statement shape (filter values are bound parameters, so they
+# do not add entries). The API builds many shapes (optional distributor / rep / year filters per
+# endpoint), so the LRU is sized above the default 500 to keep them all compiled.
+try:
+    SQLALCHEMY_QUERY_CACHE_SIZE = int(os.environ.get('SQLALCHEMY_QUERY_CACHE_SIZE', 1200))
+except ValueError:
+    logger.warning("Invalid SQLALCHEMY_QUERY_CACHE_SIZE env var, using default 1200.")
+    SQLALCHEMY_QUERY_CACHE_SIZE = 1200
+SQLALCHEMY_ENGINE_OPTIONS = {'query_cache_size': SQLALCHEMY_QUERY_CACHE_SIZE}
 # --- Email Configuration (SMTP) ---
 # Use environment variables first, fall back to Mailtrap for local dev
 SMTP_SERVER = os.environ.get('SMTP_SERVER', "sandbox.smtp.mailtrap.io")
@@ -118,6 +127,30 @@ if not HMAC_SECRET_KEY:
     else:
         logger.info("DEBUG INFO: HMAC_SECRET_KEY environment variable is not set (webhook auth may fail).")
 
+# --- Response Cache (Flask-Caching) ---
+# /api/sales-reps and /api/sales-manager/overview are cached for CACHE_DEFAULT_TIMEOUT seconds and cleared
+# when the webhook recalculates predictions. The /api/sales-manager historical views (/years,
+# /top_accounts_by_rep, /sales_rep_performance) are cached per query string with their own timeouts and
+# invalidated by the webhook as well; append ?_nocache=1 to bypass the cache. The same version stamp
+# also drives their ETags, so repeat requests from a browser get 304 Not Modified. SimpleCache is per
+# worker process: the webhook's clear only reaches the worker that received the upload, and the others
+# serve their copies until they expire. Set CACHE_REDIS_URL in production to share the cache (and its
+# invalidation) across gunicorn workers.
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'RedisCache' if CACHE_REDIS_URL else 'SimpleCache')
+try:
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 300))
+except ValueError:
+    logger.warning("Invalid CACHE_DEFAULT_TIMEOUT env var, using default 300.")
+    CACHE_DEFAULT_TIMEOUT = 300
+
+# --- Transaction Dedup Hash ---
+# 'sha256' (default), 'blake2b_128' (stdlib) or 'xxh3_128' (needs the xxhash package). transaction_hash
+# only dedups correctly when the webhook, reprocess_history.py and backfill_hashes.py all use the same
+# algorithm, so after changing this re-run reprocess_history.py (or clear transaction_hash and run
+# backfill_hashes.py) before the next upload.
+TRANSACTION_HASH_ALGO = os.environ.get('TRANSACTION_HASH_ALGO', 'sha256').strip().lower()
+
 # --- File Uploads ---
 DEFAULT_UPLOAD_FOLDER = os.path.join(BASE_DIR, 'data', 'uploads')
 UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', DEFAULT_UPLOAD_FOLDER)
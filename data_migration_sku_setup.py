@@ -108,8 +108,12 @@ def migrate_historical_skus_command(clear_prediction_products, batch_size_ahr):
             
             new_yearly_products_json = safe_json_dumps_for_historical(list(yearly_skus_set))
 
-            if str(ahr_record.yearly_products_json) != str(new_yearly_products_json): # Compare as strings to handle None vs "null" etc.
-                ahr_record.yearly_products_json = new_yearly_products_json
+            new_yearly_products = json.loads(new_yearly_products_json) if new_yearly_products_json else None
+
+            if (str(ahr_record.yearly_products_json) != str(new_yearly_products_json) # Compare as strings to handle None vs "null" etc.
+                    or ahr_record.yearly_products_parsed != new_yearly_products):
+                # set_yearly_products keeps yearly_products_parsed (read by the history endpoint) in step with the text
+                ahr_record.set_yearly_products(new_yearly_products)
                 updated_ahr_count += 1
             
             if (i + 1) % batch_size_ahr == 0 or (i + 1) == total_ahr_to_process:
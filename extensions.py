@@ -0,0 +1,106 @@
+# extensions.py
+"""
+Flask extensions that both the app factory (app.py) and the blueprints import.
+db still lives in models.py; this holds the response cache.
+"""
+import hashlib
+import logging
+import time
+from urllib.parse import urlencode
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+# Flask-Caching is optional: without it the cached views simply run on every request.
+try:
+    from flask_caching import Cache
+    FLASK_CACHING_AVAILABLE = True
+except ImportError:
+    Cache = None
+    FLASK_CACHING_AVAILABLE = False
+
+
+class _NullCache:
+    """Stand-in for flask_caching.Cache when it is not installed: no caching, deletes are no-ops."""
+    def init_app(self, app, config=None):
+        logger.info("Flask-Caching not installed; API responses will not be cached.")
+
+    def cached(self, *args, **kwargs):
+        def decorator(f):
+            return f
+        return decorator
+
+    def get(self, *args, **kwargs):
+        return None
+
+    def set(self, *args, **kwargs):
+        return True
+
+    def delete(self, *args, **kwargs):
+        return True
+
+
+cache = Cache() if FLASK_CACHING_AVAILABLE else _NullCache()
+
+# Keys of the cached dashboard views (plain key_prefix strings, so they can be deleted by name)
+SALES_REPS_CACHE_KEY = 'sales_reps'
+SALES_MANAGER_OVERVIEW_CACHE_KEY = 'sales_manager_overview'
+# The historical views are keyed by path + query args, so they cannot be deleted by name; instead
+# their keys (and their ETags) embed this namespace version, and clear_historical_cache() bumps it.
+# The version itself expires after HISTORICAL_CACHE_VERSION_TIMEOUT seconds and restarts from the clock,
+# which bounds staleness for changes that cannot bump it (reprocess_history.py runs outside the app).
+HISTORICAL_CACHE_VERSION_KEY = 'historical_cache_version'
+HISTORICAL_CACHE_VERSION_TIMEOUT = 3600
+
+
+def is_cacheable_response(rv):
+    """response_filter for cache.cached(): error paths return (response, status) tuples and are not cached."""
+    return not isinstance(rv, tuple)
+
+
+def historical_data_version():
+    """Current namespace version of the historical views; starts from the clock (ms) when unset or expired."""
+    version = cache.get(HISTORICAL_CACHE_VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        cache.set(HISTORICAL_CACHE_VERSION_KEY, version, timeout=HISTORICAL_CACHE_VERSION_TIMEOUT)
+    return version
+
+
+def historical_cache_key(*args, **kwargs):
+    """make_cache_key for the historical views: namespace version + path + sorted query args (minus _nocache)."""
+    version = historical_data_version()
+    query = urlencode(sorted((k, v) for k, v in request.args.items(multi=True) if k != '_nocache'))
+    return f"historical:{version}:{request.path}?{query}"
+
+
+def skip_cache():
+    """unless= for cache.cached(): ?_nocache=1 bypasses the cache (no read, no write), for debugging."""
+    return bool(request.args.get('_nocache'))
+
+
+def historical_etag():
+    """
+    ETag for a cached historical view: hash of its cache key, so it changes whenever the namespace version does.
+    None without Flask-Caching, since nothing would ever invalidate it.
+    """
+    if not FLASK_CACHING_AVAILABLE:
+        return None
+    return hashlib.sha1(historical_cache_key().encode('utf-8')).hexdigest()
+
+
+def clear_historical_cache():
+    """Invalidates every cached historical view (and its ETag) by bumping the namespace version. Needs an app context."""
+    try:
+        cache.set(HISTORICAL_CACHE_VERSION_KEY, historical_data_version() + 1, timeout=HISTORICAL_CACHE_VERSION_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Could not clear historical cache: {e}")
+
+
+def clear_dashboard_cache():
+    """Drops the cached rep list / manager overview after predictions change. Needs an app context."""
+    try:
+        cache.delete(SALES_REPS_CACHE_KEY)
+        cache.delete(SALES_MANAGER_OVERVIEW_CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"Could not clear dashboard cache: {e}")
@@ -0,0 +1,27 @@
+"""Add (item_code, posting_date) index on transactions
+
+Revision ID: a1d3f5b7c9e2
+Revises: f2c6a8e4b0d5
+Create Date: 2026-10-17 13:40:52.218604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d3f5b7c9e2'
+down_revision = 'f2c6a8e4b0d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # transactions is the largest table: build CONCURRENTLY on PostgreSQL so loads are not blocked
+    with op.get_context().autocommit_block():
+        op.create_index('idx_transaction_item_date', 'transactions', ['item_code', 'posting_date'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('idx_transaction_item_date', table_name='transactions')
@@ -0,0 +1,30 @@
+"""Add rep name / account total index for top-account lists
+
+Revision ID: b7e4c2a9d1f3
+Revises: 621458da5a3b
+Create Date: 2026-10-17 10:12:41.208315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4c2a9d1f3'
+down_revision = '621458da5a3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite rejects NULLS FIRST/LAST in index definitions; the index only matters on PostgreSQL
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.create_index('idx_prediction_rep_name_total', 'account_predictions',
+                    ['sales_rep_name', sa.text('account_total DESC NULLS LAST')], unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('idx_prediction_rep_name_total', table_name='account_predictions')
@@ -0,0 +1,34 @@
+"""Add (canonical_code, year, month, item_code) expression index on transactions
+
+Revision ID: b8e2d4f6a0c3
+Revises: a1d3f5b7c9e2
+Create Date: 2026-10-17 15:06:31.482917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2d4f6a0c3'
+down_revision = 'a1d3f5b7c9e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # PostgreSQL only (INCLUDE); the expression must read exactly like the queries' extract('month', posting_date)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # transactions is the largest table: build CONCURRENTLY so loads are not blocked
+    with op.get_context().autocommit_block():
+        op.create_index('idx_transaction_canon_year_month_item', 'transactions',
+                        ['canonical_code', 'year', sa.text('EXTRACT(month FROM posting_date)'), 'item_code'],
+                        unique=False, postgresql_include=['quantity', 'revenue', 'posting_date'],
+                        postgresql_concurrently=True)
+        op.execute('ANALYZE transactions')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('idx_transaction_canon_year_month_item', table_name='transactions')
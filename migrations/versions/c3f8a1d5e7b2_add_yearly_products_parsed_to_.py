@@ -0,0 +1,50 @@
+"""Add yearly_products_parsed to AccountHistoricalRevenue
+
+Revision ID: c3f8a1d5e7b2
+Revises: b7e4c2a9d1f3
+Create Date: 2026-10-17 11:04:27.530918
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a1d5e7b2'
+down_revision = 'b7e4c2a9d1f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('account_historical_revenues',
+                  sa.Column('yearly_products_parsed', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=True))
+    # One-time backfill from the existing JSON text, decoded row by row in Python: a SQL ::jsonb cast
+    # aborts the whole upgrade on a single '' or NaN. Rows whose text is not a list of strings stay
+    # NULL; the history endpoint decodes those from yearly_products_json as before.
+    historical = sa.table('account_historical_revenues',
+                          sa.column('id', sa.Integer),
+                          sa.column('yearly_products_json', sa.Text),
+                          sa.column('yearly_products_parsed', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql')))
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(historical.c.id, historical.c.yearly_products_json)
+                        .where(historical.c.yearly_products_json.isnot(None))).all()
+    updates = []
+    for row_id, raw in rows:
+        try:
+            products = json.loads(raw)
+        except (TypeError, ValueError):
+            continue
+        if isinstance(products, list) and all(isinstance(p, str) for p in products):
+            updates.append({'row_id': row_id, 'parsed': products})
+    if updates:
+        bind.execute(historical.update()
+                     .where(historical.c.id == sa.bindparam('row_id'))
+                     .values(yearly_products_parsed=sa.bindparam('parsed')), updates)
+
+
+def downgrade():
+    op.drop_column('account_historical_revenues', 'yearly_products_parsed')
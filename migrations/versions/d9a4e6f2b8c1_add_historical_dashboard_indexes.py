@@ -0,0 +1,37 @@
+"""Add year-leading indexes on account_historical_revenues for the dashboard queries
+
+Revision ID: d9a4e6f2b8c1
+Revises: c3f8a1d5e7b2
+Create Date: 2026-10-17 11:52:09.114237
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a4e6f2b8c1'
+down_revision = 'c3f8a1d5e7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+    # CONCURRENTLY (PostgreSQL) keeps the table writable while the indexes build; it cannot run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('idx_hist_year_canon', 'account_historical_revenues', ['year', 'canonical_code'],
+                        unique=False, postgresql_include=['total_revenue', 'transaction_count', 'sales_rep'],
+                        postgresql_concurrently=True)
+        # SQLite rejects NULLS FIRST/LAST in index definitions, so this one is PostgreSQL only
+        if is_postgres:
+            op.create_index('idx_hist_year_rep_revenue', 'account_historical_revenues',
+                            ['year', sa.text('sales_rep ASC NULLS FIRST'), sa.text('total_revenue DESC NULLS LAST')],
+                            unique=False, postgresql_concurrently=True)
+            op.execute('ANALYZE account_historical_revenues')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('idx_hist_year_rep_revenue', table_name='account_historical_revenues')
+    op.drop_index('idx_hist_year_canon', table_name='account_historical_revenues')
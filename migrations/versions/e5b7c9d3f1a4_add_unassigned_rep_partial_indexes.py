@@ -0,0 +1,33 @@
+"""Add partial indexes for the unassigned sales rep filter
+
+Revision ID: e5b7c9d3f1a4
+Revises: d9a4e6f2b8c1
+Create Date: 2026-10-17 12:31:45.672810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7c9d3f1a4'
+down_revision = 'd9a4e6f2b8c1'
+branch_labels = None
+depends_on = None
+
+UNASSIGNED_REP_SQL = sa.text("sales_rep IS NULL OR sales_rep = ''")
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('idx_hist_unassigned_year', 'account_historical_revenues', ['year', 'canonical_code'],
+                        unique=False, postgresql_where=UNASSIGNED_REP_SQL, sqlite_where=UNASSIGNED_REP_SQL,
+                        postgresql_concurrently=True)
+        op.create_index('idx_prediction_unassigned', 'account_predictions', ['canonical_code'],
+                        unique=False, postgresql_where=UNASSIGNED_REP_SQL, sqlite_where=UNASSIGNED_REP_SQL,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('idx_prediction_unassigned', table_name='account_predictions')
+    op.drop_index('idx_hist_unassigned_year', table_name='account_historical_revenues')
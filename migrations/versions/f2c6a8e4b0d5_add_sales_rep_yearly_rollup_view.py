@@ -0,0 +1,46 @@
+"""Add sales_rep_yearly_rollup materialized view (PostgreSQL)
+
+Revision ID: f2c6a8e4b0d5
+Revises: e5b7c9d3f1a4
+Create Date: 2026-10-17 12:58:13.406129
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c6a8e4b0d5'
+down_revision = 'e5b7c9d3f1a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Materialized views are PostgreSQL only; elsewhere /sales_rep_performance aggregates the base tables
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("""
+        CREATE MATERIALIZED VIEW sales_rep_yearly_rollup AS
+        SELECT h.year,
+               h.sales_rep,
+               p.sales_rep_name,
+               p.distributor,
+               (p.canonical_code IS NOT NULL) AS has_prediction,
+               SUM(h.total_revenue) AS total_revenue,
+               COUNT(DISTINCT h.canonical_code) AS account_count,
+               SUM(p.health_score) AS health_score_sum,
+               COUNT(p.health_score) AS health_score_count
+        FROM account_historical_revenues h
+        LEFT JOIN account_predictions p ON p.canonical_code = h.canonical_code
+        GROUP BY h.year, h.sales_rep, p.sales_rep_name, p.distributor, (p.canonical_code IS NOT NULL)
+    """)
+    # REFRESH ... CONCURRENTLY needs a unique index over plain columns
+    op.execute("CREATE UNIQUE INDEX uix_sales_rep_yearly_rollup ON sales_rep_yearly_rollup "
+               "(year, sales_rep, sales_rep_name, distributor, has_prediction)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS sales_rep_yearly_rollup")
@@ -1,11 +1,17 @@
 # models.py
 import json
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text, extract
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
 
+# Predicate of the partial indexes behind the API's "__UNASSIGNED__" sales rep filter. It has to read
+# exactly like the filter (or_(sales_rep == None, sales_rep == '')) for the planner to use them.
+UNASSIGNED_REP_SQL = text("sales_rep IS NULL OR sales_rep = ''")
+
 # --- Main Account Prediction Table ---
 class AccountPrediction(db.Model):
     __tablename__ = 'account_predictions'
@@ -140,6 +146,13 @@ class AccountPrediction(db.Model):
         # Add other indexes as needed, e.g., on dates or scores for dashboard filtering
         db.Index('idx_prediction_next_due', 'next_expected_purchase_date'),
         db.Index('idx_prediction_rep_due', 'sales_rep', 'next_expected_purchase_date'),
+        # Serves the per-rep "top accounts by revenue" lists (ORDER BY account_total DESC NULLS LAST LIMIT 20).
+        # PostgreSQL only: SQLite rejects NULLS FIRST/LAST in index definitions.
+        db.Index('idx_prediction_rep_name_total', sales_rep_name, account_total.desc().nullslast()).ddl_if(dialect='postgresql'),
+        # Partial index for the "__UNASSIGNED__" filter (sales_rep IS NULL OR sales_rep = ''): the planner matches
+        # the query's OR against the index predicate, so the filter is one index scan
+        db.Index('idx_prediction_unassigned', 'canonical_code',
+                 postgresql_where=UNASSIGNED_REP_SQL, sqlite_where=UNASSIGNED_REP_SQL),
     )
 
     def __repr__(self):
@@ -170,6 +183,8 @@ class AccountHistoricalRevenue(db.Model):
 
     # --- Products ---
     yearly_products_json = db.Column(db.Text, nullable=True)
+    # Same SKU list, stored already parsed (JSONB on PostgreSQL) so readers get a list back without json.loads
+    yearly_products_parsed = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'), nullable=True)
 
     # --- Table Arguments (Indexes & Constraints) ---
     __table_args__ = (
@@ -180,6 +195,16 @@ class AccountHistoricalRevenue(db.Model):
         db.Index('idx_hist_base_code_year', 'base_card_code', 'year'),
         db.Index('idx_hist_rep_year', 'sales_rep', 'year'), # Keep others if still relevant
         db.Index('idx_hist_distributor_year', 'distributor', 'year'),
+        # Year-filtered dashboard queries join on canonical_code and read revenue / count / rep: covering on PostgreSQL
+        db.Index('idx_hist_year_canon', 'year', 'canonical_code',
+                 postgresql_include=['total_revenue', 'transaction_count', 'sales_rep']),
+        # Top accounts per rep for a year, in the order the endpoint sorts them (no separate sort step).
+        # PostgreSQL only, like idx_prediction_rep_name_total.
+        db.Index('idx_hist_year_rep_revenue', year, sales_rep.asc().nullsfirst(),
+                 total_revenue.desc().nullslast()).ddl_if(dialect='postgresql'),
+        # Unassigned accounts of a year (same partial-index predicate as idx_prediction_unassigned)
+        db.Index('idx_hist_unassigned_year', 'year', 'canonical_code',
+                 postgresql_where=UNASSIGNED_REP_SQL, sqlite_where=UNASSIGNED_REP_SQL),
     )
 
     def __repr__(self):
@@ -193,10 +218,13 @@ class AccountHistoricalRevenue(db.Model):
         except json.JSONDecodeError: return []
 
     def set_yearly_products(self, product_sku_list):
-        if not product_sku_list: self.yearly_products_json = None
+        if not product_sku_list:
+            self.yearly_products_json = None
+            self.yearly_products_parsed = None
         else:
             unique_sorted_products = sorted(list(set(product_sku_list)))
             self.yearly_products_json = json.dumps(unique_sorted_products)
+            self.yearly_products_parsed = unique_sorted_products
 
 # --- Snapshot Table ---
 class AccountSnapshot(db.Model):
@@ -319,10 +347,33 @@ class Transaction(db.Model):
         db.Index('idx_transaction_canon_date', 'canonical_code', 'posting_date'),
         db.Index('idx_transaction_canon_year', 'canonical_code', 'year'),
         db.Index('idx_transaction_item_code', 'item_code'), # Index on new item_code
+        # Latest row per SKU (get_sku_description_map): MAX(posting_date) / DISTINCT ON read the end of each item_code range
+        db.Index('idx_transaction_item_date', 'item_code', 'posting_date'),
+        # Account details monthly aggregates group by (year, month, item_code) of one account: with the month
+        # expression in the key the rows come out of the index already grouped, and INCLUDE makes it index-only
+        db.Index('idx_transaction_canon_year_month_item', canonical_code, year, extract('month', posting_date), item_code,
+                 postgresql_include=['quantity', 'revenue', 'posting_date']).ddl_if(dialect='postgresql'),
 
         db.UniqueConstraint('transaction_hash', name='uix_transaction_hash'),
     )
 
     def __repr__(self):
         #return f"<Transaction id={self.id} canonical_code={self.canonical_code} date={self.posting_date} revenue={self.revenue}>"
-         return f"<Transaction id={self.id} canonical_code={self.canonical_code} item_code={self.item_code} date={self.posting_date} revenue={self.revenue}>"
\ No newline at end of file
+         return f"<Transaction id={self.id} canonical_code={self.canonical_code} item_code={self.item_code} date={self.posting_date} revenue={self.revenue}>"
+# --- Sales Rep Yearly Rollup (PostgreSQL materialized view) ---
+# Created by migration f2c6a8e4b0d5; not a model, so db.create_all() leaves it alone. One row per
+# (year, rep, rep name, distributor, has_prediction) with revenue / distinct account totals and the
+# health-score sum + count (so averages can be recombined across groups). Refreshed after every load.
+SALES_REP_ROLLUP_VIEW = 'sales_rep_yearly_rollup'
+
+
+def refresh_sales_rep_rollup(connection):
+    """
+    Refreshes the rollup on PostgreSQL (CONCURRENTLY, so /sales_rep_performance keeps reading the old rows
+    meanwhile); a no-op on other databases. connection is a SQLAlchemy Connection or Session.
+    """
+    dialect = connection.get_bind().dialect if hasattr(connection, 'get_bind') else connection.dialect
+    if dialect.name != 'postgresql':
+        return False
+    connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {SALES_REP_ROLLUP_VIEW}"))
+    return True
@@ -9,10 +9,18 @@ import os
 import logging
 import re
 import hashlib
+import functools
 from sqlalchemy.orm import Session as SQLAlchemySession
 from dateutil.relativedelta import relativedelta
 import sys
 
+# Optional: xxhash for the non-cryptographic transaction dedup hash (see TRANSACTION_HASH_ALGO)
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
 # Import SQLAlchemy functions needed
 from sqlalchemy import select, func, distinct, and_, desc, extract
 
@@ -47,6 +55,7 @@ try:
     GROWTH_PACE_INCREASE_PCT_THRESHOLD = getattr(config, 'GROWTH_PACE_INCREASE_PCT_THRESHOLD', 10)
     GROWTH_HEALTH_THRESHOLD = getattr(config, 'GROWTH_HEALTH_THRESHOLD', 60)
     GROWTH_MISSING_PRODUCTS_THRESHOLD = getattr(config, 'GROWTH_MISSING_PRODUCTS_THRESHOLD', 3)
+    TRANSACTION_HASH_ALGO = getattr(config, 'TRANSACTION_HASH_ALGO', 'sha256')
     
     # Load TOP_30 product sets
     TOP_30_SET = getattr(config, 'TOP_30_SET', set())
@@ -91,6 +100,7 @@ except ImportError as e:
     GROWTH_PACE_INCREASE_PCT_THRESHOLD = 10
     GROWTH_HEALTH_THRESHOLD = 60
     GROWTH_MISSING_PRODUCTS_THRESHOLD = 3
+    TRANSACTION_HASH_ALGO = 'sha256'
     TOP_30_SET = set()
     TOP_30_MATCH_SET = set()
     
@@ -264,9 +274,15 @@ def _normalize_upc(upc):
     """Normalize UPC to a string of pure digits, removing decimals, whitespace, and non-digits."""
     if pd.isna(upc) or upc is None:
         return ""
+    # Convert to string and handle float inputs
+    return _normalize_upc_str(str(upc))
+
+
+@functools.lru_cache(maxsize=None)
+def _normalize_upc_str(upc_str):
+    """Cached worker for _normalize_upc. UPC cardinality is tiny compared to row counts."""
+    upc = upc_str
     try:
-        # Convert to string and handle float inputs
-        upc_str = str(upc)
         # Remove decimal and anything after it (e.g., "710363579791.0" -> "710363579791")
         upc_str = upc_str.split('.')[0]
         # Remove non-digits (e.g., hyphens, spaces)
@@ -729,6 +745,42 @@ def safe_json_dumps(data):
         return None
     
 
+# --- Transaction dedup hash ---
+def get_transaction_hash_constructor(algo=None):
+    """
+    Returns the hash constructor used for transactions.transaction_hash; call it on the encoded
+    'code|date|item|revenue|qty|rank' key and take .hexdigest(). The hash is only a dedup key, so
+    'xxh3_128' or 'blake2b_128' (32 hex chars each) are faster options than the default 'sha256'.
+    Raises instead of falling back, since mixing algorithms silently breaks webhook dedup.
+    """
+    algo = (algo or TRANSACTION_HASH_ALGO or 'sha256').lower()
+    if algo == 'sha256':
+        return functools.partial(hashlib.sha256, usedforsecurity=False)
+    if algo == 'blake2b_128':
+        # stdlib, no extra dependency; unkeyed so every component produces the same digest
+        return functools.partial(hashlib.blake2b, digest_size=16, usedforsecurity=False)
+    if algo == 'xxh3_128':
+        if not XXHASH_AVAILABLE:
+            raise RuntimeError("TRANSACTION_HASH_ALGO is 'xxh3_128' but the xxhash package is not installed.")
+        return xxhash.xxh3_128
+    raise ValueError(f"Unsupported TRANSACTION_HASH_ALGO: {algo!r}")
+
+
+def duplicate_key_hashes(df, cols):
+    """
+    One uint64 per row of df[cols], for grouping equal dedup keys before ranking duplicates. Float
+    columns are hashed with -0.0 folded into 0.0: sort_values/groupby treat the two as the same key,
+    hash_pandas_object does not. Shared by the webhook and reprocess_history.py so their duplicate
+    ranks (and so the transaction hashes) agree.
+    """
+    key = df[cols]
+    float_cols = [col for col in cols if pd.api.types.is_float_dtype(key[col])]
+    if float_cols:
+        # IEEE: -0.0 + 0.0 == +0.0, every other value (NaN included) is unchanged
+        key = key.assign(**{col: key[col] + 0.0 for col in float_cols})
+    return pd.util.hash_pandas_object(key, index=False).to_numpy()
+
+
 # --- NEW: Yearly Revenue Trend Calculation Function ---
 def calculate_yearly_revenue_trend(yearly_history_list_of_dicts):
     """
@@ -1210,6 +1262,16 @@ def transform_days_overdue(days_overdue):
     return math.exp(-k * days_overdue)
 
 
+def transform_days_overdue_array(days_overdue):
+    """
+    Vectorized transform_days_overdue for a whole column (Series or array).
+    Returns a float numpy array: e^(-0.05 * x) where x > 0, else 0.
+    """
+    k = 0.05  # Keep in sync with transform_days_overdue
+    days = np.asarray(days_overdue, dtype=np.float64)
+    return np.where(days > 0, np.exp(-k * np.where(days > 0, days, 0.0)), 0.0)
+
+
 
 
 def calculate_rfm_scores(df):
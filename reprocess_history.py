@@ -7,7 +7,7 @@ re-aggregates metrics, calculates initial predictions, optionally truncates targ
 and populates the database with clean, canonical data including a detailed transaction log.
 
 Usage:
-    python reprocess_history.py <path_to_raw_data.csv> [--db-uri <database_connection_string>] [--chunksize <rows>] [--start-fresh]
+    python reprocess_history.py <path_to_raw_data.csv> [--db-uri <database_connection_string>] [--chunksize <rows>] [--start-fresh] [--cache-dir <dir>]
 
 Example:
     # Run locally, wiping tables first, using default config DB URI
@@ -15,6 +15,9 @@ Example:
 
     # Run locally, appending (if tables already exist), using specific DB URI
     python reprocess_history.py data/raw/Your_Consolidated_Historical_Data.csv --db-uri sqlite:///data/another_test.db
+
+    # Re-run after a failure, skipping CSV parsing/processing for files that have not changed
+    python reprocess_history.py data/raw/*.csv --start-fresh --cache-dir data/reprocess_cache
 """
 
 import argparse
@@ -23,15 +26,78 @@ import re
 import sys
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine, text, select, func, and_, MetaData, Table
+from sqlalchemy import create_engine, text, select, func, and_, MetaData, Table, Integer, JSON
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import IntegrityError, ProgrammingError
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import time
 import json
 import logging
 import hashlib
+import ssl
 import math 
+import functools
+import io
+import csv
+import shutil
+import tempfile
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from types import SimpleNamespace
+
+# Numba is optional: without it the interval kernel below runs as plain Python.
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+# DuckDB is optional: aggregate_historical falls back to a pandas groupby without it.
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    duckdb = None
+    DUCKDB_AVAILABLE = False
+
+# psycopg2's execute_values is used for bulk inserts into PostgreSQL; other targets (e.g. SQLite)
+# go through the SQLAlchemy insert path.
+try:
+    from psycopg2.extras import execute_values, Json
+    PSYCOPG2_AVAILABLE = True
+except ImportError:
+    execute_values = None
+    Json = None
+    PSYCOPG2_AVAILABLE = False
+
+# pyarrow is optional: when installed, raw files are read with its multithreaded streaming CSV reader,
+# processed chunks are spilled to Parquet until they are combined, and the wide prediction text columns
+# are stored as Arrow strings; otherwise plain pandas is used.
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pa_pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pa_csv = None
+    pa_pq = None
+    PYARROW_AVAILABLE = False
+
+# orjson is optional: the per-account JSON columns fall back to the stdlib json module.
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
 
 from pipeline import calculate_product_coverage_from_db, calculate_yoy_metrics_from_db
 from pipeline import calculate_yearly_revenue_trend
@@ -45,16 +111,14 @@ def _format_currency(value: float | None) -> str:
         value: Numeric value or None.
 
     Returns:
-        A string like "$1,234" or "$0" if None or zero.
+        A string like "$1,234" or "$0" if None, NaN or zero.
     """
-    if value is None:
+    # `value != value` is the cheap NaN check; callers only pass floats/None, so no try/except
+    if value is None or value != value:
         return "$0"
-    try:
-        # Use comma separator for thousands and no decimals
-        # Round to nearest integer for simplicity
-        return f"${value:,.0f}"
-    except Exception:
-        return str(value)
+    # Use comma separator for thousands and no decimals
+    # Round to nearest integer for simplicity
+    return f"${value:,.0f}"
 
 
 # --- Logging Setup ---
@@ -79,7 +143,7 @@ if project_root not in sys.path:
 
 try:
     # Import DB object and models directly for table reflection/metadata
-    from models import AccountPrediction, AccountHistoricalRevenue, AccountSnapshot, Transaction
+    from models import AccountPrediction, AccountHistoricalRevenue, AccountSnapshot, Transaction, refresh_sales_rep_rollup
     try:
         import config
         from config import TOP_30_SET, TOP_30_MATCH_SET, is_top_30_product
@@ -90,10 +154,11 @@ try:
         TOP_30_MATCH_SET = set()
         def is_top_30_product(upc): return False
     # Import necessary functions from pipeline
-    from pipeline import ( aggregate_item_codes, safe_json_dumps, transform_days_overdue,
+    from pipeline import ( aggregate_item_codes, safe_json_dumps, transform_days_overdue_array,
                            calculate_rfm_scores, calculate_health_score,
                            calculate_enhanced_priority_score, safe_float, safe_int, normalize_address, normalize_store_name, get_base_card_code,
-                                    _normalize_upc, calculate_yoy_metrics_from_db, calculate_product_coverage_from_db, calculate_yearly_revenue_trend )
+                                    _normalize_upc, calculate_yoy_metrics_from_db, calculate_product_coverage_from_db, calculate_yearly_revenue_trend,
+                                    get_transaction_hash_constructor, duplicate_key_hashes, TRANSACTION_HASH_ALGO )
     logger.info("Successfully imported models, config, and pipeline functions.")
 except ImportError as e:
     logger.error(f"Failed to import necessary modules (models, config, pipeline): {e}", exc_info=True)
@@ -104,7 +169,25 @@ except Exception as e_gen:
     sys.exit(1)
 
 # --- Constants ---
+# Immutable copy of the top-30 SKU set for the coverage / recommendation set operations
+TOP_30_FS = frozenset(TOP_30_SET)
 DEFAULT_CHUNK_SIZE = 50000
+# Parallel prediction calculation: worker cap, and the minimum number of accounts each worker should get
+PREDICTION_WORKERS = os.cpu_count() or 1
+# Raw chunks are processed in a pool; at most INGEST_MAX_PENDING chunks are held in flight
+INGEST_WORKERS = os.cpu_count() or 1
+INGEST_MAX_PENDING = 2 * INGEST_WORKERS
+# Raw chunks parsed ahead by the reader thread while earlier chunks are processed / collected
+INGEST_PREFETCH_CHUNKS = 2
+PARALLEL_MIN_ACCOUNTS_PER_WORKER = 2000
+# Transaction hashing is spread over a process pool (one shard per worker) above this many rows
+PARALLEL_HASH_MIN_ROWS = 500_000
+# Low-cardinality string columns stored as pandas categoricals (int codes + small dictionary)
+# Wide free-text / JSON prediction columns stored as Arrow strings when pyarrow is installed
+PREDICTION_STRING_COLS = ['name', 'full_address', 'sales_rep_name', 'distributor', 'growth_engine_message',
+                          'products_purchased', 'recommended_products_next_purchase_json',
+                          'carried_top_products_json', 'missing_top_products_json']
+CATEGORICAL_COLS = ['canonical_code', 'base_card_code', 'distributor', 'sales_rep', 'sales_rep_name', 'state', 'ship_to_code']
 
 # === Normalization & Key Generation Functions ===
 
@@ -142,12 +225,17 @@ def normalize_store_name(name):
 
 def normalize_address(row):
     """Normalize address components for better matching (Adapted from store_normalization.py)."""
+    # Extract components from row - MATCH YOUR RAW CSV COLUMN NAMES
+    return normalize_address_parts(row.get('ADDRESS', ''), row.get('CITY', ''), row.get('STATE', ''), row.get('ZIPCODE', ''))
+
+def normalize_address_parts(address, city, state, zipcode):
+    """Positional core of normalize_address; takes the raw ADDRESS, CITY, STATE, ZIPCODE values."""
+    raw_parts = (address, city, state, zipcode)
     try:
-        # Extract components from row - MATCH YOUR RAW CSV COLUMN NAMES
-        addr_str = str(row.get('ADDRESS', '') or '').strip()
-        city = str(row.get('CITY', '') or '').strip()
-        state = str(row.get('STATE', '') or '').strip()
-        zipcode = str(row.get('ZIPCODE', '') or '').strip()
+        addr_str = str(address or '').strip()
+        city = str(city or '').strip()
+        state = str(state or '').strip()
+        zipcode = str(zipcode or '').strip()
 
         # Combine components first if they exist
         address_parts = [part for part in [addr_str, city, state, zipcode] if part]
@@ -241,7 +329,7 @@ def normalize_address(row):
         return addr
 
     except Exception as e:
-        error_context = f"ADDRESS='{row.get('ADDRESS', '')}', CITY='{row.get('CITY', '')}', STATE='{row.get('STATE', '')}', ZIP='{row.get('ZIPCODE', '')}'"
+        error_context = "ADDRESS='{}', CITY='{}', STATE='{}', ZIP='{}'".format(*raw_parts)
         logger.warning(f"Error normalizing address components ({error_context}): {e}", exc_info=False)
         return "NORM_ERROR"
 
@@ -257,9 +345,17 @@ def generate_canonical_code(row):
     Expects row to contain pre-calculated 'base_card_code' and original
     'ShipTo', 'NAME', 'ADDRESS', 'CITY', 'STATE', 'ZIPCODE'.
     """
-    base_code = str(row.get('base_card_code', '')).strip() # <<< USE PRE-CALCULATED BASE CODE
     ship_to_col_name = 'ShipTo' if 'ShipTo' in row else 'SHIPTO' # Handle potential case diff
-    ship_to = str(row.get(ship_to_col_name, '') or '').strip()
+    return canonical_code_from_parts(
+        row.get('base_card_code', ''), # <<< USE PRE-CALCULATED BASE CODE
+        row.get(ship_to_col_name, ''), row.get('NAME', ''),
+        row.get('ADDRESS', ''), row.get('CITY', ''), row.get('STATE', ''), row.get('ZIPCODE', '')
+    )
+
+def canonical_code_from_parts(base_card_code, ship_to, name, address, city, state, zipcode):
+    """Positional core of generate_canonical_code (no per-field Series lookups)."""
+    base_code = str(base_card_code).strip()
+    ship_to = str(ship_to or '').strip()
 
     if not base_code:
         logger.warning("Cannot generate canonical code: Missing base_card_code in input row.")
@@ -274,13 +370,13 @@ def generate_canonical_code(row):
             logger.debug(f"ShipTo code '{ship_to}' empty after cleaning for base {base_code}. Falling back.")
 
     # --- Strategy 2: Fallback using Normalized Address ---
-    norm_address = normalize_address(row) # Assumes normalize_address takes the row
+    norm_address = normalize_address_parts(address, city, state, zipcode)
     if norm_address and norm_address not in ["NO_ADDRESS", "NORM_ERROR"]:
         address_hash = hashlib.sha1(norm_address.encode('utf-8')).hexdigest()[:12]
         return f"{base_code}_LOC_{address_hash}"
 
     # --- Strategy 3: Last resort fallback (Name Hash) ---
-    norm_name = normalize_store_name(str(row.get('NAME', '')).strip())
+    norm_name = normalize_store_name(str(name).strip())
     if norm_name:
         name_hash = hashlib.sha1(norm_name.encode('utf-8')).hexdigest()[:12]
         logger.warning(f"Using Name Hash fallback for {base_code} (Name: '{norm_name}'): NAME_{name_hash}")
@@ -290,12 +386,363 @@ def generate_canonical_code(row):
     return None
 
 
+def _hash_fallback_keys(chunk_df, mask, key_cols, normalize_func, invalid_values):
+    """
+    Runs normalize_func once per distinct key_cols combination among the masked rows and
+    returns a Series (aligned to chunk_df) of 12-char sha1 digests, or None where the
+    normalized value is empty/invalid. normalize_func receives the key_cols values positionally.
+    """
+    keys = chunk_df.loc[mask, key_cols]
+    if keys.empty:
+        return pd.Series(None, index=chunk_df.index, dtype=object)
+    uniq = keys.drop_duplicates().copy()
+    normalized = [normalize_func(*t) for t in uniq.itertuples(index=False, name=None)]
+    uniq['_digest'] = [
+        hashlib.sha1(v.encode('utf-8')).hexdigest()[:12] if v and v not in invalid_values else None
+        for v in normalized
+    ]
+    digests = keys.merge(uniq, on=key_cols, how='left')['_digest']
+    digests.index = keys.index
+    return digests.reindex(chunk_df.index)
+
+
+def generate_canonical_codes(chunk_df):
+    """
+    Column-wise equivalent of generate_canonical_code for a whole chunk.
+    Concatenation happens with Series.str.cat and the strategy is picked with np.select;
+    address/name normalization only runs on distinct values of the rows that need a fallback.
+    """
+    base = chunk_df['base_card_code'].fillna('').astype(str).str.strip()
+    ship_to_col_name = 'ShipTo' if 'ShipTo' in chunk_df.columns else 'SHIPTO'
+    if ship_to_col_name in chunk_df.columns:
+        ship_to = chunk_df[ship_to_col_name].fillna('').astype(str).str.strip()
+    else:
+        ship_to = pd.Series('', index=chunk_df.index)
+
+    # --- Strategy 1: Use ShipTo if valid ---
+    clean_ship_to = ship_to.str.replace(r'[^\w\-]+', '', regex=True).str.upper()
+    use_ship_to = (ship_to != '') & ~ship_to.str.lower().isin(['nan', 'none', 'null', '0']) & (clean_ship_to != '')
+    needs_fallback = (base != '') & ~use_ship_to
+
+    # --- Strategy 2: Fallback using Normalized Address ---
+    address_hash = _hash_fallback_keys(chunk_df, needs_fallback, ['ADDRESS', 'CITY', 'STATE', 'ZIPCODE'],
+                                       normalize_address_parts, {"NO_ADDRESS", "NORM_ERROR"})
+
+    # --- Strategy 3: Last resort fallback (Name Hash) ---
+    needs_name = needs_fallback & address_hash.isna()
+    name_hash = _hash_fallback_keys(chunk_df, needs_name, ['NAME'],
+                                    lambda name: normalize_store_name(str(name).strip()), {""})
+
+    canonical = np.select(
+        [base == '', use_ship_to, address_hash.notna(), name_hash.notna()],
+        [None,
+         base.str.cat(clean_ship_to, sep='_'),
+         base.str.cat(address_hash.fillna(''), sep='_LOC_'),
+         base.str.cat(name_hash.fillna(''), sep='_NAME_')],
+        default=None
+    )
+    canonical = pd.Series(canonical, index=chunk_df.index, dtype=object)
+
+    missing_base = int((base == '').sum())
+    if missing_base:
+        logger.warning(f"Cannot generate canonical code for {missing_base} rows: Missing base_card_code.")
+    name_fallbacks = int((needs_name & name_hash.notna()).sum())
+    if name_fallbacks:
+        logger.warning(f"Used Name Hash fallback for {name_fallbacks} rows without ShipTo or usable address.")
+    unresolved = int((needs_name & name_hash.isna()).sum())
+    if unresolved:
+        logger.error(f"Cannot generate unique canonical code for {unresolved} rows: Missing ShipTo, Address, and Name.")
+    return canonical
+
+
 def _fmt2(v):
     try:
         return f"{float(v):.2f}"
     except (TypeError, ValueError):
         return "null"
 
+
+# Explicit formats tried (in order) before falling back to pandas' fuzzy dateutil parser.
+POSTINGDATE_FALLBACK_FORMATS = ['%m/%d/%Y', '%m/%d/%Y %H:%M:%S', '%m/%d/%y']
+
+def _parse_posting_dates(raw_series):
+    """
+    Parses a raw POSTINGDATE column using fixed-format C parsers instead of dateutil.
+    ISO dates (the common case) are handled in one pass; any rows left as NaT are retried
+    with the known US-style formats, and only the remaining residue uses the fuzzy parser.
+    """
+    raw = raw_series.astype(str).str.strip()
+    raw = raw.where(raw_series.notna() & (raw != ''), None)
+    parsed = pd.to_datetime(raw, format='ISO8601', errors='coerce', cache=True)
+
+    unparsed = parsed.isna() & raw.notna()
+    for fmt in POSTINGDATE_FALLBACK_FORMATS:
+        if not unparsed.any():
+            break
+        retry = pd.to_datetime(raw[unparsed], format=fmt, errors='coerce', cache=True)
+        parsed = parsed.combine_first(retry)
+        unparsed = parsed.isna() & raw.notna()
+
+    if unparsed.any():
+        logger.debug(f"{int(unparsed.sum())} POSTINGDATE values did not match a known format; using fuzzy parser.")
+        parsed = parsed.combine_first(pd.to_datetime(raw[unparsed], errors='coerce', cache=True))
+
+    return parsed
+
+def _json_dumps(obj):
+    """
+    Serializes the per-account JSON columns. Output is compact and non-ASCII is kept as UTF-8,
+    the same with or without orjson installed.
+    """
+    if ORJSON_AVAILABLE: return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+
+def _json_loads(s):
+    """Parses a JSON string with orjson when available (its errors subclass json.JSONDecodeError)."""
+    if ORJSON_AVAILABLE: return orjson.loads(s)
+    return json.loads(s)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_product_set(products_json):
+    """Parses a yearly_products_json string into a frozenset of SKU strings. Many accounts share the same list, so this is cached."""
+    product_list = _json_loads(products_json)
+    if not isinstance(product_list, list): return frozenset()
+    return frozenset(str(product).strip() for product in product_list)
+
+
+def _to_categorical(df):
+    """Casts the low-cardinality CATEGORICAL_COLS present in df to the 'category' dtype (in place)."""
+    for col in CATEGORICAL_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+def _to_arrow_strings(df, cols):
+    """
+    Casts the object columns in cols to pyarrow-backed strings (contiguous buffers instead of one
+    Python object per row). No-op without pyarrow. Missing values become pd.NA.
+    """
+    if not PYARROW_AVAILABLE: return df
+    arrow_str = pd.ArrowDtype(pa.string())
+    for col in cols:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype(arrow_str)
+    return df
+
+def _shrink_for_load(df):
+    """
+    Narrows the transaction frame before populate_database (in place): integer columns are downcast
+    (same values, so inserts are unchanged) and transaction_hash becomes an Arrow string column when
+    pyarrow is available. Floats are left as float64; revenue/amount need the full precision.
+    """
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    return _to_arrow_strings(df, ['transaction_hash'])
+
+
+def _from_categorical(df):
+    """Returns df with any categorical columns cast back to object, e.g. before DB inserts."""
+    cat_cols = df.select_dtypes(include='category').columns
+    if len(cat_cols) == 0:
+        return df
+    return df.astype({col: object for col in cat_cols})
+
+DUPLICATE_CHECK_COLS = ['canonical_code', 'posting_date', 'item_code', 'revenue', 'quantity']
+
+def _add_transaction_hashes(df):
+    """
+    Coerces the key columns, groups equal keys together and adds duplicate_rank and transaction_hash
+    in one pass over the reordered frame. This stays in pandas rather than a DuckDB window query: the hash key is the
+    Python text of each value (e.g. '2024-01-05 00:00:00', '12.5'), NaN keys get NaN ranks, and both
+    must match the webhook's generate_hash byte for byte.
+    """
+    # Ensure dtypes are correct before sorting; columns that already have them are left alone
+    if not pd.api.types.is_datetime64_any_dtype(df['posting_date']):
+        df['posting_date'] = pd.to_datetime(df['posting_date'], errors='coerce')
+    for col in ['item_code', 'revenue', 'quantity']:
+        # Use .get() to avoid KeyError if a column is missing
+        values = df.get(col)
+        if values is None or not pd.api.types.is_numeric_dtype(values) or values.isna().any():
+            df[col] = pd.to_numeric(values, errors='coerce').fillna(0)
+
+    # Equal keys only need to be adjacent, not lexically ordered: one stable argsort of a 64-bit hash of
+    # the key columns replaces the 5-column sort. Stable, so duplicates keep their original relative order
+    key_hash = duplicate_key_hashes(df, DUPLICATE_CHECK_COLS)
+    order = np.argsort(key_hash, kind='stable')
+    hashed_df = df.take(order)
+    sorted_hash = key_hash[order]
+    hash_runs = int(np.count_nonzero(sorted_hash[1:] != sorted_hash[:-1])) + 1 if len(df) else 0
+    # Key runs refine hash runs; equal counts mean no collision interleaved two keys (NaT keys also land here)
+    if int(_key_run_starts(hashed_df, DUPLICATE_CHECK_COLS)[0].sum()) == hash_runs:
+        df = hashed_df
+    else:
+        df = df.sort_values(by=DUPLICATE_CHECK_COLS, na_position='first')
+    del hashed_df
+
+    # Rows are grouped by the key columns, so the per-key cumcount is a single run-length scan
+    df['duplicate_rank'] = _duplicate_ranks(df, DUPLICATE_CHECK_COLS)
+    # Key strings are built column-wise; the result must stay IDENTICAL to generate_hash in the webhook
+    df['transaction_hash'] = _transaction_hashes(df)
+    return df
+
+
+def _key_run_starts(df, cols):
+    """Returns (new_run, has_na) masks: where the cols key differs from the previous row, and rows with a missing key."""
+    n = len(df)
+    new_run = np.zeros(n, dtype=bool)
+    has_na = np.zeros(n, dtype=bool)
+    if n: new_run[0] = True
+    for col in cols:
+        series = df[col]
+        values = series.cat.codes.to_numpy() if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+        new_run[1:] |= values[1:] != values[:-1]
+        has_na |= series.isna().to_numpy()
+    return new_run, has_na
+
+
+def _duplicate_ranks(df, cols):
+    """
+    Same result as df.groupby(cols, observed=True).cumcount() for a df whose equal keys are adjacent
+    (sorted or hash-grouped by cols): each row's rank is its distance from the start of its run.
+    Like groupby (dropna), rows with a missing key get NaN and the ranks turn float.
+    """
+    n = len(df)
+    new_run, has_na = _key_run_starts(df, cols)
+    run_starts = np.flatnonzero(new_run)
+    ranks = np.arange(n) - np.repeat(run_starts, np.diff(np.append(run_starts, n)))
+    if has_na.any():
+        ranks = ranks.astype(np.float64)
+        ranks[has_na] = np.nan
+    return pd.Series(ranks, index=df.index)
+
+
+HASH_KEY_COLS = ['canonical_code', 'posting_date', 'item_code', 'revenue', 'quantity', 'duplicate_rank']
+
+def _hash_key_part(series):
+    """
+    Stringifies one hash-key column exactly the way the row-wise f-string in the webhook's
+    generate_hash does (str() of each value). Key columns repeat heavily (dates, SKUs, quantities),
+    so str() runs once per distinct value and the labels are gathered back by factorize codes.
+    Returns an object ndarray.
+    """
+    if series.dtype == object:
+        # Mixed Python objects: factorize would fold None into NaN, but str() renders them differently
+        return np.array([str(value) for value in series.tolist()], dtype=object)
+    # use_na_sentinel=False keeps NaN/NaT as ordinary values, so they render as str() does: 'nan' / 'NaT'
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    labels = np.array([str(value) for value in uniques.tolist()], dtype=object)
+    parts = labels[codes]
+    if pd.api.types.is_float_dtype(series):
+        # factorize treats -0.0 and 0.0 as one value, but str() tells them apart
+        values = series.to_numpy()
+        negative_zero = (values == 0) & np.signbit(values)
+        if negative_zero.any():
+            parts[negative_zero] = '-0.0'
+            parts[(values == 0) & ~negative_zero] = '0.0'
+    return parts
+
+
+def _hash_key_frame(key_df, algo):
+    """Hex digests of 'canonical_code|...|duplicate_rank' for every row of key_df (module level so pool workers can run it)."""
+    parts = [_hash_key_part(key_df[col]) for col in HASH_KEY_COLS]
+    # For sha256 this is OpenSSL's constructor (SHA-NI accelerated on current x86 builds), called
+    # directly rather than via hashlib.new() and flagged as a non-security use
+    hasher = get_transaction_hash_constructor(algo)
+    return [hasher('|'.join(row).encode()).hexdigest() for row in zip(*parts)]
+
+
+def _transaction_hashes(df):
+    """
+    Hash (TRANSACTION_HASH_ALGO) of 'canonical_code|posting_date|item_code|revenue|quantity|duplicate_rank'
+    for every row. The key must stay byte-identical to generate_hash in routes/webhook_routes.py.
+    Large frames are split into one row range per INGEST_WORKERS process: only the six key columns
+    are shipped, and both the key build and the hashing run in the workers.
+    """
+    key_df = df[HASH_KEY_COLS]
+    if INGEST_WORKERS <= 1 or len(key_df) < PARALLEL_HASH_MIN_ROWS:
+        return _hash_key_frame(key_df, TRANSACTION_HASH_ALGO)
+    # hashlib only releases the GIL for large buffers, so short keys need processes rather than threads
+    shard_size = -(-len(key_df) // INGEST_WORKERS)
+    shards = [key_df.iloc[i:i + shard_size] for i in range(0, len(key_df), shard_size)]
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        hashed = executor.map(_hash_key_frame, shards, [TRANSACTION_HASH_ALGO] * len(shards))
+        return [h for shard in hashed for h in shard]
+
+NS_PER_DAY = 86_400_000_000_000
+
+@njit(parallel=True, cache=True)
+def _account_interval_kernel(dates_ns, offsets, py_start_ns, cy_start_ns, next_year_start_ns):
+    """
+    Per-account purchase interval stats over CSR-style groups.
+    dates_ns holds posting dates (int64 ns) sorted by account then date; rows
+    offsets[i]:offsets[i+1] belong to account i. Returns (median interval, PY mean
+    interval, CYTD mean interval) in whole days per account, NaN where not computable.
+    """
+    n_groups = len(offsets) - 1
+    median_out = np.full(n_groups, np.nan)
+    py_mean_out = np.full(n_groups, np.nan)
+    cy_mean_out = np.full(n_groups, np.nan)
+    for i in prange(n_groups):
+        start = offsets[i]
+        end = offsets[i + 1]
+        # Unique purchase timestamps (input is sorted, so duplicates are adjacent)
+        uniq = np.empty(end - start, np.int64)
+        m = 0
+        for j in range(start, end):
+            if m == 0 or dates_ns[j] != uniq[m - 1]:
+                uniq[m] = dates_ns[j]
+                m += 1
+        if m < 2:
+            continue
+        intervals = np.empty(m - 1, np.float64)
+        for j in range(1, m):
+            intervals[j - 1] = (uniq[j] - uniq[j - 1]) // NS_PER_DAY
+        median_out[i] = np.median(intervals)
+
+        py_sum = 0.0; py_count = 0; py_prev = -1
+        cy_sum = 0.0; cy_count = 0; cy_prev = -1
+        for j in range(m):
+            d = uniq[j]
+            if py_start_ns <= d < cy_start_ns:
+                if py_prev >= 0:
+                    py_sum += (uniq[j] - uniq[py_prev]) // NS_PER_DAY
+                    py_count += 1
+                py_prev = j
+            elif cy_start_ns <= d < next_year_start_ns:
+                if cy_prev >= 0:
+                    cy_sum += (uniq[j] - uniq[cy_prev]) // NS_PER_DAY
+                    cy_count += 1
+                cy_prev = j
+        if py_count > 0:
+            py_mean_out[i] = py_sum / py_count
+        if cy_count > 0:
+            cy_mean_out[i] = cy_sum / cy_count
+    return median_out, py_mean_out, cy_mean_out
+
+
+def compute_account_intervals(all_processed_df, current_year_num):
+    """
+    Runs _account_interval_kernel over all accounts at once.
+    Returns {canonical_code: (median_interval, avg_interval_py, avg_interval_cytd)} with None for NaN.
+    """
+    sorted_dates = all_processed_df[['canonical_code', 'posting_date']].sort_values(['canonical_code', 'posting_date'])
+    group_sizes = sorted_dates.groupby('canonical_code', observed=True, sort=True).size()
+    offsets = np.concatenate(([0], group_sizes.to_numpy().cumsum())).astype(np.int64)
+    dates_ns = sorted_dates['posting_date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+    year_start_ns = lambda y: pd.Timestamp(datetime(y, 1, 1)).value
+    median_arr, py_arr, cy_arr = _account_interval_kernel(
+        dates_ns, offsets,
+        year_start_ns(current_year_num - 1), year_start_ns(current_year_num), year_start_ns(current_year_num + 1)
+    )
+    to_opt = lambda v: None if np.isnan(v) else float(v)
+    return {
+        code: (to_opt(median_arr[i]), to_opt(py_arr[i]), to_opt(cy_arr[i]))
+        for i, code in enumerate(group_sizes.index)
+    }
+
 # === Data Processing Functions ===
 
 def process_chunk(chunk_df):
@@ -337,7 +784,7 @@ def process_chunk(chunk_df):
     logger.debug("Cleaning data types...")
     chunk_df['CardCode'] = chunk_df['CardCode'].fillna('').astype(str).str.strip()
     chunk_df['ShipTo'] = chunk_df['ShipTo'].fillna('').astype(str).str.strip()
-    chunk_df['POSTINGDATE'] = pd.to_datetime(chunk_df['POSTINGDATE'], errors='coerce')
+    chunk_df['POSTINGDATE'] = _parse_posting_dates(chunk_df['POSTINGDATE'])
     chunk_df['AMOUNT'] = pd.to_numeric(chunk_df['AMOUNT'], errors='coerce').fillna(0.0)
     chunk_df['QUANTITY'] = pd.to_numeric(chunk_df['QUANTITY'], errors='coerce').fillna(0.0).astype(int) # Assume int qty
     chunk_df['DESCRIPTION'] = chunk_df['DESCRIPTION'].fillna('').astype(str)
@@ -356,13 +803,15 @@ def process_chunk(chunk_df):
         chunk_df['ITEMUPC'] = ''
 
     logger.debug(f"[UPC DEBUG] Raw ITEMUPC sample (before normalize): {chunk_df['ITEMUPC'].head().tolist()}")
-    chunk_df['ITEMUPC'] = (
+    raw_upcs = (
         chunk_df['ITEMUPC']
         .fillna('')            # avoid NaN inside the normalizer
         .astype(str)
         .str.strip()
-        .apply(_normalize_upc)
     )
+    # UPCs repeat heavily across rows: normalize each distinct value once, then map back
+    upc_map = {upc: _normalize_upc(upc) for upc in raw_upcs.unique()}
+    chunk_df['ITEMUPC'] = raw_upcs.map(upc_map)
     logger.debug(f"[UPC DEBUG] Normalized ITEMUPC sample (after normalize): {chunk_df['ITEMUPC'].head().tolist()}")
 
 
@@ -386,8 +835,8 @@ def process_chunk(chunk_df):
     # 3. Generate Canonical Key Components
     logger.debug("Generating base and canonical codes...")
     chunk_df['base_card_code'] = chunk_df['CardCode'].apply(get_base_card_code)
-    # Apply generate_canonical_code row-wise. It uses base_card_code, ShipTo, NAME, ADDRESS, etc.
-    chunk_df['canonical_code'] = chunk_df.apply(generate_canonical_code, axis=1)
+    # Same rules as generate_canonical_code (base_card_code, ShipTo, NAME, ADDRESS, ...), built column-wise.
+    chunk_df['canonical_code'] = generate_canonical_codes(chunk_df)
 
     # Drop rows where canonical code couldn't be generated
     initial_rows = len(chunk_df)
@@ -448,7 +897,45 @@ def process_chunk(chunk_df):
         logger.error(f"CRITICAL: Essential columns missing after final selection: {missing_final}. Returning None.")
         return None
 
-    return final_cols_df
+    return _to_categorical(final_cols_df)
+
+HISTORICAL_AGG_SQL = """
+    SELECT
+        canonical_code,
+        year,
+        SUM(revenue) AS total_revenue,
+        COUNT(posting_date) AS transaction_count,
+        list_sort(list(DISTINCT item_code_str) FILTER (WHERE item_code_str <> '')) AS yearly_products,
+        arg_max(name, posting_date) FILTER (WHERE name IS NOT NULL) AS name,
+        arg_max(sales_rep, posting_date) FILTER (WHERE sales_rep IS NOT NULL) AS sales_rep,
+        arg_max(distributor, posting_date) FILTER (WHERE distributor IS NOT NULL) AS distributor,
+        arg_min(base_card_code, posting_date) FILTER (WHERE base_card_code IS NOT NULL) AS base_card_code,
+        arg_min(ship_to_code, posting_date) FILTER (WHERE ship_to_code IS NOT NULL) AS ship_to_code
+    FROM tx
+    GROUP BY canonical_code, year
+    ORDER BY canonical_code, year
+"""
+
+def _aggregate_historical_duckdb(all_processed_df):
+    """Runs the yearly aggregation as a DuckDB query over the processed DataFrame."""
+    tx = all_processed_df[['canonical_code', 'year', 'revenue', 'posting_date', 'name',
+                           'sales_rep', 'distributor', 'base_card_code', 'ship_to_code']].copy()
+    # Stringify in pandas so the product list matches aggregate_item_codes exactly
+    tx['item_code_str'] = all_processed_df['item_code'].astype(str).str.strip()
+    tx = _from_categorical(tx)
+
+    con = duckdb.connect()
+    try:
+        con.register('tx', tx)
+        yearly_agg = con.execute(HISTORICAL_AGG_SQL).fetch_df()
+    finally:
+        con.close()
+
+    yearly_agg['year'] = yearly_agg['year'].astype('Int64')
+    yearly_agg['yearly_products'] = yearly_agg['yearly_products'].apply(
+        lambda items: list(items) if items is not None else []
+    )
+    return yearly_agg
 
 def aggregate_historical(all_processed_df):
     """Aggregates by canonical_code and year."""
@@ -459,6 +946,14 @@ def aggregate_historical(all_processed_df):
     all_processed_df['year'] = pd.to_numeric(all_processed_df['year'], errors='coerce').astype('Int64')
     all_processed_df.dropna(subset=['canonical_code', 'year'], inplace=True)
 
+    yearly_agg = None
+    if DUCKDB_AVAILABLE:
+        try:
+            yearly_agg = _aggregate_historical_duckdb(all_processed_df)
+        except Exception as duck_err:
+            logger.warning(f"DuckDB aggregation failed, falling back to pandas: {duck_err}", exc_info=True)
+            yearly_agg = None
+
     agg_funcs = {
         'total_revenue': ('revenue', 'sum'),
         'transaction_count': ('posting_date', 'count'),
@@ -470,44 +965,61 @@ def aggregate_historical(all_processed_df):
         'base_card_code': ('base_card_code', 'first'), # Should be constant
         'ship_to_code': ('ship_to_code', 'first'), # Should be constant
     }
-    try:
-        all_processed_df.sort_values(['canonical_code', 'year', 'posting_date'], inplace=True)
-        yearly_agg = all_processed_df.groupby(['canonical_code', 'year'], as_index=False).agg(**agg_funcs)
-    except Exception as agg_err: logger.error(f"Error during aggregation: {agg_err}", exc_info=True); return pd.DataFrame()
+    if yearly_agg is None:
+        try:
+            all_processed_df.sort_values(['canonical_code', 'year', 'posting_date'], inplace=True)
+            yearly_agg = all_processed_df.groupby(['canonical_code', 'year'], as_index=False, observed=True).agg(**agg_funcs)
+        except Exception as agg_err: logger.error(f"Error during aggregation: {agg_err}", exc_info=True); return pd.DataFrame()
 
     if 'yearly_products' in yearly_agg.columns:
         yearly_agg['yearly_products_json'] = yearly_agg['yearly_products'].apply(safe_json_dumps)
-        yearly_agg = yearly_agg.drop(columns=['yearly_products'])
-    else: yearly_agg['yearly_products_json'] = None
+        # The lists themselves go to yearly_products_parsed (JSON/JSONB), so readers skip json.loads
+        yearly_agg = yearly_agg.rename(columns={'yearly_products': 'yearly_products_parsed'})
+    else:
+        yearly_agg['yearly_products_json'] = None
+        yearly_agg['yearly_products_parsed'] = None
 
     logger.info(f"Aggregation complete. Generated {len(yearly_agg)} historical summary rows.")
     return yearly_agg
 
 
-def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
-    """
-    Calculates initial predictions based on full processed history.
+def _calc_preds_for_shard(shard):
     """
-    logger.info(f"Calculating initial predictions for {all_processed_df['canonical_code'].nunique()} canonical codes...")
-    if all_processed_df.empty or historical_agg_df.empty:
-        logger.warning("Missing detailed or aggregated data for predictions.")
-        return pd.DataFrame()
+    Builds the prediction rows for one shard of accounts and returns them as a DataFrame.
+    Runs in a worker process (or inline when not parallelized), so it only depends on its
+    arguments and module globals.
 
-    all_processed_df['posting_date'] = pd.to_datetime(all_processed_df['posting_date'], errors='coerce')
-    all_processed_df.dropna(subset=['canonical_code', 'posting_date'], inplace=True)
-
-    predictions = []
-    processing_end_datetime = all_processed_df['posting_date'].max()
-    if pd.isna(processing_end_datetime): logger.error("Could not determine max posting date."); return pd.DataFrame()
+    shard: (detail_df, hist_by_code, empty_hist, intervals_by_code, latest_products_by_code,
+            top_skus_by_code, processing_end_datetime)
+    """
+    (detail_df, hist_by_code, empty_hist, intervals_by_code, latest_products_by_code,
+     top_skus_by_code, processing_end_datetime) = shard
     today_for_calc = processing_end_datetime.date() # Use date part for comparisons
-    current_year_num = today_for_calc.year
-    start_of_current_year = datetime(current_year_num, 1, 1)
-    logger.info(f"Using {today_for_calc} as reference date for historical calculations.")
 
-    grouped_detailed = all_processed_df.groupby('canonical_code')
+    grouped_detailed = detail_df.groupby('canonical_code', observed=True)
     total_accounts = len(grouped_detailed); processed_count = 0
 
-    for canonical_code, group in grouped_detailed:
+    # Stripped SKU string per item_code category, built once so each account's SKU set is a code lookup
+    sku_strs = None
+    if 'item_code' in detail_df.columns and isinstance(detail_df['item_code'].dtype, pd.CategoricalDtype):
+        sku_strs = np.array([str(x).strip() for x in detail_df['item_code'].cat.categories], dtype=object)
+
+    # Output columns are preallocated and filled by position (one row per account), then
+    # assembled into a DataFrame in one call instead of appending a dict per account
+    n = total_accounts
+    object_cols = ['canonical_code', 'base_card_code', 'ship_to_code', 'name', 'full_address', 'customer_id',
+                   'sales_rep', 'sales_rep_name', 'distributor', 'products_purchased',
+                   'recommended_products_next_purchase_json']
+    float_cols = ['last_purchase_amount', 'account_total', 'avg_interval_py', 'avg_interval_cytd',
+                  'revenue_trend_slope', 'revenue_trend_intercept', 'revenue_trend_r_squared']
+    int_cols = ['purchase_frequency', 'days_since_last_purchase', 'median_interval_days', 'days_overdue']
+    date_cols = ['last_purchase_date', 'next_expected_purchase_date']
+    out = {col: np.empty(n, dtype=object) for col in object_cols}
+    out.update({col: np.full(n, np.nan, dtype=np.float64) for col in float_cols})
+    out.update({col: np.zeros(n, dtype=np.int64) for col in int_cols})
+    out.update({col: np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]') for col in date_cols})
+
+    for i, (canonical_code, group) in enumerate(grouped_detailed):
         processed_count += 1
         if processed_count % 250 == 0: logger.info(f"Calculating predictions: {processed_count}/{total_accounts}...")
 
@@ -544,7 +1056,7 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
         last_purchase_amount = group[group['posting_date'] == last_purchase_datetime]['revenue'].sum() if last_purchase_datetime else 0.0
 
         # --- Lifetime Aggregates ---
-        acc_hist_data = historical_agg_df[historical_agg_df['canonical_code'] == canonical_code]
+        acc_hist_data = hist_by_code.get(canonical_code, empty_hist)
         account_total = acc_hist_data['total_revenue'].sum()
         purchase_frequency = acc_hist_data['transaction_count'].sum() # Total # of transactions/rows
 
@@ -557,12 +1069,8 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
             .to_dict(orient='records')
         )
 
-        # >>> ADD HERE: PY total and trend <<<
-        # Previous-year total revenue (PY)
-        py_total_revenue = float(
-            acc_hist_data.loc[acc_hist_data['year'] == (current_year_num - 1), 'total_revenue'].sum()
-            or 0.0
-        )
+        # >>> ADD HERE: trend <<<
+        # (PY total revenue is mapped on afterwards from one grouped pass, see _add_cytd_and_growth_columns)
 
         # Trend (slope / intercept / R^2) over yearly revenues
         # Ensure you have: from pipeline import calculate_yearly_revenue_trend  (at top of file)
@@ -577,29 +1085,10 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
         
 
         # --- Interval Calculations ---
-        median_interval_days = 30; avg_interval_cytd = None; avg_interval_py = None
-        avg_interval_overall = 30.0 # Default overall average
-        intervals_days = pd.Series(dtype=float) # Initialize empty series
-        if len(purchase_datetimes) > 1:
-            date_series = pd.Series(purchase_datetimes).sort_values()
-            intervals_days = date_series.diff().dt.days.dropna()
-            if not intervals_days.empty:
-                median_float = intervals_days.median()
-                if pd.notna(median_float): median_interval_days = max(1, int(float(median_float)))
-                avg_interval_overall = intervals_days.mean() # Calculate overall average here
-                if avg_interval_overall <=0 or pd.isna(avg_interval_overall): avg_interval_overall = 30.0 # Ensure valid fallback
-
-                # Calc PY Avg
-                prev_year_num = current_year_num - 1
-                py_dates = date_series[date_series.dt.year == prev_year_num]
-                if len(py_dates) > 1:
-                    py_intervals = py_dates.diff().dt.days.dropna()
-                    if not py_intervals.empty: avg_interval_py = py_intervals.mean()
-                # Calc CYTD Avg
-                cy_dates = date_series[date_series.dt.year == current_year_num]
-                if len(cy_dates) > 1:
-                    cy_intervals = cy_dates.diff().dt.days.dropna()
-                    if not cy_intervals.empty: avg_interval_cytd = cy_intervals.mean()
+        # Median / PY / CYTD intervals were computed for every account up front by the kernel
+        median_interval_days = 30
+        median_float, avg_interval_py, avg_interval_cytd = intervals_by_code.get(canonical_code, (None, None, None))
+        if median_float is not None: median_interval_days = max(1, int(median_float))
 
         if median_interval_days <= 0: median_interval_days = 30
 
@@ -612,172 +1101,293 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
             if next_expected_purchase_date and next_expected_purchase_date.date() < today_for_calc:
                  days_overdue = (today_for_calc - next_expected_purchase_date.date()).days
 
-        # --- CYTD / YEP / Pace Calculations ---
-        # (Keep logic as before - using detailed data)
-        cytd_trans = group[group['posting_date'] >= start_of_current_year]
-        cytd_revenue = float(cytd_trans['revenue'].sum())  # Ensure this is a float
-        cytd_count = len(cytd_trans)
-        avg_order_amount_cytd = cytd_revenue / cytd_count if cytd_count > 0 else None
-
-        yep_revenue = None
-        # --- FIX: This is the corrected YEP logic for the historical script ---
-        if cytd_revenue > 0 and not cytd_trans.empty:
-            # Use "now" relative to Jan 1 for the run-rate window
-            days_for_ytd_accumulation = (today_for_calc - pd.Timestamp(datetime(current_year_num, 1, 1)).date()).days + 1
-            # Guard: avoid annualizing on tiny windows (<30 days)
-            if days_for_ytd_accumulation < 30:
-                yep_revenue = cytd_revenue  # no projection yet
-            else:
-                yep_revenue = (cytd_revenue / float(days_for_ytd_accumulation)) * 365.0
-
-        # Last year's total revenue (full year)
-        py_total_revenue = float(
-            acc_hist_data.loc[acc_hist_data['year'] == (current_year_num - 1), 'total_revenue'].sum() or 0.0
-        )
-
-        # pace_vs_ly as PERCENT (pipeline style)
-        pace_vs_ly = None
-        if yep_revenue is not None and py_total_revenue is not None:
-            if py_total_revenue > 0:
-                pace_vs_ly = ((yep_revenue - py_total_revenue) / py_total_revenue) * 100.0
-            elif yep_revenue > 0:
-                # New Growth: pipeline leaves percent as None and lets UI show "New Growth"
-                pace_vs_ly = None
-            else:
-                pace_vs_ly = 0.0
-
-
-        
-        # Optional: Add a debug log to see the values during processing.
-        # Use safe formatting helper to avoid errors when values are None.
-        logger.debug(
-            "Reprocess Predictions for %s: CYTD=%s YEP=%s PY_Revenue=%s Pace=%s",
-            canonical_code,
-            _fmt2(cytd_revenue),
-            _fmt2(yep_revenue),
-            _fmt2(py_total_revenue),
-            _fmt2(pace_vs_ly)
-        )
-
-        # --- Growth Opportunity Engine ---
-        # Default values for growth engine fields
-        target_yep_plus_1_pct = None
-        additional_revenue_needed_eoy = None
-        suggested_next_purchase_amount = None
-        growth_engine_message = "Data insufficient for growth suggestion."
-
-        # Determine baseline for calculating growth: use previous year's total revenue if available;
-        # otherwise fall back to the projected year‑end pace (YEP). If neither exists, baseline stays 0.
-        baseline_for_target = py_total_revenue if py_total_revenue > 0 else (yep_revenue if yep_revenue and yep_revenue > 0 else 0)
-
-        # Compute growth metrics only if we have a baseline and CYTD revenue
-        if baseline_for_target > 0 and cytd_revenue is not None:
-            # Determine if the account is pacing well versus last year
-            is_pacing_well = pace_vs_ly is not None and pace_vs_ly >= 0
-            # Assign a growth target percentage: +10% if pacing well, +1% otherwise
-            growth_target_pct = 0.10 if is_pacing_well else 0.01
-
-            # Calculate the target total for the year (baseline + growth)
-            target_total_for_calc = baseline_for_target * (1.0 + growth_target_pct)
-            # Additional revenue needed to hit target from current CYTD revenue
-            additional_needed = target_total_for_calc - cytd_revenue
-
-            # Set currency values rounded to 2 decimals
-            target_yep_plus_1_pct = round(target_total_for_calc, 2)
-            additional_revenue_needed_eoy = round(additional_needed, 2)
-
-            if additional_needed <= 0:
-                # Already on track: no additional revenue needed
-                growth_engine_message = (
-                    f"Excellent! On track or has exceeded the +{growth_target_pct*100:.0f}% target (Target: {_format_currency(target_yep_plus_1_pct)})."
-                )
-                suggested_next_purchase_amount = None
-            else:
-                # Need to catch up: compute remaining days and suggested next purchase amount
-                # Days remaining in the current year (use processing_end_datetime as 'today')
-                try:
-                    from datetime import date
-                    dec31 = date(current_year_num, 12, 31)
-                    days_left_in_year = max(1, (dec31 - processing_end_datetime.date()).days)
-                except Exception:
-                    days_left_in_year = max(1, 365 - int(days_elapsed) if 'days_elapsed' in locals() else 1)
-
-                # Estimate number of remaining purchases based on median interval
-                remaining_purchases_est = max(1.0, days_left_in_year / float(median_interval_days) if median_interval_days > 0 else 1.0)
-                # Amount per purchase to meet the target
-                amount_per_purchase = additional_needed / remaining_purchases_est
-                # Suggest at least $50 and not more than the total additional needed
-                suggested_next_purchase_amount = round(additional_revenue_needed_eoy / remaining_purchases_est, 2)
-
-
-                growth_engine_message = (
-                    f"To reach {_format_currency(target_yep_plus_1_pct)} (+{growth_target_pct*100:.0f}% vs baseline), aim for orders around ~{_format_currency(suggested_next_purchase_amount)}."
-                )
-
         # Compute product recommendations: attempt to suggest missing top products or top revenue SKUs
         recommended_upcs = []
         try:
-            top_set = getattr(config, 'TOP_30_SET', set())
-            account_skus = set()
-            if 'item_code' in group.columns:
-                account_skus = {str(x).strip() for x in group['item_code'].dropna().unique() if str(x).strip()}
             # Prefer recommending missing products from the top set
-            if isinstance(top_set, set) and len(top_set) > 0:
-                missing = [sku for sku in top_set if sku not in account_skus]
-                recommended_upcs = missing[:3]
+            if TOP_30_FS:
+                account_skus = set()
+                if sku_strs is not None:
+                    sku_codes = group['item_code'].cat.codes.to_numpy()
+                    account_skus = set(sku_strs[np.unique(sku_codes[sku_codes >= 0])].tolist())
+                elif 'item_code' in group.columns:
+                    account_skus = {str(x).strip() for x in group['item_code'].dropna().unique()}
+                recommended_upcs = list(TOP_30_FS - account_skus)[:3]
             else:
-                # Fallback: pick top revenue SKUs for this account
-                if 'item_code' in group.columns:
-                    revenue_by_sku = group.groupby('item_code')['revenue'].sum().sort_values(ascending=False)
-                    recommended_upcs = [str(code) for code in revenue_by_sku.index.tolist() if str(code).strip()][:3]
+                # Fallback: top revenue SKUs for this account (ranked once for all accounts up front)
+                recommended_upcs = top_skus_by_code.get(canonical_code, [])
         except Exception as rec_err:
             logger.warning(f"Could not compute recommended products for {canonical_code}: {rec_err}")
             recommended_upcs = []
         # Serialize recommended products as JSON string (list of SKUs)
-        recommended_products_json = json.dumps([str(x) for x in recommended_upcs]) if recommended_upcs else json.dumps([])
+        recommended_products_json = _json_dumps([str(x) for x in recommended_upcs]) if recommended_upcs else '[]'
 
         # --- Latest Products ---
-        latest_hist_row = acc_hist_data.sort_values('year', ascending=False).iloc[0] if not acc_hist_data.empty else None
-        products_purchased_json = latest_hist_row['yearly_products_json'] if latest_hist_row is not None else json.dumps([])
-
-        # --- Assemble Prediction Row ---
-        pred_row = {
-            'canonical_code': canonical_code, 'base_card_code': base_card_code, 'ship_to_code': ship_to_code,
-            'name': name, 'full_address': full_address, 'customer_id': customer_id,
-            'sales_rep': sales_rep_id, 'sales_rep_name': sales_rep_name, 'distributor': distributor,
-            'last_purchase_date': last_purchase_datetime, 'last_purchase_amount': last_purchase_amount,
-            'account_total': account_total, 'purchase_frequency': purchase_frequency,
-            'days_since_last_purchase': days_since_last_purchase,
-            'median_interval_days': median_interval_days,
-            'next_expected_purchase_date': next_expected_purchase_date,
-            'days_overdue': days_overdue,
-            'avg_interval_py': avg_interval_py, 'avg_interval_cytd': avg_interval_cytd,
-            'cytd_revenue': cytd_revenue, 'yep_revenue': yep_revenue, 'pace_vs_ly': pace_vs_ly,
-            'avg_order_amount_cytd': avg_order_amount_cytd,
-            'products_purchased': products_purchased_json,
-            'py_total_revenue': py_total_revenue,
-            'revenue_trend_slope': revenue_trend_slope,
-            'revenue_trend_intercept': revenue_trend_intercept,
-            'revenue_trend_r_squared': revenue_trend_r_squared,
-            # Placeholders for scores calculated next
-            'recency_score': 0, 'frequency_score': 0, 'monetary_score': 0, 'rfm_score': 0.0, 'rfm_segment': '',
-            'health_score': 0.0, 'health_category': '', 'priority_score': 0.0, 'enhanced_priority_score': 0.0,
-            #'yoy_revenue_growth': 0.0, 'yoy_purchase_count_growth': 0.0, # Calculated later
-            #'product_coverage_percentage': 0.0, 'carried_top_products_json': None, 'missing_top_products_json': None # Calculated later
-            # Growth engine output fields
-            'target_yep_plus_1_pct': target_yep_plus_1_pct,
-            'additional_revenue_needed_eoy': additional_revenue_needed_eoy,
-            'suggested_next_purchase_amount': suggested_next_purchase_amount,
-            'recommended_products_next_purchase_json': recommended_products_json,
-            'growth_engine_message': growth_engine_message,
-            'avg_purchase_cycle_days': float(median_interval_days)
-        }
-        predictions.append(pred_row)
+        products_purchased_json = latest_products_by_code.get(canonical_code, '[]')
+
+        # --- Fill Prediction Row ---
+        out['canonical_code'][i] = canonical_code; out['base_card_code'][i] = base_card_code; out['ship_to_code'][i] = ship_to_code
+        out['name'][i] = name; out['full_address'][i] = full_address; out['customer_id'][i] = customer_id
+        out['sales_rep'][i] = sales_rep_id; out['sales_rep_name'][i] = sales_rep_name; out['distributor'][i] = distributor
+        if last_purchase_datetime is not None: out['last_purchase_date'][i] = last_purchase_datetime
+        out['last_purchase_amount'][i] = last_purchase_amount
+        out['account_total'][i] = account_total; out['purchase_frequency'][i] = purchase_frequency
+        out['days_since_last_purchase'][i] = days_since_last_purchase
+        out['median_interval_days'][i] = median_interval_days
+        if next_expected_purchase_date is not None: out['next_expected_purchase_date'][i] = next_expected_purchase_date
+        out['days_overdue'][i] = days_overdue
+        if avg_interval_py is not None: out['avg_interval_py'][i] = avg_interval_py
+        if avg_interval_cytd is not None: out['avg_interval_cytd'][i] = avg_interval_cytd
+        out['products_purchased'][i] = products_purchased_json
+        if revenue_trend_slope is not None: out['revenue_trend_slope'][i] = revenue_trend_slope
+        if revenue_trend_intercept is not None: out['revenue_trend_intercept'][i] = revenue_trend_intercept
+        if revenue_trend_r_squared is not None: out['revenue_trend_r_squared'][i] = revenue_trend_r_squared
+        out['recommended_products_next_purchase_json'][i] = recommended_products_json
+
+    # Placeholders for scores calculated next
+    score_placeholders = {'recency_score': 0, 'frequency_score': 0, 'monetary_score': 0, 'rfm_score': 0.0, 'rfm_segment': '',
+                          'health_score': 0.0, 'health_category': '', 'priority_score': 0.0, 'enhanced_priority_score': 0.0}
+    for col, default_val in score_placeholders.items():
+        out[col] = np.full(n, default_val, dtype=object if isinstance(default_val, str) else type(default_val))
+    out['avg_purchase_cycle_days'] = out['median_interval_days'].astype(np.float64)
+
+    # cytd_revenue / yep_revenue / pace_vs_ly / avg_order_amount_cytd / py_total_revenue
+    # and the growth engine fields are added column-wise afterwards
+    return pd.DataFrame(out)
+
+
+# Growth engine message codes returned by _growth_engine_kernel
+GROWTH_INSUFFICIENT, GROWTH_ON_TRACK, GROWTH_CATCH_UP = 0, 1, 2
+
+@njit(cache=True)
+def _growth_engine_kernel(cytd, py_total, yep, pace, median_interval, days_left_in_year):
+    """
+    Growth engine arithmetic for all accounts. yep / pace are NaN when missing.
+    Returns unrounded (target total, additional needed, estimated remaining purchases,
+    growth target pct, message code) arrays; rounding and messages are done by the caller.
+    """
+    n = cytd.shape[0]
+    target_out = np.full(n, np.nan)
+    additional_out = np.full(n, np.nan)
+    remaining_out = np.full(n, np.nan)
+    pct_out = np.zeros(n)
+    code_out = np.zeros(n, dtype=np.int8)
+    for i in range(n):
+        # Baseline: previous year's total revenue if available, otherwise the projected year-end pace (YEP).
+        if py_total[i] > 0:
+            baseline = py_total[i]
+        elif yep[i] > 0:
+            baseline = yep[i]
+        else:
+            continue  # GROWTH_INSUFFICIENT
+
+        # +10% target if pacing well versus last year, +1% otherwise (NaN pace compares False)
+        growth_target_pct = 0.10 if pace[i] >= 0 else 0.01
+        target_total = baseline * (1.0 + growth_target_pct)
+        additional_needed = target_total - cytd[i]
+        target_out[i] = target_total
+        additional_out[i] = additional_needed
+        pct_out[i] = growth_target_pct
+
+        if additional_needed <= 0:
+            code_out[i] = GROWTH_ON_TRACK
+        else:
+            # Estimate number of remaining purchases based on median interval
+            remaining = days_left_in_year / float(median_interval[i]) if median_interval[i] > 0 else 1.0
+            remaining_out[i] = max(1.0, remaining)
+            code_out[i] = GROWTH_CATCH_UP
+    return target_out, additional_out, remaining_out, pct_out, code_out
+
+
+def _add_cytd_and_growth_columns(predictions_df, all_processed_df, historical_agg_df, processing_end_datetime):
+    """
+    Adds CYTD revenue, avg order amount, PY total revenue, YEP, pace and the growth engine
+    fields to predictions_df. The CYTD and PY totals come from one groupby each rather than
+    a boolean mask per account.
+    """
+    today_for_calc = processing_end_datetime.date()
+    current_year_num = today_for_calc.year
+    start_of_current_year = datetime(current_year_num, 1, 1)
+
+    # CYTD filter on whole-day int64 counts (posting_date >= Jan 1 00:00 <=> day >= Jan 1's day)
+    posting_day = all_processed_df['posting_date'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').view(np.int64)
+    start_of_year_day = np.datetime64(start_of_current_year.date(), 'D').astype(np.int64)
+    cytd_mask = posting_day >= start_of_year_day
+
+    codes = predictions_df['canonical_code'].astype(object)
+    code_dtype = all_processed_df['canonical_code'].dtype
+    if isinstance(code_dtype, pd.CategoricalDtype) and predictions_df['canonical_code'].dtype == code_dtype:
+        # Shared categories: sum/count per category code with bincount, then index by each prediction's code
+        n_codes = len(code_dtype.categories)
+        detail_codes = all_processed_df['canonical_code'].cat.codes.to_numpy()[cytd_mask]
+        detail_revenue = np.nan_to_num(all_processed_df['revenue'].to_numpy(dtype=np.float64)[cytd_mask])
+        valid = detail_codes >= 0
+        cytd_sum_by_code = np.bincount(detail_codes[valid], weights=detail_revenue[valid], minlength=n_codes)
+        cytd_count_by_code = np.bincount(detail_codes[valid], minlength=n_codes)
+        pred_codes = predictions_df['canonical_code'].cat.codes.to_numpy()
+        cytd_revenue = pd.Series(cytd_sum_by_code[pred_codes], index=predictions_df.index, dtype=float)
+        cytd_count = pd.Series(cytd_count_by_code[pred_codes], index=predictions_df.index, dtype=int)
+    else:
+        cytd_agg = all_processed_df.loc[cytd_mask].groupby('canonical_code', observed=True)['revenue'].agg(['sum', 'count'])
+        cytd_agg.index = cytd_agg.index.astype(object)
+        cytd_revenue = codes.map(cytd_agg['sum']).fillna(0.0).astype(float)
+        cytd_count = codes.map(cytd_agg['count']).fillna(0).astype(int)
+
+    py_hist = historical_agg_df[historical_agg_df['year'] == (current_year_num - 1)]
+    py_total_by_acc = py_hist.groupby('canonical_code', observed=True)['total_revenue'].sum()
+    py_total_by_acc.index = py_total_by_acc.index.astype(object)
+    # New columns are collected here and attached to predictions_df in one step at the end
+    cytd = cytd_revenue.to_numpy(dtype=np.float64)
+    py = codes.map(py_total_by_acc).fillna(0.0).to_numpy(dtype=np.float64)
+    new_cols = {
+        'cytd_revenue': cytd,
+        'avg_order_amount_cytd': (cytd_revenue / cytd_count.where(cytd_count > 0)).to_numpy(),  # NaN when no CYTD orders
+        'py_total_revenue': py,
+    }
+
+    # Run-rate window and days remaining are the same for every account
+    days_for_ytd_accumulation = (today_for_calc - start_of_current_year.date()).days + 1
+    days_left_in_year = max(1, (date(current_year_num, 12, 31) - today_for_calc).days)
+
+    # --- YEP / Pace (whole columns) ---
+    # Guard: avoid annualizing on tiny windows (<30 days); no YEP without CYTD revenue
+    yep = cytd if days_for_ytd_accumulation < 30 else cytd / float(days_for_ytd_accumulation) * 365.0
+    yep = np.where(cytd > 0, yep, np.nan)
+    # pace_vs_ly as PERCENT (pipeline style). No PY base -> NaN, the UI shows "New Growth".
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pace = np.where((py > 0) & ~np.isnan(yep), (yep - py) / py * 100.0, np.nan)
+    new_cols['yep_revenue'] = yep
+    new_cols['pace_vs_ly'] = pace
+
+    # --- Growth Opportunity Engine ---
+    target_arr, additional_arr, remaining_arr, pct_arr, code_arr = _growth_engine_kernel(
+        cytd, py, yep, pace, predictions_df['median_interval_days'].to_numpy(dtype=np.float64), float(days_left_in_year)
+    )
+    n = len(predictions_df)
+    target_yep_plus_1_pct = np.full(n, np.nan)
+    additional_revenue_needed_eoy = np.full(n, np.nan)
+    suggested_next_purchase_amount = np.full(n, np.nan)
+    growth_engine_message = np.full(n, "Data insufficient for growth suggestion.", dtype=object)
+    # Only accounts with a baseline need rounding and a message. Python round() on Python floats
+    # keeps the cents identical to the old per-account code (np.round differs on some ties).
+    for i in np.flatnonzero(code_arr != GROWTH_INSUFFICIENT).tolist():
+        target = round(float(target_arr[i]), 2)
+        additional = round(float(additional_arr[i]), 2)
+        pct_label = f"+{pct_arr[i]*100:.0f}%"
+        target_yep_plus_1_pct[i] = target
+        additional_revenue_needed_eoy[i] = additional
+        if code_arr[i] == GROWTH_ON_TRACK:
+            growth_engine_message[i] = f"Excellent! On track or has exceeded the {pct_label} target (Target: {_format_currency(target)})."
+        else:
+            suggested = round(additional / float(remaining_arr[i]), 2)
+            suggested_next_purchase_amount[i] = suggested
+            growth_engine_message[i] = (
+                f"To reach {_format_currency(target)} ({pct_label} vs baseline), aim for orders around ~{_format_currency(suggested)}."
+            )
+    new_cols['target_yep_plus_1_pct'] = target_yep_plus_1_pct
+    new_cols['additional_revenue_needed_eoy'] = additional_revenue_needed_eoy
+    new_cols['suggested_next_purchase_amount'] = suggested_next_purchase_amount
+    new_cols['growth_engine_message'] = growth_engine_message
+
+    predictions_df = predictions_df.drop(columns=[c for c in new_cols if c in predictions_df.columns])
+    return pd.concat([predictions_df, pd.DataFrame(new_cols, index=predictions_df.index)], axis=1)
+
+
+def _top_revenue_skus_by_code(all_processed_df, n=3):
+    """
+    Top-n item codes by total revenue for every account, from one (canonical_code, item_code)
+    groupby. Returns {canonical_code: [sku, ...]} with blank SKUs skipped.
+    """
+    if 'item_code' not in all_processed_df.columns: return {}
+    sku_rev = all_processed_df.groupby(['canonical_code', 'item_code'], observed=True, sort=False)['revenue'].sum().reset_index()
+    sku_rev['item_code'] = sku_rev['item_code'].astype(str)
+    sku_rev = sku_rev[sku_rev['item_code'].str.strip() != '']
+    top_n = (
+        sku_rev.sort_values(['canonical_code', 'revenue'], ascending=[True, False], kind='stable')
+        .groupby('canonical_code', observed=True, sort=False)
+        .head(n)
+    )
+    return top_n.groupby('canonical_code', observed=True, sort=False)['item_code'].agg(list).to_dict()
 
-    logger.info(f"Finished initial metric calculations for {len(predictions)} accounts.")
-    if not predictions: return pd.DataFrame()
 
-    predictions_df = pd.DataFrame(predictions)
+def _check_prediction_columns(predictions_df, stage):
+    """canonical_code sanity check between prediction stages; the full column dump is debug-only."""
+    if 'canonical_code' not in predictions_df.columns: logger.error(f"MISSING canonical_code {stage}!")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Columns {stage}: {predictions_df.columns.tolist()}")
+
+
+def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
+    """
+    Calculates initial predictions based on full processed history.
+    """
+    logger.info(f"Calculating initial predictions for {all_processed_df['canonical_code'].nunique()} canonical codes...")
+    if all_processed_df.empty or historical_agg_df.empty:
+        logger.warning("Missing detailed or aggregated data for predictions.")
+        return pd.DataFrame()
+
+    all_processed_df['posting_date'] = pd.to_datetime(all_processed_df['posting_date'], errors='coerce')
+    all_processed_df.dropna(subset=['canonical_code', 'posting_date'], inplace=True)
+
+    shard_frames = []
+    processing_end_datetime = all_processed_df['posting_date'].max()
+    if pd.isna(processing_end_datetime): logger.error("Could not determine max posting date."); return pd.DataFrame()
+    today_for_calc = processing_end_datetime.date() # Use date part for comparisons
+    current_year_num = today_for_calc.year
+    logger.info(f"Using {today_for_calc} as reference date for historical calculations.")
+
+    logger.info(f"Computing purchase intervals for all accounts (numba={'on' if NUMBA_AVAILABLE else 'off'})...")
+    intervals_by_code = compute_account_intervals(all_processed_df, current_year_num)
+
+    # Split the yearly aggregates per account once, instead of scanning historical_agg_df per account
+    hist_by_code = {code: rows for code, rows in historical_agg_df.groupby('canonical_code', observed=True)}
+    empty_hist = historical_agg_df.iloc[0:0]
+    # Latest year's row per account, used for products_purchased here and for product coverage below
+    latest_by_acc = (
+        historical_agg_df[['canonical_code', 'year', 'yearly_products_json']]
+        .sort_values('year', ascending=False)
+        .drop_duplicates('canonical_code', keep='first')
+    )
+    latest_products_by_code = dict(zip(latest_by_acc['canonical_code'], latest_by_acc['yearly_products_json']))
+    # Top revenue SKUs are only the recommendation fallback when there is no TOP_30_SET
+    top_skus_by_code = {} if TOP_30_FS else _top_revenue_skus_by_code(all_processed_df)
+
+    # Accounts are independent, so large runs are split into contiguous shards across processes
+    all_codes = list(intervals_by_code.keys())
+    n_workers = min(PREDICTION_WORKERS, max(1, len(all_codes) // PARALLEL_MIN_ACCOUNTS_PER_WORKER))
+    if n_workers > 1:
+        logger.info(f"Calculating predictions for {len(all_codes)} accounts across {n_workers} worker processes...")
+        shard_args = []
+        for shard_codes in np.array_split(np.array(all_codes, dtype=object), n_workers):
+            shard_set = set(shard_codes)
+            shard_args.append((
+                all_processed_df[all_processed_df['canonical_code'].isin(shard_set)],
+                {code: hist_by_code[code] for code in shard_codes if code in hist_by_code},
+                empty_hist,
+                {code: intervals_by_code[code] for code in shard_codes},
+                {code: latest_products_by_code[code] for code in shard_codes if code in latest_products_by_code},
+                {code: top_skus_by_code[code] for code in shard_codes if code in top_skus_by_code},
+                processing_end_datetime,
+            ))
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                shard_frames = list(executor.map(_calc_preds_for_shard, shard_args))
+        except Exception as pool_err:
+            logger.warning(f"Parallel prediction calculation failed ({pool_err}); retrying serially.", exc_info=True)
+            shard_frames = []
+        del shard_args
+
+    if not shard_frames:
+        shard_frames = [_calc_preds_for_shard(
+            (all_processed_df, hist_by_code, empty_hist, intervals_by_code, latest_products_by_code,
+             top_skus_by_code, processing_end_datetime)
+        )]
+
+    predictions_df = pd.concat(shard_frames, ignore_index=True) if len(shard_frames) > 1 else shard_frames[0]
+    del shard_frames
+    logger.info(f"Finished initial metric calculations for {len(predictions_df)} accounts.")
+    if predictions_df.empty: return pd.DataFrame()
+
     # Explicitly check if 'canonical_code' exists after creation
     if 'canonical_code' not in predictions_df.columns:
         logger.error("CRITICAL: 'canonical_code' column missing after assembling predictions list.")
@@ -785,9 +1395,17 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
         return pd.DataFrame()
     logger.info(f"Assembled initial predictions DataFrame with shape: {predictions_df.shape}")
 
-    # ... after creating predictions_df from list ...
-    logger.info(f"Columns AFTER creating predictions_df: {predictions_df.columns.tolist()}")
-    if 'canonical_code' not in predictions_df.columns: logger.error("MISSING canonical_code AFTER DF CREATION!")
+    # Share one categorical dtype for canonical_code across the detail, historical and prediction
+    # frames so the groupbys and merges below run on integer codes
+    code_dtype = all_processed_df['canonical_code'].dtype
+    if not isinstance(code_dtype, pd.CategoricalDtype):
+        code_dtype = pd.CategoricalDtype(pd.unique(all_processed_df['canonical_code']))
+    predictions_df['canonical_code'] = predictions_df['canonical_code'].astype(object).astype(code_dtype)
+
+    # --- CYTD / PY / YEP / Pace / Growth Engine ---
+    predictions_df = _add_cytd_and_growth_columns(predictions_df, all_processed_df, historical_agg_df, processing_end_datetime)
+
+    _check_prediction_columns(predictions_df, "AFTER DF CREATION")
 
     # --- Calculate Scores ---
     logger.info("Calculating scores (RFM, Health, Priority)...")
@@ -798,24 +1416,18 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
             if col not in predictions_df.columns: predictions_df[col] = 0.0 if 'revenue' in col or 'total' in col or 'pace' in col or 'score' in col else 0 # Sensible defaults
             predictions_df[col] = pd.to_numeric(predictions_df[col], errors='coerce').fillna(0) # Fill remaining numeric NaNs with 0
 
-        logger.info(f"Columns BEFORE calculate_rfm_scores: {predictions_df.columns.tolist()}")
-        predictions_df = calculate_rfm_scores(predictions_df.copy())
-        logger.info(f"Columns AFTER calculate_rfm_scores: {predictions_df.columns.tolist()}")
-        if 'canonical_code' not in predictions_df.columns: logger.error("MISSING canonical_code AFTER RFM!")
+        predictions_df = calculate_rfm_scores(predictions_df)  # scorers copy internally
+        _check_prediction_columns(predictions_df, "AFTER RFM")
 
-        logger.info(f"Columns BEFORE calculate_health_score: {predictions_df.columns.tolist()}")
-        predictions_df = calculate_health_score(predictions_df.copy())
-        logger.info(f"Columns AFTER calculate_health_score: {predictions_df.columns.tolist()}")
-        if 'canonical_code' not in predictions_df.columns: logger.error("MISSING canonical_code AFTER HEALTH!")
-        
-        logger.info(f"Columns in predictions_df BEFORE calling enhanced_priority: {predictions_df.columns.tolist()}")
-        predictions_df = calculate_enhanced_priority_score(predictions_df.copy())
-        logger.info(f"Columns AFTER calculate_enhanced_priority_score: {predictions_df.columns.tolist()}")
-        if 'canonical_code' not in predictions_df.columns: logger.error("MISSING canonical_code AFTER ENH PRIORITY!")
+        predictions_df = calculate_health_score(predictions_df)
+        _check_prediction_columns(predictions_df, "AFTER HEALTH")
+
+        predictions_df = calculate_enhanced_priority_score(predictions_df)
+        _check_prediction_columns(predictions_df, "AFTER ENH PRIORITY")
         
         # Calculate original priority score
         if all(c in predictions_df.columns for c in ['days_overdue', 'account_total', 'purchase_frequency']):
-            predictions_df['overdue_component'] = predictions_df['days_overdue'].apply(transform_days_overdue)
+            predictions_df['overdue_component'] = transform_days_overdue_array(predictions_df['days_overdue'])
             w1, w2, w3 = 1.0, 0.001, 1.0
             predictions_df['priority_score'] = (w1 * predictions_df['overdue_component'].fillna(0) + w2 * predictions_df['account_total'].fillna(0) + w3 * predictions_df['purchase_frequency'].fillna(0))
         else: predictions_df['priority_score'] = 0.0
@@ -832,64 +1444,51 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
     
     # For Product Coverage, calculate directly from historical_agg_df
     logger.info(f"Calculating product coverage from aggregated data...")
-    logger.info(f"Using TOP_30_SET with {len(config.TOP_30_SET)} products: {list(config.TOP_30_SET)[:3]}...")
+    logger.info(f"Using TOP_30_SET with {len(TOP_30_FS)} products: {list(TOP_30_FS)[:3]}...")
     
     coverage_df_data = []
     
-    # Group by canonical_code to get latest year's products for each account
-    for canonical_code in historical_agg_df['canonical_code'].unique():
-        account_hist = historical_agg_df[historical_agg_df['canonical_code'] == canonical_code]
-        
-        # Get the most recent year's data
-        if not account_hist.empty:
-            latest_year_data = account_hist.sort_values('year', ascending=False).iloc[0]
-            
-            carried_products = []
-            products_json = latest_year_data.get('yearly_products_json')
-            
-            if products_json and products_json != '[]':
-                try:
-                    # Parse the JSON
-                    if isinstance(products_json, str):
-                        product_list = json.loads(products_json)
-                    else:
-                        product_list = products_json
-                    
-                    # Check each product against TOP_30_SET
-                    if isinstance(product_list, list):
-                        for product in product_list:
-                            product_str = str(product).strip()
-                            
-                            # Check if it's in TOP_30_SET (which now has .0 versions)
-                            if product_str in config.TOP_30_SET:
-                                carried_products.append(product_str)
-                        
-                        # Remove duplicates
-                        carried_products = list(dict.fromkeys(carried_products))
-                        
-                except (json.JSONDecodeError, TypeError) as e:
-                    logger.debug(f"Error parsing products JSON for {canonical_code}: {e}")
-            
-            # Calculate coverage percentage
-            coverage_pct = (len(carried_products) / len(config.TOP_30_SET)) * 100 if config.TOP_30_SET else 0
-            
-            # Find missing products
-            carried_set = set(carried_products)
-            missing_products = [p for p in config.TOP_30_SET if p not in carried_set]
-            
-            # Add to results
-            coverage_df_data.append({
-                'canonical_code': canonical_code,
-                'product_coverage_percentage': round(coverage_pct, 2),
-                'carried_top_products_json': json.dumps(carried_products),
-                'missing_top_products_json': json.dumps(missing_products[:10])  # Limit to save space
-            })
-    
+    # Latest year's row per account (latest_by_acc, built once above) instead of filtering historical_agg_df per account
+    for canonical_code, products_json in zip(latest_by_acc['canonical_code'], latest_by_acc['yearly_products_json']):
+        carried_products = []
+
+        if products_json and products_json != '[]':
+            try:
+                # Parse the JSON (cached per distinct string)
+                if isinstance(products_json, str):
+                    product_set = _parse_product_set(products_json)
+                else:
+                    product_set = frozenset(str(product).strip() for product in products_json)
+
+                # Intersect with TOP_30_SET (which now has .0 versions).
+                # yearly_products_json is sorted, so sorting keeps the original order.
+                carried_products = sorted(TOP_30_FS & product_set)
+
+            except (json.JSONDecodeError, TypeError) as e:
+                logger.debug(f"Error parsing products JSON for {canonical_code}: {e}")
+
+        # Calculate coverage percentage
+        coverage_pct = (len(carried_products) / len(TOP_30_FS)) * 100 if TOP_30_FS else 0
+
+        # Find missing products
+        missing_products = list(TOP_30_FS.difference(carried_products))
+
+        # Add to results
+        coverage_df_data.append({
+            'canonical_code': canonical_code,
+            'product_coverage_percentage': round(coverage_pct, 2),
+            'carried_top_products_json': _json_dumps(carried_products),
+            'missing_top_products_json': _json_dumps(missing_products[:10])  # Limit to save space
+        })
+
+    _parse_product_set.cache_clear()
+
     # Convert to DataFrame
     final_coverage = pd.DataFrame(coverage_df_data)
     
     # Log statistics
     if not final_coverage.empty:
+        final_coverage['canonical_code'] = final_coverage['canonical_code'].astype(object).astype(code_dtype)
         coverage_stats = final_coverage['product_coverage_percentage']
         accounts_with_coverage = (coverage_stats > 0).sum()
         logger.info(f"Product Coverage Results: {accounts_with_coverage}/{len(final_coverage)} accounts have >0% coverage")
@@ -908,7 +1507,7 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
     final_yoy = pd.DataFrame(columns=['canonical_code', 'yoy_revenue_growth', 'yoy_purchase_count_growth'])
     
     # === MERGE SECTION - DO THIS ONLY ONCE ===
-    logger.info(f"Columns in predictions_df BEFORE any merges: {predictions_df.columns.tolist()}")
+    _check_prediction_columns(predictions_df, "BEFORE any merges")
     
     # Merge the coverage data (ONLY ONCE!)
     if not final_coverage.empty:
@@ -929,19 +1528,20 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
         'yoy_revenue_growth': 0.0,
         'yoy_purchase_count_growth': 0.0,
         'product_coverage_percentage': 0.0,
-        'carried_top_products_json': json.dumps([]),
-        'missing_top_products_json': json.dumps([])
+        'carried_top_products_json': '[]',
+        'missing_top_products_json': '[]'
     }
     
-    for col, default_val in fill_final.items():
-        if col in predictions_df.columns:
-            nan_count_before = predictions_df[col].isnull().sum()
-            if nan_count_before > 0:
-                logger.debug(f"Filling {nan_count_before} NaNs in '{col}' with default")
-            predictions_df[col] = predictions_df[col].fillna(default_val)
-        else:
-            logger.warning(f"Column '{col}' missing after merge, adding with default.")
-            predictions_df[col] = default_val
+    missing_fill_cols = [col for col in fill_final if col not in predictions_df.columns]
+    for col in missing_fill_cols:
+        logger.warning(f"Column '{col}' missing after merge, adding with default.")
+        predictions_df[col] = fill_final[col]
+    if logger.isEnabledFor(logging.DEBUG):
+        nan_counts = predictions_df[list(fill_final)].isnull().sum()
+        for col, nan_count_before in nan_counts[nan_counts > 0].items():
+            logger.debug(f"Filling {nan_count_before} NaNs in '{col}' with default")
+    # One fillna over all the defaulted columns
+    predictions_df = predictions_df.fillna(fill_final)
     
     # === FINAL VERIFICATION ===
     # Check that we have coverage data
@@ -950,45 +1550,150 @@ def calculate_initial_predictions(all_processed_df, historical_agg_df, engine):
     logger.info(f"FINAL CHECK: {final_with_coverage}/{len(predictions_df)} accounts have >0% coverage")
     logger.info(f"FINAL CHECK: Coverage range: {final_coverage_check.min():.2f}% to {final_coverage_check.max():.2f}%")
     
+    predictions_df = _to_arrow_strings(predictions_df, PREDICTION_STRING_COLS)
     logger.info("Finished all initial prediction calculations.")
     return predictions_df
 
 
-def verify_product_coverage(engine):
+def verify_product_coverage(engine, predictions_df=None):
     """
     Verify product coverage was calculated correctly after reprocessing
     (Fixed for PostgreSQL's type requirements)
+    When the predictions_df that was just inserted is passed, the same figures are computed from it
+    in memory instead of re-reading account_predictions.
     """
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT 
-                    COUNT(*) as total_accounts,
-                    COUNT(CASE WHEN product_coverage_percentage > 0 THEN 1 END) as with_coverage,
-                    ROUND(AVG(product_coverage_percentage)::numeric, 2) as avg_coverage,
-                    ROUND(MAX(product_coverage_percentage)::numeric, 2) as max_coverage
-                FROM account_predictions
-            """)).fetchone()
-            
-            logger.info("="*60)
-            logger.info("PRODUCT COVERAGE VERIFICATION:")
-            logger.info(f"  Total accounts: {result.total_accounts}")
-            logger.info(f"  Accounts with coverage: {result.with_coverage} ({result.with_coverage*100/result.total_accounts:.1f}%)")
-            logger.info(f"  Average coverage: {result.avg_coverage}%")
-            logger.info(f"  Max coverage: {result.max_coverage}%")
-            logger.info("="*60)
+        if predictions_df is not None:
+            coverage = pd.to_numeric(predictions_df['product_coverage_percentage'], errors='coerce')
+            result = SimpleNamespace(
+                total_accounts=len(predictions_df),
+                with_coverage=int((coverage > 0).sum()),
+                avg_coverage=round(float(coverage.mean()), 2) if coverage.notna().any() else None,
+                max_coverage=round(float(coverage.max()), 2) if coverage.notna().any() else None,
+            )
+        else:
+            with engine.connect() as conn:
+                result = conn.execute(text("""
+                    SELECT 
+                        COUNT(*) as total_accounts,
+                        COUNT(CASE WHEN product_coverage_percentage > 0 THEN 1 END) as with_coverage,
+                        ROUND(AVG(product_coverage_percentage)::numeric, 2) as avg_coverage,
+                        ROUND(MAX(product_coverage_percentage)::numeric, 2) as max_coverage
+                    FROM account_predictions
+                """)).fetchone()
+
+        logger.info("="*60)
+        logger.info("PRODUCT COVERAGE VERIFICATION:")
+        logger.info(f"  Total accounts: {result.total_accounts}")
+        logger.info(f"  Accounts with coverage: {result.with_coverage} ({result.with_coverage*100/result.total_accounts:.1f}%)")
+        logger.info(f"  Average coverage: {result.avg_coverage}%")
+        logger.info(f"  Max coverage: {result.max_coverage}%")
+        logger.info("="*60)
+        
+        if result.with_coverage == 0:
+            logger.warning("⚠️ WARNING: No accounts have product coverage! Check TOP_30_SET configuration.")
+        elif result.with_coverage < result.total_accounts * 0.3:
+            logger.warning(f"⚠️ WARNING: Only {result.with_coverage*100/result.total_accounts:.1f}% of accounts have coverage. This seems low.")
+        else:
+            logger.info("✅ Product coverage looks healthy!")
             
-            if result.with_coverage == 0:
-                logger.warning("⚠️ WARNING: No accounts have product coverage! Check TOP_30_SET configuration.")
-            elif result.with_coverage < result.total_accounts * 0.3:
-                logger.warning(f"⚠️ WARNING: Only {result.with_coverage*100/result.total_accounts:.1f}% of accounts have coverage. This seems low.")
-            else:
-                logger.info("✅ Product coverage looks healthy!")
-                
     except Exception as e:
         logger.error(f"Error verifying product coverage: {e}")
 
 
+INSERT_PAGE_SIZE = 10000
+# Rows per COPY statement for the transactions table (the CSV buffer for one chunk is held in memory)
+COPY_CHUNK_ROWS = 200_000
+
+def _use_pg_bulk_path(engine):
+    """True when the engine is PostgreSQL over psycopg2, i.e. execute_values / COPY are available."""
+    return PSYCOPG2_AVAILABLE and engine.dialect.driver == 'psycopg2'
+
+
+def _db_value(v):
+    """NaN / NaT / NA -> None, numpy scalars -> Python scalars (psycopg2 cannot adapt e.g. np.int64)."""
+    if v is None or v is pd.NaT or v is pd.NA: return None
+    if isinstance(v, np.generic): v = v.item()
+    if isinstance(v, float) and v != v: return None
+    return v
+
+
+def _db_rows(df):
+    """Yields df rows as DBAPI-ready tuples, without the object-dtype copy that df.replace() makes."""
+    for row in df.itertuples(index=False, name=None):
+        yield tuple(_db_value(v) for v in row)
+
+
+def _insert_rows(engine, table, columns, df):
+    """
+    Inserts df[columns] into table in one transaction, streaming rows through _db_rows.
+    PostgreSQL + psycopg2: execute_values on the raw DBAPI connection, which sends
+    multi-row VALUES statements of INSERT_PAGE_SIZE rows instead of one statement per row.
+    Anything else: SQLAlchemy executemany with dict records.
+    """
+    rows = _db_rows(df[columns])
+    if _use_pg_bulk_path(engine):
+        # JSON/JSONB columns hold Python lists/dicts; psycopg2 would adapt a list to an ARRAY, so wrap them
+        json_idx = [i for i, c in enumerate(columns) if isinstance(table.c[c].type, JSON)]
+        if json_idx:
+            rows = (tuple(Json(v) if i in json_idx and v is not None else v for i, v in enumerate(row)) for row in rows)
+        preparer = engine.dialect.identifier_preparer
+        insert_sql = (f"INSERT INTO {preparer.format_table(table)} "
+                      f"({', '.join(preparer.quote(c) for c in columns)}) VALUES %s")
+        raw_conn = engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cur:
+                execute_values(cur, insert_sql, rows, page_size=INSERT_PAGE_SIZE)
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+    else:
+        with engine.connect() as conn:
+            trans = conn.begin()
+            conn.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+            trans.commit()
+    return len(df)
+
+
+def _copy_rows(engine, table, columns, df, raw_conn=None):
+    """
+    Streams df[columns] into table with COPY ... FROM STDIN (CSV) in one transaction.
+    PostgreSQL + psycopg2 only. Float columns that target INTEGER columns (e.g. quantity after
+    to_numeric) are written as whole numbers, since COPY does not cast '3.0' to integer the way
+    a parameterized INSERT does. Pass raw_conn to reuse one DBAPI connection across calls
+    (committed per call, left open); otherwise a connection is taken and closed here.
+    """
+    int_cols = [c.name for c in table.columns if c.name in columns and isinstance(c.type, Integer)]
+    fixed = {col: df[col].round().astype('Int64') for col in int_cols if pd.api.types.is_float_dtype(df[col])}
+    if fixed:
+        df = df.assign(**fixed)
+
+    buf = io.StringIO()
+    df[columns].to_csv(buf, index=False, header=False, na_rep='\\N')
+    buf.seek(0)
+
+    preparer = engine.dialect.identifier_preparer
+    copy_sql = (f"COPY {preparer.format_table(table)} ({', '.join(preparer.quote(c) for c in columns)}) "
+                f"FROM STDIN WITH (FORMAT CSV, NULL '\\N')")
+    own_conn = raw_conn is None
+    if own_conn:
+        raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            cur.copy_expert(copy_sql, buf)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            raw_conn.close()
+    return len(df)
+
+
 def populate_database(engine, historical_df, predictions_df, transaction_df, start_fresh=False):
     """
     Populates database tables in memory-efficient chunks, optionally clearing them first.
@@ -1034,29 +1739,32 @@ def populate_database(engine, historical_df, predictions_df, transaction_df, sta
             logger.info(f"--- Starting chunked insert for {len(transaction_df)} transactions ---")
             # Prepare DataFrame for insertion once
             trans_model_cols = [c.name for c in transaction_table.columns if c.name != 'id']
-            transaction_df_filtered = transaction_df[trans_model_cols].replace({np.nan: None, pd.NaT: None})
-
-            for i in range(0, len(transaction_df_filtered), chunk_size):
-                with engine.connect() as conn:
-                    trans = conn.begin()
-                    chunk = transaction_df_filtered.iloc[i:i + chunk_size]
-                    logger.info(f"  Inserting transaction chunk {i//chunk_size + 1}...")
-                    chunk_data = chunk.to_dict(orient='records')
-                    conn.execute(transaction_table.insert(), chunk_data)
-                    trans.commit()
-                    total_inserted_trans += len(chunk)
+            # PostgreSQL: COPY FROM STDIN per chunk (NULLs written as \N) over one connection, in larger
+            # chunks since COPY has no per-row cost; otherwise streamed parameterized inserts
+            use_copy = _use_pg_bulk_path(engine)
+            trans_chunk_size = COPY_CHUNK_ROWS if use_copy else chunk_size
+            copy_conn = engine.raw_connection() if use_copy else None
+            # Categoricals are expanded per chunk, not for the whole frame up front
+            transaction_df_filtered = transaction_df[trans_model_cols]
+
+            try:
+                for i in range(0, len(transaction_df_filtered), trans_chunk_size):
+                    chunk = _from_categorical(transaction_df_filtered.iloc[i:i + trans_chunk_size])
+                    logger.info(f"  Inserting transaction chunk {i//trans_chunk_size + 1}{' (COPY)' if use_copy else ''}...")
+                    if use_copy:
+                        total_inserted_trans += _copy_rows(engine, transaction_table, trans_model_cols, chunk, raw_conn=copy_conn)
+                    else:
+                        total_inserted_trans += _insert_rows(engine, transaction_table, trans_model_cols, chunk)
+            finally:
+                if copy_conn is not None:
+                    copy_conn.close()
             logger.info(f"--- Finished inserting {total_inserted_trans} transactions ---")
 
         # 2b: Insert Historical Data (Usually small, but chunking is safe)
         if historical_df is not None and not historical_df.empty:
             logger.info(f"--- Inserting {len(historical_df)} historical records ---")
             hist_model_cols = [c.name for c in historical_table.columns if c.name != 'id']
-            historical_data = historical_df[hist_model_cols].replace({np.nan: None, pd.NaT: None}).to_dict(orient='records')
-            with engine.connect() as conn:
-                trans = conn.begin()
-                conn.execute(historical_table.insert(), historical_data)
-                trans.commit()
-                total_inserted_hist = len(historical_data)
+            total_inserted_hist = _insert_rows(engine, historical_table, hist_model_cols, _from_categorical(historical_df[hist_model_cols]))
             logger.info(f"--- Finished inserting {total_inserted_hist} historical records ---")
 
         # 2c: Insert Predictions (Usually small, but chunking is safe)
@@ -1076,19 +1784,17 @@ def populate_database(engine, historical_df, predictions_df, transaction_df, sta
                     predictions_df[c] = None
 
             # Now safely select columns and insert
-            prediction_data = (
-                predictions_df[pred_model_cols]
-                .replace({np.nan: None, pd.NaT: None})
-                .to_dict(orient='records')
-            )
-            with engine.connect() as conn:
-                trans = conn.begin()
-                conn.execute(prediction_table.insert(), prediction_data)
-                trans.commit()
-                total_inserted_pred = len(prediction_data)
+            total_inserted_pred = _insert_rows(engine, prediction_table, pred_model_cols, _from_categorical(predictions_df[pred_model_cols]))
             logger.info(f"--- Finished inserting {total_inserted_pred} prediction records ---")
 
-        
+        # 2d: Rebuild the per-rep yearly rollup that /sales_rep_performance reads (PostgreSQL only)
+        try:
+            with engine.begin() as conn:
+                if refresh_sales_rep_rollup(conn):
+                    logger.info("Refreshed sales rep yearly rollup.")
+        except Exception as rollup_err:
+            logger.warning(f"Could not refresh sales rep yearly rollup (migration not applied?): {rollup_err}")
+
         logger.info("All data population stages completed successfully.")
         return True
 
@@ -1099,6 +1805,145 @@ def populate_database(engine, historical_df, predictions_df, transaction_df, sta
 
 
 
+def _iter_csv_chunks(file_path, chunksize, encoding='utf-8'):
+    """
+    Yields a raw CSV file as all-string DataFrame chunks (blank / NA cells missing), like
+    pd.read_csv(..., chunksize=chunksize, dtype=str). With pyarrow the file is parsed by Arrow's
+    streaming reader and chunks follow its block size (roughly chunksize rows) instead of exact
+    row counts. Invalid bytes for `encoding` raise UnicodeDecodeError on both paths.
+    """
+    if not PYARROW_AVAILABLE:
+        yield from pd.read_csv(file_path, chunksize=chunksize, dtype=str, low_memory=False, encoding=encoding, on_bad_lines='warn')
+        return
+
+    # Every column is read as string (no inference: zip codes, UPCs and card codes keep leading zeros)
+    with open(file_path, newline='', encoding=encoding) as f:
+        header = next(csv.reader(f), [])
+
+    def _skip_bad_row(row):
+        logger.warning(f"Skipping malformed row {row.number} in {os.path.basename(file_path)}: {row.text[:200]!r}")
+        return 'skip'
+
+    reader = pa_csv.open_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(encoding=encoding, block_size=max(1 << 20, chunksize * 1024)),
+        parse_options=pa_csv.ParseOptions(invalid_row_handler=_skip_bad_row),
+        convert_options=pa_csv.ConvertOptions(column_types={col: pa.string() for col in header}, strings_can_be_null=True),
+    )
+    try:
+        for batch in reader:
+            if batch.num_rows > 0:
+                # Plain object columns, so process_chunk sees the same frame shape as with pandas.
+                # split_blocks/self_destruct release each Arrow column as it is converted instead of
+                # holding the whole batch and its pandas copy at once
+                yield pa.Table.from_batches([batch]).to_pandas(split_blocks=True, self_destruct=True)
+                del batch
+    except pa.ArrowInvalid as arrow_err:
+        if 'utf8' in str(arrow_err).lower():
+            raise UnicodeDecodeError(encoding, b'', 0, 1, str(arrow_err)) from arrow_err
+        raise
+
+
+def _spill_chunk(chunk, spill_dir, part_no):
+    """Writes one processed chunk to a zstd Parquet part in spill_dir and returns its path."""
+    path = os.path.join(spill_dir, f"part-{part_no:05d}.parquet")
+    # Category sets differ per chunk, so parts are stored as plain columns and re-packed after loading
+    pa_pq.write_table(pa.Table.from_pandas(_from_categorical(chunk), preserve_index=False), path, compression='zstd')
+    return path
+
+
+def _load_spilled_chunks(paths):
+    """
+    Reads the Parquet parts written by _spill_chunk back as one DataFrame (like pd.concat(..., ignore_index=True)).
+    Parts are combined in Arrow and converted column by column, so the chunk frames and the combined
+    frame are never held in pandas at the same time.
+    """
+    # promote_options unifies parts whose columns differ or are all-null in one chunk
+    table = pa.concat_tables([pa_pq.read_table(path) for path in paths], promote_options='default')
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+_PREFETCH_DONE = object()
+
+def _prefetch(iterable, maxsize):
+    """
+    Iterates `iterable` in a background thread, keeping up to maxsize items ready, so CSV parsing
+    (C code that releases the GIL) overlaps with the consumer. An exception raised by the producer
+    (e.g. UnicodeDecodeError) is re-raised in the consumer after the items that preceded it.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def _put(entry):
+        # Gives up once the consumer has gone away, so the thread never blocks forever on a full queue
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put((item, None)): return
+            _put((_PREFETCH_DONE, None))
+        except BaseException as e:
+            _put((_PREFETCH_DONE, e))
+
+    threading.Thread(target=_produce, name='ingest-prefetch', daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _PREFETCH_DONE:
+                if error is not None: raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+# Bump when process_chunk's output changes, so --cache-dir entries written by older code are not reused
+PROCESSED_CACHE_VERSION = 1
+
+def _processed_cache_path(cache_dir, file_path):
+    """Cache file for one input CSV's processed rows, keyed by name, size and mtime (a changed file misses)."""
+    stat = os.stat(file_path)
+    return os.path.join(cache_dir, f"{os.path.basename(file_path)}-{stat.st_size}-{stat.st_mtime_ns}-v{PROCESSED_CACHE_VERSION}.parquet")
+
+
+def _write_processed_cache(part_paths, cache_path):
+    """Combines one file's spilled Parquet parts into cache_path (written to a temp name, then renamed)."""
+    table = pa.concat_tables([pa_pq.read_table(path) for path in part_paths], promote_options='default')
+    tmp_path = f"{cache_path}.tmp"
+    pa_pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, cache_path)
+
+
+def _process_chunks(raw_chunks):
+    """
+    Runs process_chunk over an iterator of raw chunks, in INGEST_WORKERS processes when there is
+    more than one core. Reading continues while earlier chunks are processed, but no more than
+    INGEST_MAX_PENDING chunks are held at once. Yields (raw_row_count, processed_chunk) in input order.
+    """
+    if INGEST_WORKERS <= 1:
+        for chunk in raw_chunks:
+            yield len(chunk), process_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=INGEST_WORKERS) as executor:
+        pending = deque()
+        for chunk in raw_chunks:
+            pending.append((len(chunk), executor.submit(process_chunk, chunk)))
+            if len(pending) >= INGEST_MAX_PENDING:
+                raw_rows, future = pending.popleft()
+                yield raw_rows, future.result()
+        while pending:
+            raw_rows, future = pending.popleft()
+            yield raw_rows, future.result()
+
+
 # === Main Execution ===
 def main():
     parser = argparse.ArgumentParser(description="Reprocess historical data and repopulate database.")
@@ -1106,6 +1951,7 @@ def main():
     parser.add_argument("--db-uri", default=None, help="Database connection string (overrides config.py).")
     parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows to process per chunk.")
     parser.add_argument("--start-fresh", action="store_true", help="DELETE data from tables before loading. USE WITH CAUTION!")
+    parser.add_argument("--cache-dir", default=None, help="Reuse processed rows of unchanged input files from this directory (requires pyarrow).")
     args = parser.parse_args()
 
     db_uri = args.db_uri
@@ -1142,55 +1988,77 @@ def main():
         sys.exit(1)
 
     all_processed_data_list = []; total_raw_rows = 0
+    # With pyarrow, processed chunks go to Parquet parts as they arrive and the list holds their paths
+    spill_dir = tempfile.mkdtemp(prefix='reprocess_history_') if PYARROW_AVAILABLE else None
+
+    def _keep_chunk(processed_chunk):
+        if spill_dir:
+            processed_chunk = _spill_chunk(processed_chunk, spill_dir, len(all_processed_data_list))
+        all_processed_data_list.append(processed_chunk)
+
+    # The per-file cache is stored in the same Parquet form as the spilled parts, so it needs pyarrow too
+    cache_dir = args.cache_dir if spill_dir else None
+    if args.cache_dir and not cache_dir:
+        logger.warning("--cache-dir needs pyarrow; processing all files without the cache.")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
     try:
         for file_path in args.raw_data_paths:
+            cache_path = _processed_cache_path(cache_dir, file_path) if cache_dir else None
+            if cache_path and os.path.exists(cache_path):
+                logger.info(f"Using cached processed rows for {file_path}: {cache_path}")
+                all_processed_data_list.append(cache_path)
+                continue
+
             logger.info(f"Processing file: {file_path}...")
+            file_start = len(all_processed_data_list)
+            file_ok = True
             try:
-                for i, chunk in enumerate(pd.read_csv(file_path, chunksize=args.chunksize, dtype=str, low_memory=False, encoding='utf-8', on_bad_lines='warn')):
-                    logger.info(f"  Processing chunk {i+1} from {os.path.basename(file_path)}...")
-                    total_raw_rows += len(chunk)
-                    # The process_chunk function now correctly calculates revenue = amount
-                    processed_chunk = process_chunk(chunk)
+                # The process_chunk function now correctly calculates revenue = amount
+                raw_chunks = _prefetch(_iter_csv_chunks(file_path, args.chunksize, encoding='utf-8'), INGEST_PREFETCH_CHUNKS)
+                for i, (raw_rows, processed_chunk) in enumerate(_process_chunks(raw_chunks)):
+                    logger.info(f"  Processed chunk {i+1} from {os.path.basename(file_path)}...")
+                    total_raw_rows += raw_rows
                     if processed_chunk is not None and not processed_chunk.empty:
-                        all_processed_data_list.append(processed_chunk)
+                        _keep_chunk(processed_chunk)
             except UnicodeDecodeError:
                  logger.warning(f"Encoding error in {file_path}, trying latin-1...")
-                 for i, chunk in enumerate(pd.read_csv(file_path, chunksize=args.chunksize, dtype=str, low_memory=False, encoding='latin-1', on_bad_lines='warn')):
-                           processed_chunk = process_chunk(chunk)
+                 # Drop chunks already taken from this file so the re-read does not duplicate them
+                 del all_processed_data_list[file_start:]
+                 raw_chunks = _prefetch(_iter_csv_chunks(file_path, args.chunksize, encoding='latin-1'), INGEST_PREFETCH_CHUNKS)
+                 for i, (raw_rows, processed_chunk) in enumerate(_process_chunks(raw_chunks)):
                            if processed_chunk is not None and not processed_chunk.empty:
-                               all_processed_data_list.append(processed_chunk)
+                               _keep_chunk(processed_chunk)
             except Exception as e_read:
                  logger.error(f"Failed to read or process chunks from {file_path}: {e_read}", exc_info=True)
+                 file_ok = False
+
+            # Only complete reads are cached; a file that failed part-way is processed again next run
+            if cache_path and file_ok and len(all_processed_data_list) > file_start:
+                try:
+                    _write_processed_cache(all_processed_data_list[file_start:], cache_path)
+                    logger.info(f"  Cached processed rows for {os.path.basename(file_path)} at {cache_path}")
+                except Exception as e_cache:
+                    logger.warning(f"Could not write processed cache for {file_path}: {e_cache}")
 
         if not all_processed_data_list: 
             logger.error("No data was processed from the input files. Exiting."); sys.exit(1)
 
         logger.info("Concatenating all processed data chunks...")
-        full_processed_df = pd.concat(all_processed_data_list, ignore_index=True)
+        if spill_dir:
+            full_processed_df = _load_spilled_chunks(all_processed_data_list)
+            shutil.rmtree(spill_dir, ignore_errors=True)
+        else:
+            full_processed_df = pd.concat(all_processed_data_list, ignore_index=True)
+        # Chunks carry different category sets, so concat falls back to object; re-pack once here
+        _to_categorical(full_processed_df)
         logger.info(f"Total valid processed transaction rows: {len(full_processed_df)}")
         del all_processed_data_list
 
         # --- NEW HASHING LOGIC ---
-        logger.info("Calculating deterministic hashes for all historical transactions...")
-        duplicate_check_cols = ['canonical_code', 'posting_date', 'item_code', 'revenue', 'quantity']
-        
-        # Ensure dtypes are correct before sorting and grouping
-        full_processed_df['posting_date'] = pd.to_datetime(full_processed_df['posting_date'], errors='coerce')
-        for col in ['item_code', 'revenue', 'quantity']:
-            # Use .get() to avoid KeyError if a column is missing
-            full_processed_df[col] = pd.to_numeric(full_processed_df.get(col), errors='coerce').fillna(0)
-
-        full_processed_df.sort_values(by=duplicate_check_cols, inplace=True, na_position='first')
-        full_processed_df['duplicate_rank'] = full_processed_df.groupby(duplicate_check_cols).cumcount()
-
-        def generate_hash(row):
-            # This function must be IDENTICAL to the one in the webhook
-            unique_string = (f"{row.get('canonical_code', '')}|{row.get('posting_date', '')}|"
-                             f"{row.get('item_code', '')}|{row.get('revenue', '')}|{row.get('quantity', '')}|"
-                             f"{row.get('duplicate_rank', '')}")
-            return hashlib.sha256(unique_string.encode()).hexdigest()
-
-        full_processed_df['transaction_hash'] = full_processed_df.apply(generate_hash, axis=1)
+        logger.info(f"Calculating deterministic hashes for all historical transactions ({TRANSACTION_HASH_ALGO}, {ssl.OPENSSL_VERSION})...")
+        full_processed_df = _add_transaction_hashes(full_processed_df)
         logger.info("Hashing complete.")
         # --- END OF NEW HASHING LOGIC ---
 
@@ -1198,6 +2066,11 @@ def main():
         historical_agg_df = aggregate_historical(full_processed_df)
         if historical_agg_df.empty: 
             logger.error("Historical aggregation failed. Exiting."); sys.exit(1)
+        # Same canonical_code categories as the detail rows (the DuckDB path returns plain strings)
+        historical_agg_df['canonical_code'] = historical_agg_df['canonical_code'].astype(object).astype(full_processed_df['canonical_code'].dtype)
+        # item_code only had to be numeric for the hash and plain for the list aggregation above;
+        # the prediction shards only group/list it, so store it as codes from here on
+        full_processed_df['item_code'] = full_processed_df['item_code'].astype('category')
 
         logger.info("Calculating initial predictions...")
         initial_predictions_df = calculate_initial_predictions(full_processed_df, historical_agg_df, engine=engine)
@@ -1205,7 +2078,7 @@ def main():
             logger.error("Initial prediction calculation failed. Exiting."); sys.exit(1)
 
         # The full_processed_df already contains all necessary columns for the transaction table
-        transaction_load_df = full_processed_df
+        transaction_load_df = _shrink_for_load(full_processed_df)
 
         logger.info("Connecting to database for final population...")
         success = populate_database(engine, historical_agg_df, initial_predictions_df, transaction_load_df, args.start_fresh)
@@ -1215,7 +2088,7 @@ def main():
 
             # Add product coverage verification
             logger.info("Verifying product coverage calculations...")
-            verify_product_coverage(engine)
+            verify_product_coverage(engine, initial_predictions_df)
 
             logger.info(f"--- Reprocessing Complete (Duration: {end_time - start_time:.2f}s) ---")
         else:
@@ -1225,6 +2098,8 @@ def main():
     except Exception as e:
         logger.error(f"A critical error occurred during reprocessing: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        if spill_dir: shutil.rmtree(spill_dir, ignore_errors=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,33 +1,64 @@
 # api_routes.py
 
-from flask import Blueprint, jsonify, request # Added request for potential future use
+from flask import Blueprint, jsonify, request, Response # Added request for potential future use
 import logging
 from sqlalchemy import select, func, distinct, or_ # Added select, func, distinct, or_
 from models import db, AccountPrediction
+from extensions import cache, is_cacheable_response, SALES_REPS_CACHE_KEY, SALES_MANAGER_OVERVIEW_CACHE_KEY
 import random # Keep for fallback in get_all_top_accounts if needed
 
+# orjson is optional: large responses are encoded with it when installed, otherwise with jsonify.
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Create blueprint
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 # Set up basic logging
 logger = logging.getLogger(__name__)
 
+# Columns the account list endpoints below serialize. Selecting just these returns light rows
+# (same attribute access as the model) instead of hydrating every AccountPrediction column.
+ACCOUNT_LIST_COLUMNS = (
+    AccountPrediction.id, AccountPrediction.canonical_code, AccountPrediction.name,
+    AccountPrediction.full_address, AccountPrediction.sales_rep_name, AccountPrediction.account_total,
+    AccountPrediction.last_purchase_date, AccountPrediction.purchase_frequency,
+    AccountPrediction.median_interval_days, AccountPrediction.days_overdue,
+    AccountPrediction.rfm_segment, AccountPrediction.health_category, AccountPrediction.health_score,
+)
+
+
+def _json_response(data):
+    """jsonify(data), but encoded by orjson (C) when available. Keys stay sorted like Flask's default encoder."""
+    if ORJSON_AVAILABLE:
+        return Response(orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY),
+                        mimetype='application/json')
+    return jsonify(data)
+
+
+def _iso_date(value):
+    """'YYYY-MM-DD' for a date/datetime (None passes through); isoformat is a fixed-layout C call, unlike strftime."""
+    return value.isoformat()[:10] if value else None
+
 
 @api_bp.route('/rep/<rep_name>/strategic-accounts', methods=['GET'])
 def get_rep_strategic_accounts(rep_name):
     """Returns strategic account information for a specific sales rep using SQLAlchemy 2.x"""
     try:
         # --- Build queries using SQLAlchemy 2.x ---
-        base_stmt = select(AccountPrediction).where(AccountPrediction.sales_rep_name == rep_name)
+        base_stmt = select(*ACCOUNT_LIST_COLUMNS).where(AccountPrediction.sales_rep_name == rep_name)
 
         stmt_champions = base_stmt.where(AccountPrediction.rfm_segment == 'Champions')
-        champions = db.session.execute(stmt_champions).scalars().all()
+        champions = db.session.execute(stmt_champions).all()
 
         stmt_at_risk = base_stmt.where(AccountPrediction.rfm_segment.in_(["At Risk", "Can't Lose"]))
-        at_risk = db.session.execute(stmt_at_risk).scalars().all()
+        at_risk = db.session.execute(stmt_at_risk).all()
 
         stmt_critical_health = base_stmt.where(AccountPrediction.health_category == 'Critical')
-        critical_health = db.session.execute(stmt_critical_health).scalars().all()
+        critical_health = db.session.execute(stmt_critical_health).all()
         # --- End Queries ---
 
         # --- Format the account data (No change needed in formatting logic) ---
@@ -37,11 +68,11 @@ def get_rep_strategic_accounts(rep_name):
                 'name': acct.name,
                 'address': acct.full_address,
                 'account_total': acct.account_total,
-                'last_purchase_date': acct.last_purchase_date.strftime('%Y-%m-%d') if acct.last_purchase_date else None,
+                'last_purchase_date': _iso_date(acct.last_purchase_date),
                 'purchase_frequency': acct.purchase_frequency,
-                'rfm_segment': acct.rfm_segment if hasattr(acct, 'rfm_segment') else None,
-                'health_category': acct.health_category if hasattr(acct, 'health_category') else None,
-                'health_score': acct.health_score if hasattr(acct, 'health_score') else None,
+                'rfm_segment': acct.rfm_segment,
+                'health_category': acct.health_category,
+                'health_score': acct.health_score,
                 'days_overdue': acct.days_overdue,
                 'recommendations': [
                     "Schedule a quarterly business review",
@@ -55,11 +86,11 @@ def get_rep_strategic_accounts(rep_name):
                 'name': acct.name,
                 'address': acct.full_address,
                 'account_total': acct.account_total,
-                'last_purchase_date': acct.last_purchase_date.strftime('%Y-%m-%d') if acct.last_purchase_date else None,
+                'last_purchase_date': _iso_date(acct.last_purchase_date),
                 'days_overdue': acct.days_overdue,
-                'rfm_segment': acct.rfm_segment if hasattr(acct, 'rfm_segment') else None,
-                'health_category': acct.health_category if hasattr(acct, 'health_category') else None,
-                'health_score': acct.health_score if hasattr(acct, 'health_score') else None,
+                'rfm_segment': acct.rfm_segment,
+                'health_category': acct.health_category,
+                'health_score': acct.health_score,
                 'purchase_frequency': acct.purchase_frequency,
                 'recommendations': [
                     "Personal call from management",
@@ -77,11 +108,11 @@ def get_rep_strategic_accounts(rep_name):
                 'name': acct.name,
                 'address': acct.full_address,
                 'account_total': acct.account_total,
-                'health_score': acct.health_score if hasattr(acct, 'health_score') else None,
-                'health_category': acct.health_category if hasattr(acct, 'health_category') else None,
+                'health_score': acct.health_score,
+                'health_category': acct.health_category,
                 'days_overdue': acct.days_overdue,
-                'rfm_segment': acct.rfm_segment if hasattr(acct, 'rfm_segment') else None,
-                'last_purchase_date': acct.last_purchase_date.strftime('%Y-%m-%d') if acct.last_purchase_date else None,
+                'rfm_segment': acct.rfm_segment,
+                'last_purchase_date': _iso_date(acct.last_purchase_date),
                 'purchase_frequency': acct.purchase_frequency,
                 'recommendations': [
                     "Immediate intervention required",
@@ -100,6 +131,7 @@ def get_rep_strategic_accounts(rep_name):
 
 
 @api_bp.route('/sales-reps', methods=['GET'])
+@cache.cached(key_prefix=SALES_REPS_CACHE_KEY, response_filter=is_cacheable_response)
 def get_sales_reps():
     """Returns a list of all sales reps using SQLAlchemy 2.x"""
     try:
@@ -117,6 +149,7 @@ def get_sales_reps():
 
 
 @api_bp.route('/sales-manager/overview', methods=['GET'])
+@cache.cached(key_prefix=SALES_MANAGER_OVERVIEW_CACHE_KEY, response_filter=is_cacheable_response)
 def get_sales_manager_overview():
     """
     Returns overview data for the sales manager dashboard using SQLAlchemy 2.x.
@@ -126,12 +159,6 @@ def get_sales_manager_overview():
     2. List of all sales reps with their key performance metrics
     """
     try:
-        # --- Get all sales reps using SQLAlchemy 2.x ---
-        rep_stmt = select(AccountPrediction.sales_rep_name).distinct()
-        sales_reps = db.session.execute(rep_stmt).scalars().all()
-        rep_names = sorted([rep for rep in sales_reps if rep and rep.strip()]) # Sort and filter
-        # --- End Get Reps ---
-
         # Initialize response data
         overview_data = {
             'summary': {
@@ -141,17 +168,18 @@ def get_sales_manager_overview():
             'rep_performance': {}
         }
 
-        # --- Get all account data once (more efficient) ---
-        all_accounts_stmt = select(AccountPrediction)
-        all_accounts = db.session.execute(all_accounts_stmt).scalars().all()
-        # --- End Get All Accounts ---
+        # --- Count and sum per rep in the DB (one row per rep instead of every account) ---
+        rep_totals_stmt = (select(AccountPrediction.sales_rep_name,
+                                  func.count(AccountPrediction.id),
+                                  func.coalesce(func.sum(AccountPrediction.account_total), 0.0))
+                           .group_by(AccountPrediction.sales_rep_name))
+        rep_totals = db.session.execute(rep_totals_stmt).all()
+        # --- End Rep Totals ---
 
-        # --- Process data in Python ---
+        # --- Merge names that only differ by whitespace (and NULL/'' -> Unassigned) in Python ---
         temp_rep_data = {}
-        for account in all_accounts:
-            rep_name = account.sales_rep_name.strip() if account.sales_rep_name else "Unassigned"
-            # Ensure rep_name exists in our distinct list if we want to exclude calculation for non-listed reps
-            # if rep_name not in rep_names and rep_name != "Unassigned": continue # Optional: skip reps not in distinct list
+        for raw_rep_name, account_count, total_revenue in rep_totals:
+            rep_name = raw_rep_name.strip() if raw_rep_name else "Unassigned"
 
             if rep_name not in temp_rep_data:
                 temp_rep_data[rep_name] = {
@@ -160,9 +188,8 @@ def get_sales_manager_overview():
                 }
 
             # Increment counts and sums
-            temp_rep_data[rep_name]['account_count'] += 1
-            current_total = account.account_total or 0.0
-            temp_rep_data[rep_name]['total_revenue'] += current_total
+            temp_rep_data[rep_name]['account_count'] += account_count
+            temp_rep_data[rep_name]['total_revenue'] += float(total_revenue or 0.0)
 
         # Populate final structure and summary
         for rep_name, data in temp_rep_data.items():
@@ -187,11 +214,11 @@ def get_rep_top_accounts(rep_name):
     """
     try:
         # --- Get top 20 accounts for this rep using SQLAlchemy 2.x ---
-        stmt = (select(AccountPrediction)
+        stmt = (select(*ACCOUNT_LIST_COLUMNS)
                 .where(AccountPrediction.sales_rep_name == rep_name)
                 .order_by(AccountPrediction.account_total.desc().nullslast())
                 .limit(20))
-        top_accounts = db.session.execute(stmt).scalars().all()
+        top_accounts = db.session.execute(stmt).all()
         # --- End Query ---
 
         if not top_accounts:
@@ -230,10 +257,10 @@ def get_rep_top_accounts(rep_name):
                 interval_factor = (expected_interval - days_since_purchase) / expected_interval if expected_interval else 0
                 wow_change = interval_factor * 10 # Simplified proxy
             if not mom_metrics:
-                if hasattr(acct, 'health_score') and acct.health_score is not None: mom_change = (acct.health_score - 50) / 5
+                if acct.health_score is not None: mom_change = (acct.health_score - 50) / 5
                 else: mom_change = wow_change / 2
             if not qoq_metrics:
-                if hasattr(acct, 'rfm_segment') and acct.rfm_segment:
+                if acct.rfm_segment:
                     segment_trends = {'Champions': 15, 'Loyal Customers': 8, 'At Risk': -10, "Can't Lose": -20, 'New Customers': 5, 'Potential Loyalists': 3}
                     base_trend = segment_trends.get(acct.rfm_segment, 0)
                     freq_adj = min(10, max(-10, (acct.purchase_frequency - 5) * 2)) if acct.purchase_frequency else 0
@@ -253,11 +280,11 @@ def get_rep_top_accounts(rep_name):
                 'name': acct.name,
                 'address': acct.full_address,
                 'account_total': acct.account_total,
-                'last_purchase_date': acct.last_purchase_date.strftime('%Y-%m-%d') if acct.last_purchase_date else None,
+                'last_purchase_date': _iso_date(acct.last_purchase_date),
                 'purchase_frequency': acct.purchase_frequency,
-                'health_score': acct.health_score if hasattr(acct, 'health_score') else None,
+                'health_score': acct.health_score,
                 'days_overdue': acct.days_overdue,
-                'rfm_segment': acct.rfm_segment if hasattr(acct, 'rfm_segment') else None,
+                'rfm_segment': acct.rfm_segment,
                 'changes': {
                     'week_over_week': wow_change,
                     'month_over_month': mom_change,
@@ -280,27 +307,30 @@ def get_all_top_accounts():
     using SQLAlchemy 2.x.
     """
     try:
-        # --- Get all sales reps using SQLAlchemy 2.x ---
-        rep_stmt = select(AccountPrediction.sales_rep_name).distinct()
-        sales_reps = db.session.execute(rep_stmt).scalars().all()
-        rep_names = sorted([rep for rep in sales_reps if rep and rep.strip()]) # Sort and filter
-        # --- End Get Reps ---
+        # --- Top 20 per rep in one windowed query (instead of one LIMIT 20 query per rep) ---
+        rn = (func.row_number()
+              .over(partition_by=AccountPrediction.sales_rep_name,
+                    order_by=AccountPrediction.account_total.desc().nullslast())
+              .label('rn'))
+        ranked = select(*ACCOUNT_LIST_COLUMNS, rn).subquery()
+        stmt = (select(*[ranked.c[col.key] for col in ACCOUNT_LIST_COLUMNS])
+                .where(ranked.c.rn <= 20)
+                .order_by(ranked.c.sales_rep_name, ranked.c.rn))
+        top_accounts = db.session.execute(stmt).all()
+        # --- End Query ---
+
+        # Group by rep, skipping NULL/blank rep names as before
+        accounts_by_rep = {}
+        for acct in top_accounts:
+            if acct.sales_rep_name and acct.sales_rep_name.strip():
+                accounts_by_rep.setdefault(acct.sales_rep_name, []).append(acct)
 
         # Initialize response data
         result = {}
 
-        # Get top accounts for each rep
-        for rep_name in rep_names:
-            # --- Query using SQLAlchemy 2.x ---
-            stmt = (select(AccountPrediction)
-                   .where(AccountPrediction.sales_rep_name == rep_name)
-                   .order_by(AccountPrediction.account_total.desc().nullslast())
-                   .limit(20))
-            accounts = db.session.execute(stmt).scalars().all()
-            # --- End Query ---
-
-            if not accounts:
-                continue
+        # Format top accounts for each rep
+        for rep_name in sorted(accounts_by_rep):
+            accounts = accounts_by_rep[rep_name]
 
             # --- Format account data (No change needed in formatting logic itself) ---
             rep_data = []
@@ -317,11 +347,11 @@ def get_all_top_accounts():
                     'name': acct.name,
                     'address': acct.full_address,
                     'account_total': acct.account_total,
-                    'last_purchase_date': acct.last_purchase_date.strftime('%Y-%m-%d') if acct.last_purchase_date else None,
+                    'last_purchase_date': _iso_date(acct.last_purchase_date),
                     'purchase_frequency': acct.purchase_frequency,
-                    'health_score': acct.health_score if hasattr(acct, 'health_score') else None,
+                    'health_score': acct.health_score,
                     'days_overdue': acct.days_overdue,
-                    'rfm_segment': acct.rfm_segment if hasattr(acct, 'rfm_segment') else None,
+                    'rfm_segment': acct.rfm_segment,
                     'changes': {
                         'week_over_week': round(wow_change, 1),
                         'month_over_month': round(mom_change, 1),
@@ -333,7 +363,7 @@ def get_all_top_accounts():
             # Add rep's data to result
             result[rep_name] = rep_data
 
-        return jsonify(result)
+        return _json_response(result)
 
     except Exception as e:
         logger.error(f"Error in get_all_top_accounts: {str(e)}", exc_info=True) # Added exc_info
@@ -1,22 +1,81 @@
 # routes/api_routes_historical.py
 
-from logging import config
-from flask import Blueprint, jsonify, request
-import pandas as pd
-import os
-import glob
+from flask import Blueprint, jsonify, request, Response, current_app
+import numpy as np
 import json
 import logging
-from sqlalchemy import select, func, desc, asc, distinct, and_, or_, outerjoin # Ensure all needed are imported
+from functools import lru_cache
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+from werkzeug.exceptions import HTTPException
+from sqlalchemy import select, func, desc, asc, distinct, and_, or_, outerjoin, text, bindparam, literal # Ensure all needed are imported
 from models import db, AccountHistoricalRevenue, AccountPrediction, AccountSnapshot # Added AccountSnapshot
+from config import CURRENT_YEAR_PARTNER_CODES
+from extensions import cache, historical_cache_key, historical_etag, is_cacheable_response, skip_cache
+
+# orjson is optional: the account history and account list responses are encoded with it when installed,
+# otherwise with jsonify.
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Partner accounts (by base card code), for the is_partner flag. Frozen once at import instead of
+# being looked up on every request.
+PARTNER_CODES = frozenset(CURRENT_YEAR_PARTNER_CODES or ())
+
 # Create blueprint
 api_historical_bp = Blueprint('api_historical', __name__, url_prefix='/api/sales-manager')
 
 
+# Conditional GET only for the views behind cache.cached(): their ETag is the cache key, so a 304 is never
+# staler than the cached body would be. The uncached views (account history, yoy_growth) always re-query.
+CONDITIONAL_GET_ENDPOINTS = {
+    'api_historical.get_top_accounts_by_rep',
+    'api_historical.get_sales_rep_performance',
+    'api_historical.get_available_years',
+}
+
+
+def _uses_etag():
+    return request.method == 'GET' and request.endpoint in CONDITIONAL_GET_ENDPOINTS and not skip_cache()
+
+
+@api_historical_bp.before_request
+def _not_modified():
+    """Conditional GET: answer 304 before running the view when the client's ETag is still current."""
+    if not _uses_etag():
+        return None
+    etag = historical_etag()
+    if etag and etag in request.if_none_match:
+        response = Response(status=304)
+        return _set_http_cache_headers(response, etag)
+    return None
+
+
+@api_historical_bp.after_request
+def _add_etag(response):
+    """Tags successful GET responses with the current ETag (see _not_modified)."""
+    if response.status_code == 200 and _uses_etag():
+        etag = historical_etag()
+        if etag:
+            _set_http_cache_headers(response, etag)
+    return response
+
+
+def _set_http_cache_headers(response, etag):
+    # private: per-user dashboard data, not for shared caches; no-cache: clients revalidate every time
+    # (a cheap 304) instead of serving a copy that may predate the latest webhook load
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
 def get_base_code_from_canonical(canonical_code):
     """Extracts base code, handling potential None input."""
     if not canonical_code or not isinstance(canonical_code, str):
@@ -26,6 +85,115 @@ def get_base_code_from_canonical(canonical_code):
     return parts[0] if parts else None
 
 
+@lru_cache(maxsize=65536)
+def _cached_base_code(canonical_code):
+    """get_base_code_from_canonical, memoized: the same accounts come back on every dashboard request."""
+    return get_base_code_from_canonical(canonical_code)
+
+
+def _is_partner(canonical_code, partner_codes_set):
+    """True when the account's base code is in partner_codes_set (one split + one lookup per row)."""
+    base_code = _cached_base_code(canonical_code)
+    return bool(base_code) and base_code in partner_codes_set
+
+
+# Fixed statements, built once at import; per request only their bound parameters change
+# Yearly rows of one account, plus whether the account has a prediction row, in one round trip: the history
+# is LEFT JOINed onto a one-row source, so an account without history still yields one row (year NULL)
+# carrying account_exists. Off PostgreSQL the product lists come along, to be categorized in Python.
+# products_unparsed flags rows that only have yearly_products_json (no parsed list yet).
+_ONE_ROW = select(literal(1).label('one')).subquery()
+HISTORY_STMT = select(
+    AccountHistoricalRevenue.year,
+    AccountHistoricalRevenue.total_revenue,
+    AccountHistoricalRevenue.transaction_count,
+    select(AccountPrediction.id).where(AccountPrediction.canonical_code == bindparam('canonical_code')).exists().label('account_exists'),
+    and_(AccountHistoricalRevenue.yearly_products_parsed.is_(None),
+         AccountHistoricalRevenue.yearly_products_json.isnot(None)).label('products_unparsed')
+).select_from(_ONE_ROW).outerjoin(
+    AccountHistoricalRevenue, AccountHistoricalRevenue.canonical_code == bindparam('canonical_code')
+).order_by(
+    AccountHistoricalRevenue.year.asc()
+)
+HISTORY_WITH_PRODUCTS_STMT = HISTORY_STMT.add_columns(
+    AccountHistoricalRevenue.yearly_products_parsed, # Already-parsed SKU list (JSON/JSONB)
+    AccountHistoricalRevenue.yearly_products_json # Fallback for rows written before the parsed column existed
+)
+MAX_YEAR_STMT = select(func.max(AccountHistoricalRevenue.year))
+YEARS_STMT = select(distinct(AccountHistoricalRevenue.year)).order_by(AccountHistoricalRevenue.year.asc())
+
+
+# /sales_rep_performance on PostgreSQL: the same (year, rep, rep name) groups as the base-table query,
+# recombined from the sales_rep_yearly_rollup materialized view (see models.SALES_REP_ROLLUP_VIEW).
+# Distinct account counts add up across distributor groups since each account has one prediction.
+REP_ROLLUP_PERFORMANCE_SQL = text("""
+    SELECT year,
+           sales_rep,
+           sales_rep_name,
+           SUM(total_revenue) AS total_revenue,
+           SUM(account_count)::bigint AS account_count,
+           (SUM(health_score_sum) / NULLIF(SUM(health_score_count), 0))::double precision AS avg_health_score
+    FROM sales_rep_yearly_rollup
+    WHERE year IN (:year, :prev_year)
+      AND (year = :prev_year OR has_prediction)
+      AND (CAST(:distributor AS TEXT) IS NULL OR distributor = :distributor)
+    GROUP BY year, sales_rep, sales_rep_name
+""")
+
+
+def _json_response(data):
+    """jsonify(data), but encoded by orjson (C) when available. Keys stay sorted like Flask's default encoder."""
+    if ORJSON_AVAILABLE:
+        return Response(orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY),
+                        mimetype='application/json')
+    return jsonify(data)
+
+
+# PostgreSQL: one row per (year, SKU) of an account with the year the SKU was first bought, so
+# "new" (year == first_seen_year) vs "reordered" is decided in the query. Ordered by year and then
+# SKU in byte order (COLLATE "C"), i.e. the same order Python's sorted() gives. Reads only
+# yearly_products_parsed: accounts with rows that lack it go through _row_products instead.
+ACCOUNT_PRODUCT_YEARS_SQL = text("""
+    WITH products AS (
+        SELECT DISTINCT h.year, p.value #>> '{}' AS product
+        FROM account_historical_revenues h
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(h.yearly_products_parsed) = 'array' THEN h.yearly_products_parsed ELSE '[]'::jsonb END
+        ) AS p(value)
+        WHERE h.canonical_code = :canonical_code
+          AND jsonb_typeof(p.value) = 'string'
+          AND btrim(p.value #>> '{}') <> ''
+    )
+    SELECT year, product, MIN(year) OVER (PARTITION BY product) AS first_seen_year
+    FROM products
+    ORDER BY year, product COLLATE "C"
+""")
+
+
+def _row_products(row, canonical_code):
+    """
+    Sorted, de-duplicated list of SKUs for one yearly history row. Uses the pre-parsed
+    yearly_products_parsed list; only rows that predate that column fall back to decoding
+    yearly_products_json. Ingest stores the lists sorted and unique, so they are only re-sorted
+    when that does not hold.
+    """
+    products = row.yearly_products_parsed
+    if products is None and row.yearly_products_json:
+        try:
+            products = json.loads(row.yearly_products_json)
+        except (TypeError, json.JSONDecodeError):
+            logger.warning(f"Could not decode products_json for {canonical_code} year {row.year}. Invalid JSON: '{str(row.yearly_products_json)[:100]}...'")
+            return []
+    if not isinstance(products, list):
+        if products is not None:
+            logger.warning(f"Products for {canonical_code} year {row.year} are of type {type(products)} instead of list.")
+        return []
+    products = [p for p in products if isinstance(p, str) and p.strip()]
+    if any(a >= b for a, b in zip(products, products[1:])):
+        products = sorted(set(products))
+    return products
+
+
 @api_historical_bp.route('/accounts/<path:canonical_code>/history', methods=['GET']) # Renamed card_code to canonical_code
 def get_account_history(canonical_code): # Renamed card_code to canonical_code
     """
@@ -45,62 +213,51 @@ def get_account_history(canonical_code): # Renamed card_code to canonical_code
     found_history_or_account = False
 
     try:
-        # --- Query using SQLAlchemy 2.x ---
-        stmt = select(
-            AccountHistoricalRevenue.year,
-            AccountHistoricalRevenue.total_revenue,
-            AccountHistoricalRevenue.transaction_count,
-            AccountHistoricalRevenue.yearly_products_json # Fetch the JSON string
-        ).where(
-            # Use canonical_code for filtering
-            AccountHistoricalRevenue.canonical_code == canonical_code
-        ).order_by(
-            AccountHistoricalRevenue.year.asc()
-        )
-        # Execute and get results as Row objects
-        yearly_data_db_rows = db.session.execute(stmt).all()
+        # On PostgreSQL the products are categorized by ACCOUNT_PRODUCT_YEARS_SQL; elsewhere they are
+        # fetched with the yearly rows and categorized below.
+        categorize_in_db = db.engine.dialect.name == 'postgresql'
+        stmt = HISTORY_STMT if categorize_in_db else HISTORY_WITH_PRODUCTS_STMT
+        # Execute and get results as Row objects (always at least one row, see HISTORY_STMT)
+        history_rows = db.session.execute(stmt, {'canonical_code': canonical_code}).all()
+        if categorize_in_db and any(row.products_unparsed for row in history_rows):
+            # ACCOUNT_PRODUCT_YEARS_SQL only reads the parsed lists; an account with rows that only have the
+            # JSON text (invalid text is left unparsed) is categorized in Python, which decodes the text
+            categorize_in_db = False
+            history_rows = db.session.execute(HISTORY_WITH_PRODUCTS_STMT, {'canonical_code': canonical_code}).all()
+        account_exists = bool(history_rows[0].account_exists)
+        yearly_data_db_rows = [row for row in history_rows if row.year is not None]
         # --- End Query ---
 
         if yearly_data_db_rows:
             found_history_or_account = True
             # Process Row objects (access by attribute name or index)
             response_data["yearly_history"]["years"] = [row.year for row in yearly_data_db_rows]
-            response_data["yearly_history"]["revenue"] = [float(row.total_revenue) if row.total_revenue else 0.0 for row in yearly_data_db_rows]
-            response_data["yearly_history"]["transactions"] = [int(row.transaction_count) if row.transaction_count else 0 for row in yearly_data_db_rows]
-
-            # --- Categorize Products By Year (No change needed in Python logic) ---
-            products_by_year_categorized = {}
-            seen_products_so_far = set()
-
-            for row in yearly_data_db_rows: # Iterate through Row objects
-                year = row.year
-                year_str = str(year)
-                current_year_products_set = set()
-                products_json_string = row.yearly_products_json # Access JSON string
-
-                # Robust JSON Parsing Logic (remains the same)
-                if products_json_string:
-                    try:
-                        if isinstance(products_json_string, str):
-                            loaded_list = json.loads(products_json_string)
-                            if isinstance(loaded_list, list):
-                                current_year_products_set = set(p for p in loaded_list if isinstance(p, str) and p.strip())
-                            else: logger.warning(f"Parsed products JSON for {canonical_code} year {year}, but got type {type(loaded_list)} instead of list.")
-                        else: logger.warning(f"products_json for {canonical_code} year {year} is not a string (type: {type(products_json_string)}). Skipping parse.")
-                    except json.JSONDecodeError: logger.warning(f"Could not decode products_json for {canonical_code} year {year}. Invalid JSON: '{str(products_json_string)[:100]}...'")
-                    except Exception as e: logger.error(f"Unexpected error parsing products_json for {canonical_code} year {year}: {e}", exc_info=False)
-
-                # Calculate categories
-                new_this_year = list(current_year_products_set - seen_products_so_far)
-                reordered_this_year = list(current_year_products_set.intersection(seen_products_so_far))
-
-                # Store categorized data
-                products_by_year_categorized[year_str] = {
-                    "all": sorted(list(current_year_products_set)),
-                    "new": sorted(new_this_year),
-                    "reordered": sorted(reordered_this_year)
-                }
-                seen_products_so_far.update(current_year_products_set)
+            # FLOAT / INTEGER columns already arrive as Python float / int from the driver; only NULLs need replacing
+            response_data["yearly_history"]["revenue"] = [row.total_revenue or 0.0 for row in yearly_data_db_rows]
+            response_data["yearly_history"]["transactions"] = [row.transaction_count or 0 for row in yearly_data_db_rows]
+
+            # --- Categorize Products By Year ---
+            if categorize_in_db:
+                products_by_year_categorized = {str(row.year): {"all": [], "new": [], "reordered": []} for row in yearly_data_db_rows}
+                # Rows arrive ordered by (year, SKU), so appending keeps every list sorted
+                for row in db.session.execute(ACCOUNT_PRODUCT_YEARS_SQL, {"canonical_code": canonical_code}):
+                    bucket = products_by_year_categorized[str(row.year)]
+                    bucket["all"].append(row.product)
+                    bucket["new" if row.year == row.first_seen_year else "reordered"].append(row.product)
+            else:
+                products_by_year_categorized = {}
+                seen_products_so_far = set()
+
+                for row in yearly_data_db_rows: # Iterate through Row objects
+                    current_year_products = _row_products(row, canonical_code)
+
+                    # Store categorized data; filtering the sorted list keeps "new"/"reordered" sorted too
+                    products_by_year_categorized[str(row.year)] = {
+                        "all": current_year_products,
+                        "new": [p for p in current_year_products if p not in seen_products_so_far],
+                        "reordered": [p for p in current_year_products if p in seen_products_so_far]
+                    }
+                    seen_products_so_far.update(current_year_products)
             # --- End Categorization ---
 
             response_data["products_by_year"] = products_by_year_categorized
@@ -108,10 +265,7 @@ def get_account_history(canonical_code): # Renamed card_code to canonical_code
 
         else:
             logger.warning(f"No yearly records found in DB for account {canonical_code}")
-            # --- Check if account exists in Prediction table using canonical_code (v2.x) ---
-            exists_stmt = select(AccountPrediction.id).where(AccountPrediction.canonical_code == canonical_code).limit(1)
-            account_exists = db.session.execute(exists_stmt).scalar_one_or_none() is not None
-            # --- End Check ---
+            # account_exists (is there a prediction row?) came back with the history query
             if account_exists:
                 found_history_or_account = True
                 logger.info(f"Account {canonical_code} exists but has no historical data.")
@@ -120,14 +274,39 @@ def get_account_history(canonical_code): # Renamed card_code to canonical_code
                  return jsonify({"error": f"Account with canonical_code {canonical_code} not found."}), 404
 
         # Return 200 OK with potentially empty history/products if account exists
-        return jsonify(response_data)
+        return _json_response(response_data)
 
     except Exception as db_err:
         logger.error(f"Database error fetching history for {canonical_code}: {str(db_err)}", exc_info=True)
         return jsonify({"error": "An internal server error occurred while fetching account history."}), 500
 
 
+# Rows fetched per round trip when streaming /top_accounts_by_rep results
+TOP_ACCOUNTS_YIELD_PER = 1000
+
+
+def _top_account_record(row, partner_codes_set):
+    """
+    One account entry of /top_accounts_by_rep, built from a Row of the top-accounts query.
+    Revenue / scores are FLOAT columns (Python floats from the driver, never Decimal), so no float() calls.
+    """
+    return {
+        'canonical_code': row.canonical_code,
+        'name': row.prediction_name or row.historical_name,
+        'sales_rep': row.sales_rep,
+        'sales_rep_name': row.sales_rep_name,
+        'yearly_revenue': row.yearly_revenue or 0.0,
+        'transaction_count': row.yearly_transaction_count or 0,
+        'distributor': row.distributor,
+        'health_score': row.health_score or None,
+        'health_category': row.health_category,
+        'yoy_growth': row.yoy_revenue_growth or None,
+        'is_partner': _is_partner(row.canonical_code, partner_codes_set)
+    }
+
+
 @api_historical_bp.route('/top_accounts_by_rep', methods=['GET'])
+@cache.cached(timeout=600, make_cache_key=historical_cache_key, unless=skip_cache, response_filter=is_cacheable_response)
 def get_top_accounts_by_rep():
     """
     Get the top accounts by YEARLY revenue for each sales rep using SQLAlchemy 2.x
@@ -149,8 +328,7 @@ def get_top_accounts_by_rep():
         # Determine the year to query (SQLAlchemy 2.x)
         if not year:
             # Use select() and scalar() for max year
-            max_year_stmt = select(func.max(AccountHistoricalRevenue.year))
-            max_year_result = db.session.scalar(max_year_stmt)
+            max_year_result = db.session.scalar(MAX_YEAR_STMT)
             # --- End Query ---
             if not max_year_result:
                 logger.warning("No historical data found to determine max year.")
@@ -205,45 +383,37 @@ def get_top_accounts_by_rep():
              stmt = stmt.where(*conditions) # Apply collected conditions
         # --- End Optional Filters ---
 
-        # Order for ranking within reps and overall sorting
-        stmt = stmt.order_by(
-            AccountHistoricalRevenue.sales_rep.asc().nullsfirst(), # Keep unassigned together
-            desc('yearly_revenue').nullslast() # NULL revenue last
-        )
+        if not sales_rep_id:
+            # --- Top N per rep in SQL: rank within each rep and keep rn <= limit ---
+            # NULL and '' reps share one partition (both are reported as __UNASSIGNED__), NULL rows first as before
+            rn = (func.row_number()
+                  .over(partition_by=func.coalesce(AccountHistoricalRevenue.sales_rep, ''),
+                        order_by=(AccountHistoricalRevenue.sales_rep.asc().nullsfirst(),
+                                  AccountHistoricalRevenue.total_revenue.desc().nullslast()))
+                  .label('rn'))
+            ranked = stmt.add_columns(rn).subquery()
+            stmt = (select(*[c for c in ranked.c if c.key != 'rn'])
+                    .where(ranked.c.rn <= limit)
+                    .order_by(ranked.c.sales_rep.asc().nullsfirst(), ranked.c.rn))
+        else:
+            # Single rep / unassigned group: already sorted by revenue descending, so LIMIT in SQL
+            stmt = stmt.order_by(
+                AccountHistoricalRevenue.sales_rep.asc().nullsfirst(), # Keep unassigned together
+                desc('yearly_revenue').nullslast() # NULL revenue last
+            ).limit(limit)
 
-        # Execute the query to get all relevant accounts as Row objects
-        all_results_rows = db.session.execute(stmt).all()
-        logger.info(f"Query returned {len(all_results_rows)} total rows before applying limit per rep.")
-        partner_codes_set = getattr(config, 'CURRENT_YEAR_PARTNER_CODES', set()) # Get set from config
+        # Stream the (already limited) accounts in batches of TOP_ACCOUNTS_YIELD_PER rows (server-side cursor on
+        # PostgreSQL) and turn each row into its response entry as it arrives, instead of holding every Row first
+        results = db.session.execute(stmt, execution_options={'yield_per': TOP_ACCOUNTS_YIELD_PER})
+        partner_codes_set = PARTNER_CODES
 
 
-        # --- Process results (No change needed in Python logic) ---
+        # --- Process results ---
         final_accounts_by_rep = {}
-        if not sales_rep_id: # Group by rep and apply limit
-            for row in all_results_rows: # Iterate Row objects
+        if not sales_rep_id: # Group by rep (the per-rep limit was applied in SQL)
+            for row in results: # Iterate Row objects
                 rep_key = row.sales_rep if row.sales_rep else "__UNASSIGNED__"
-                if rep_key not in final_accounts_by_rep:
-                    final_accounts_by_rep[rep_key] = []
-
-                if len(final_accounts_by_rep[rep_key]) < limit:
-                     account_data = {
-                        # Access data by attribute name from Row object
-                        'canonical_code': row.canonical_code,
-                        'name': row.prediction_name or row.historical_name,
-                        'sales_rep': row.sales_rep,
-                        'sales_rep_name': row.sales_rep_name,
-                        'yearly_revenue': float(row.yearly_revenue) if row.yearly_revenue else 0.0,
-                        'transaction_count': int(row.yearly_transaction_count) if row.yearly_transaction_count else 0,
-                        'distributor': row.distributor,
-                        'health_score': float(row.health_score) if row.health_score else None,
-                        'health_category': row.health_category,
-                        'yoy_growth': float(row.yoy_revenue_growth) if row.yoy_revenue_growth else None,
-                        'is_partner': bool(
-                            get_base_code_from_canonical(row.canonical_code) and \
-                            get_base_code_from_canonical(row.canonical_code) in partner_codes_set
-                        )
-                     }
-                     final_accounts_by_rep[rep_key].append(account_data)
+                final_accounts_by_rep.setdefault(rep_key, []).append(_top_account_record(row, partner_codes_set))
 
             # Format response for multiple reps
             response = {
@@ -263,25 +433,7 @@ def get_top_accounts_by_rep():
             }
 
         else: # Specific sales rep requested, just take top N results overall
-            single_rep_accounts = []
-            for row in all_results_rows[:limit]: # Already sorted by revenue descending
-                account_data = {
-                    'canonical_code': row.canonical_code,
-                    'name': row.prediction_name or row.historical_name,
-                    'sales_rep': row.sales_rep,
-                    'sales_rep_name': row.sales_rep_name,
-                    'yearly_revenue': float(row.yearly_revenue) if row.yearly_revenue else 0.0,
-                    'transaction_count': int(row.yearly_transaction_count) if row.yearly_transaction_count else 0,
-                    'distributor': row.distributor,
-                    'health_score': float(row.health_score) if row.health_score else None,
-                    'health_category': row.health_category,
-                    'yoy_growth': float(row.yoy_revenue_growth) if row.yoy_revenue_growth else None,
-                    'is_partner': bool(
-                        get_base_code_from_canonical(row.canonical_code) and \
-                        get_base_code_from_canonical(row.canonical_code) in partner_codes_set
-                    )
-                 }
-                single_rep_accounts.append(account_data)
+            single_rep_accounts = [_top_account_record(row, partner_codes_set) for row in results] # Already sorted and limited in SQL
 
             # Format response for a single rep/group
             rep_name_display = 'Unassigned Accounts' if sales_rep_id == '__UNASSIGNED__' else (single_rep_accounts[0]['sales_rep_name'] if single_rep_accounts else 'Unknown')
@@ -295,14 +447,25 @@ def get_top_accounts_by_rep():
                 'accounts': single_rep_accounts
             }
 
-        return jsonify(response)
+        return _json_response(response)
 
     except Exception as e:
         logger.error(f"Error retrieving top accounts by rep: {str(e)}", exc_info=True)
         return jsonify({"error": "An internal error occurred while retrieving top accounts."}), 500
 
 
+def _yoy_growth_pct(current, prev):
+    """
+    Element-wise YoY growth in percent: (current - prev) / prev * 100 where prev > 0,
+    100.0 where only the current value is positive, 0.0 otherwise.
+    """
+    has_prev = prev > 0
+    ratio = np.divide(current - prev, prev, out=np.zeros_like(current), where=has_prev)
+    return np.where(has_prev, ratio * 100, np.where(current > 0, 100.0, 0.0))
+
+
 @api_historical_bp.route('/sales_rep_performance', methods=['GET'])
+@cache.cached(timeout=600, make_cache_key=historical_cache_key, unless=skip_cache, response_filter=is_cacheable_response)
 def get_sales_rep_performance():
     """
     Get performance metrics for sales reps based on YEARLY historical data
@@ -319,99 +482,99 @@ def get_sales_rep_performance():
 
         # Determine the year to query (SQLAlchemy 2.x)
         if not year:
-            max_year_stmt = select(func.max(AccountHistoricalRevenue.year))
-            max_year_result = db.session.scalar(max_year_stmt)
+            max_year_result = db.session.scalar(MAX_YEAR_STMT)
             if not max_year_result:
                 return jsonify({"error": "No historical data available"}), 404
             year = int(max_year_result)
         prev_year = year - 1
         logger.info(f"Fetching sales rep performance for year={year}, prev_year={prev_year}, distributor='{distributor}' (v2.x)")
 
-        # --- Query for Current Year Performance (SQLAlchemy 2.x) ---
-        current_stmt = select(
-            AccountHistoricalRevenue.sales_rep,
-            AccountPrediction.sales_rep_name,
-            func.sum(AccountHistoricalRevenue.total_revenue).label('total_revenue'),
-            # Count distinct canonical codes for accurate account count
-            func.count(func.distinct(AccountHistoricalRevenue.canonical_code)).label('account_count'),
-            func.avg(AccountPrediction.health_score).label('avg_health_score')
-        ).select_from(AccountHistoricalRevenue).join(
-            AccountPrediction,
-            # Join on canonical_code
-            AccountHistoricalRevenue.canonical_code == AccountPrediction.canonical_code
-        ).where(
-            AccountHistoricalRevenue.year == year
-        )
-        if distributor:
-            current_stmt = current_stmt.where(AccountPrediction.distributor == distributor)
-
-        current_stmt = current_stmt.group_by(
-            AccountHistoricalRevenue.sales_rep,
-            AccountPrediction.sales_rep_name
-        )
-        current_results = db.session.execute(current_stmt).all() # Get Row objects
-        current_perf_dict = {}
-        for res in current_results:
-            rep_key = res.sales_rep if res.sales_rep else "__UNASSIGNED__"
-            current_perf_dict[rep_key] = {
-                'sales_rep_name': res.sales_rep_name if res.sales_rep else 'Unassigned Accounts',
-                'total_revenue': res.total_revenue,
-                'account_count': res.account_count,
-                'avg_health_score': res.avg_health_score
-            }
-
-        # --- Query for Previous Year Performance (SQLAlchemy 2.x) ---
-        prev_stmt = select(
-            AccountHistoricalRevenue.sales_rep,
-            func.sum(AccountHistoricalRevenue.total_revenue).label('prev_revenue'),
-            # Count distinct canonical codes for accurate account count
-            func.count(func.distinct(AccountHistoricalRevenue.canonical_code)).label('prev_account_count')
-        ).select_from(AccountHistoricalRevenue)
+        if db.engine.dialect.name == 'postgresql':
+            # Same rows from the pre-aggregated rollup (refreshed after every load) instead of the base tables
+            perf_results = db.session.execute(REP_ROLLUP_PERFORMANCE_SQL, {
+                'year': year, 'prev_year': prev_year, 'distributor': distributor or None
+            }).all()
+        else:
+            # --- One query for both years (SQLAlchemy 2.x) ---
+            # Grouped by (year, rep, rep name). Predictions are outer-joined so previous-year accounts without a
+            # prediction row still count (as the old separate prev-year query did); current-year rows need one.
+            perf_stmt = select(
+                AccountHistoricalRevenue.year,
+                AccountHistoricalRevenue.sales_rep,
+                AccountPrediction.sales_rep_name,
+                func.sum(AccountHistoricalRevenue.total_revenue).label('total_revenue'),
+                # Count distinct canonical codes for accurate account count
+                func.count(func.distinct(AccountHistoricalRevenue.canonical_code)).label('account_count'),
+                func.avg(AccountPrediction.health_score).label('avg_health_score')
+            ).select_from(AccountHistoricalRevenue).outerjoin(
+                AccountPrediction,
+                # Join on canonical_code
+                AccountHistoricalRevenue.canonical_code == AccountPrediction.canonical_code
+            ).where(
+                AccountHistoricalRevenue.year.in_([year, prev_year]),
+                or_(AccountHistoricalRevenue.year == prev_year, AccountPrediction.canonical_code.isnot(None))
+            )
+            if distributor:
+                perf_stmt = perf_stmt.where(AccountPrediction.distributor == distributor)
 
-        # Conditional join for distributor filter
-        prev_conditions = [AccountHistoricalRevenue.year == prev_year]
-        if distributor:
-            prev_stmt = prev_stmt.join(
-                AccountPrediction, AccountHistoricalRevenue.canonical_code == AccountPrediction.canonical_code
+            perf_stmt = perf_stmt.group_by(
+                AccountHistoricalRevenue.year,
+                AccountHistoricalRevenue.sales_rep,
+                AccountPrediction.sales_rep_name
             )
-            prev_conditions.append(AccountPrediction.distributor == distributor)
+            perf_results = db.session.execute(perf_stmt).all() # Get Row objects
 
-        prev_stmt = prev_stmt.where(*prev_conditions).group_by(
-            AccountHistoricalRevenue.sales_rep
-        )
-        prev_results = db.session.execute(prev_stmt).all() # Get Row objects
-        prev_perf_dict = { (row.sales_rep if row.sales_rep else "__UNASSIGNED__"): row for row in prev_results }
+        current_perf_dict = {}
+        prev_by_rep = {}
+        for res in perf_results:
+            if res.year == year:
+                rep_key = res.sales_rep if res.sales_rep else "__UNASSIGNED__"
+                current_perf_dict[rep_key] = {
+                    'sales_rep_name': res.sales_rep_name if res.sales_rep else 'Unassigned Accounts',
+                    'total_revenue': res.total_revenue,
+                    'account_count': res.account_count,
+                    'avg_health_score': res.avg_health_score
+                }
+            else:
+                # Previous year is reported per rep: fold the rep-name groups together. Each account has a
+                # single prediction (one name), so the distinct account counts of the groups simply add up.
+                prev_revenue, prev_account_count = prev_by_rep.get(res.sales_rep, (None, 0))
+                if res.total_revenue is not None:
+                    prev_revenue = (prev_revenue or 0.0) + res.total_revenue
+                prev_by_rep[res.sales_rep] = (prev_revenue, prev_account_count + (res.account_count or 0))
+
+        prev_perf_dict = {
+            (sales_rep if sales_rep else "__UNASSIGNED__"): SimpleNamespace(prev_revenue=prev_revenue, prev_account_count=prev_account_count)
+            for sales_rep, (prev_revenue, prev_account_count) in prev_by_rep.items()
+        }
         # --- End Queries ---
 
-        # --- Combine and Calculate YoY (No change needed in Python logic) ---
-        combined_performance = []
-        for rep_key, current_data in current_perf_dict.items():
-            prev_data = prev_perf_dict.get(rep_key)
-            prev_revenue = float(prev_data.prev_revenue) if prev_data and prev_data.prev_revenue else 0.0
-            prev_accounts = int(prev_data.prev_account_count) if prev_data and prev_data.prev_account_count else 0
-            current_revenue = float(current_data.get('total_revenue', 0.0))
-            current_accounts = int(current_data.get('account_count', 0))
-
-            # Calculate YoY Revenue Growth
-            if prev_revenue > 0: revenue_growth = ((current_revenue - prev_revenue) / prev_revenue) * 100
-            elif current_revenue > 0: revenue_growth = 100.0
-            else: revenue_growth = 0.0
-
-            # Calculate YoY Account Growth
-            if prev_accounts > 0: account_growth = ((current_accounts - prev_accounts) / prev_accounts) * 100
-            elif current_accounts > 0: account_growth = 100.0
-            else: account_growth = 0.0
+        # --- Combine and Calculate YoY ---
+        # One array per metric, aligned on the current-year reps; growth is computed for all reps at once
+        rep_keys = list(current_perf_dict)
+        prev_rows = [prev_perf_dict.get(rep_key) for rep_key in rep_keys]
+        current_revenue = np.array([float(current_perf_dict[k].get('total_revenue') or 0.0) for k in rep_keys], dtype=float)
+        current_accounts = np.array([int(current_perf_dict[k].get('account_count') or 0) for k in rep_keys], dtype=float)
+        prev_revenue = np.array([float(r.prev_revenue) if r and r.prev_revenue else 0.0 for r in prev_rows], dtype=float)
+        prev_accounts = np.array([int(r.prev_account_count) if r and r.prev_account_count else 0 for r in prev_rows], dtype=float)
 
+        revenue_growth = _yoy_growth_pct(current_revenue, prev_revenue)
+        account_growth = _yoy_growth_pct(current_accounts, prev_accounts)
+
+        combined_performance = []
+        for i, rep_key in enumerate(rep_keys):
+            current_data = current_perf_dict[rep_key]
+            has_prev = prev_rows[i] is not None
             combined_performance.append({
                 'sales_rep': rep_key if rep_key != "__UNASSIGNED__" else None,
                 'sales_rep_name': current_data.get('sales_rep_name'),
-                'total_revenue': current_revenue,
-                'account_count': current_accounts,
+                'total_revenue': float(current_revenue[i]),
+                'account_count': int(current_accounts[i]),
                 'avg_health_score': float(current_data['avg_health_score']) if current_data.get('avg_health_score') is not None else None,
-                'yoy_revenue_growth': revenue_growth,
-                'yoy_account_growth': account_growth,
-                'prev_year_revenue': prev_revenue if prev_data else None,
-                'prev_year_accounts': prev_accounts if prev_data else None
+                'yoy_revenue_growth': float(revenue_growth[i]),
+                'yoy_account_growth': float(account_growth[i]),
+                'prev_year_revenue': float(prev_revenue[i]) if has_prev else None,
+                'prev_year_accounts': int(prev_accounts[i]) if has_prev else None
             })
 
         combined_performance.sort(key=lambda x: (x.get('sales_rep_name', '') == 'Unassigned Accounts', -x['total_revenue']))
@@ -432,6 +595,7 @@ def get_sales_rep_performance():
 
 
 @api_historical_bp.route('/years', methods=['GET'])
+@cache.cached(timeout=3600, make_cache_key=historical_cache_key, unless=skip_cache, response_filter=is_cacheable_response)
 def get_available_years():
     """
     Get all available distinct years present in the AccountHistoricalRevenue table
@@ -439,10 +603,8 @@ def get_available_years():
     """
     try:
         # --- Use select() and scalars() for distinct column ---
-        stmt = select(distinct(AccountHistoricalRevenue.year))\
-               .order_by(AccountHistoricalRevenue.year.asc())
         # .scalars().all() directly gives the list of years
-        year_list_results = db.session.execute(stmt).scalars().all()
+        year_list_results = db.session.execute(YEARS_STMT).scalars().all()
         # Filter out None just in case
         year_list = sorted([year for year in year_list_results if year is not None])
         # --- End Query ---
@@ -451,9 +613,6 @@ def get_available_years():
     except Exception as e:
         logger.error(f"Error retrieving available years: {str(e)}", exc_info=True)
         return jsonify({"error": "An internal server error occurred while retrieving available years."}), 500
-    finally:
-    # Add this block to log regardless of success/failure within try
-        logger.debug(f"Final year_list being returned by /api/sales-manager/years: {year_list if 'year_list' in locals() else 'Not Defined'}")
 
 
 @api_historical_bp.route('/yoy_growth', methods=['GET'])
@@ -482,8 +641,7 @@ def get_yoy_growth():
 
         # Determine the year for revenue context (SQLAlchemy 2.x)
         if not year:
-            max_year_stmt = select(func.max(AccountHistoricalRevenue.year))
-            max_year_result = db.session.scalar(max_year_stmt)
+            max_year_result = db.session.scalar(MAX_YEAR_STMT)
             if not max_year_result:
                 return jsonify({"error": "No historical data available"}), 404
             year = int(max_year_result)
@@ -557,8 +715,7 @@ def get_yoy_growth():
         logger.info(f"YoY growth query returned {len(results_rows)} accounts.")
 
 
-        # Get the partner set ONCE before the comprehension
-        partner_codes_set = getattr(config, 'CURRENT_YEAR_PARTNER_CODES', set())
+        partner_codes_set = PARTNER_CODES
 
         # --- Format the response (Accessing data from Row objects) ---
         accounts = [
@@ -568,14 +725,12 @@ def get_yoy_growth():
                 'sales_rep': row.sales_rep,
                 'sales_rep_name': row.sales_rep_name, # Added rep name
                 'distributor': row.distributor,
-                'current_revenue': float(row.current_revenue) if row.current_revenue is not None else 0.0,
-                'yoy_growth': float(row.yoy_revenue_growth) if row.yoy_revenue_growth is not None else None,
-                'health_score': float(row.health_score) if row.health_score is not None else None,
+                # FLOAT columns: Python floats (or None) straight from the driver
+                'current_revenue': row.current_revenue if row.current_revenue is not None else 0.0,
+                'yoy_growth': row.yoy_revenue_growth,
+                'health_score': row.health_score,
                 'health_category': row.health_category,
-                'is_partner': bool(
-                                get_base_code_from_canonical(row.canonical_code) and \
-                                get_base_code_from_canonical(row.canonical_code) in partner_codes_set
-                                )
+                'is_partner': _is_partner(row.canonical_code, partner_codes_set)
             }
             for row in results_rows # Iterate through Row objects
         ]
@@ -593,8 +748,72 @@ def get_yoy_growth():
             'accounts': accounts
         }
 
-        return jsonify(response)
+        return _json_response(response)
 
     except Exception as e:
         logger.error(f"Error retrieving YoY growth data: {str(e)}", exc_info=True)
-        return jsonify({"error": "An internal error occurred while retrieving YoY growth data."}), 500
\ No newline at end of file
+        return jsonify({"error": "An internal error occurred while retrieving YoY growth data."}), 500
+
+# Endpoints /batch may dispatch to (read-only views of this blueprint), and how many per call
+BATCH_ENDPOINTS = {
+    'api_historical.get_account_history',
+    'api_historical.get_top_accounts_by_rep',
+    'api_historical.get_sales_rep_performance',
+    'api_historical.get_available_years',
+    'api_historical.get_yoy_growth',
+}
+BATCH_MAX_REQUESTS = 10
+
+
+@api_historical_bp.route('/batch', methods=['POST'])
+def batch():
+    """
+    Runs several GET requests against this blueprint in one round trip.
+
+    Body: {"requests": [{"path": "/years"}, {"path": "/yoy_growth?limit=50"}, ...]}
+    Paths are relative to /api/sales-manager (the full path is accepted too). The sub-requests are
+    dispatched in-process, in order, through the normal view functions (so they hit the response cache).
+    Returns {"responses": [{"path": ..., "status": ..., "body": <the view's JSON or null>}, ...]}.
+    """
+    payload = request.get_json(silent=True) or {}
+    sub_requests = payload.get('requests') if isinstance(payload, dict) else None
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return jsonify({"error": "Body must be {\"requests\": [{\"path\": ...}, ...]}."}), 400
+    if len(sub_requests) > BATCH_MAX_REQUESTS:
+        return jsonify({"error": f"At most {BATCH_MAX_REQUESTS} requests per batch."}), 400
+
+    prefix = api_historical_bp.url_prefix
+    url_adapter = current_app.create_url_adapter(request)
+    parts = []
+    for sub in sub_requests:
+        path = sub.get('path') if isinstance(sub, dict) else None
+        if not isinstance(path, str) or not path.startswith('/'):
+            return jsonify({"error": "Every request needs a 'path' starting with '/'."}), 400
+        full_path = path if path.startswith(prefix + '/') else prefix + path
+
+        # Only the read-only views listed in BATCH_ENDPOINTS can be reached through /batch
+        try:
+            endpoint, _ = url_adapter.match(urlsplit(full_path).path, method='GET')
+        except HTTPException:
+            endpoint = None
+        if endpoint not in BATCH_ENDPOINTS:
+            parts.append(_batch_part(path, 404, None))
+            continue
+
+        try:
+            with current_app.test_request_context(full_path, method='GET'):
+                sub_response = current_app.full_dispatch_request()
+            body = sub_response.get_data() if sub_response.is_json else None
+            parts.append(_batch_part(path, sub_response.status_code, body))
+        except Exception as e:
+            logger.error(f"Batch sub-request {full_path} failed: {e}", exc_info=True)
+            parts.append(_batch_part(path, 500, None))
+
+    # The views' JSON bodies are spliced in as-is rather than decoded and re-encoded
+    return Response(b'{"responses":[' + b','.join(parts) + b']}', mimetype='application/json')
+
+
+def _batch_part(path, status, body):
+    """One entry of the /batch response as JSON bytes; body is the sub-response's JSON bytes (or None)."""
+    return (b'{"path":' + json.dumps(path).encode('utf-8') + b',"status":' + str(status).encode('ascii')
+            + b',"body":' + (body.strip() if body else b'null') + b'}')
@@ -1,20 +1,49 @@
 # routes/api_routes_strategic.py
 
-from flask import Blueprint, jsonify, request
-from sqlalchemy import func, desc, asc, or_, select, extract 
+from flask import Blueprint, jsonify, request, Response
+from werkzeug.http import http_date
+from sqlalchemy import func, desc, asc, or_, and_, case, select, extract 
 from models import db, AccountPrediction, Transaction, AccountHistoricalRevenue 
-from config import TOP_30_SET 
+from config import (TOP_30_SET, HEALTH_POOR_THRESHOLD, PRIORITY_PACE_DECLINE_PCT_THRESHOLD,
+                    GROWTH_HEALTH_THRESHOLD, GROWTH_PACE_INCREASE_PCT_THRESHOLD, GROWTH_MISSING_PRODUCTS_THRESHOLD)
+from extensions import cache, historical_data_version, HISTORICAL_CACHE_VERSION_TIMEOUT
 from datetime import datetime, timedelta, date
 import logging
 import json
+import threading
+import time
 from collections import defaultdict, OrderedDict
 import math
+import operator
+
+# orjson is optional: the account list response is encoded with it when installed, otherwise with jsonify.
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__) 
 
 api_strategic_bp = Blueprint('api_strategic', __name__, url_prefix='/api/strategic')
 
 
+def _http_date_default(obj):
+    """orjson default: dates/datetimes as HTTP dates, which is how Flask's encoder writes them."""
+    if isinstance(obj, date):
+        return http_date(obj)
+    raise TypeError
+
+
+def _json_response(data):
+    """jsonify(data), but encoded by orjson (C) when available. Keys stay sorted and dates keep Flask's format."""
+    if ORJSON_AVAILABLE:
+        return Response(orjson.dumps(data, default=_http_date_default,
+                                     option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME),
+                        mimetype='application/json')
+    return jsonify(data)
+
+
 def _clean_distributor(raw: str | None) -> str | None:
     """Normalise distributor names once so the UI gets stable keys."""
     if not raw:
@@ -22,7 +51,52 @@ def _clean_distributor(raw: str | None) -> str | None:
     return raw.strip().upper()
 
 
-# --- get_sku_description_map (remains the same) ---
+# --- SKU description cache ---
+# Process-local: SKU -> (description or None, monotonic time stored). Descriptions barely change between
+# loads, so entries live SKU_DESC_CACHE_TTL seconds; the webhook clears it after loading new transactions
+# (other workers pick the change up when their entries expire).
+SKU_DESC_CACHE_TTL = 30 * 60
+SKU_DESC_CACHE_MAX_ENTRIES = 200_000
+_sku_desc_cache = {}
+_sku_desc_cache_lock = threading.Lock()
+
+
+def clear_sku_description_cache():
+    """Drops every cached SKU description (call after transactions were loaded)."""
+    with _sku_desc_cache_lock:
+        _sku_desc_cache.clear()
+
+
+def _remember_sku_descriptions(descriptions: dict, skus, now: float | None = None):
+    """Stores descriptions for `skus` in the cache (None for SKUs missing from `descriptions`)."""
+    now = time.monotonic() if now is None else now
+    skus = list(skus)
+    with _sku_desc_cache_lock:
+        if len(_sku_desc_cache) + len(skus) > SKU_DESC_CACHE_MAX_ENTRIES:
+            _sku_desc_cache.clear()
+        for sku in skus:
+            _sku_desc_cache[sku] = (descriptions.get(sku), now)
+
+
+# --- Product history cache ---
+# The quarterly product history and yearly product summary of the details page only depend on the account's
+# transactions, so they are cached under a fingerprint of those (latest posting_date + row count) plus the
+# historical namespace version, which the webhook bumps after every load (SKU descriptions come from other
+# accounts' transactions too).
+PRODUCT_HISTORY_CACHE_TIMEOUT = 6 * 3600
+
+
+def _product_history_cache_key(canonical_code: str):
+    """Cache key of the account's product history, or None when it has no transactions."""
+    latest_posting_date, transaction_count = db.session.execute(
+        select(func.max(Transaction.posting_date), func.count()).where(Transaction.canonical_code == canonical_code)
+    ).one()
+    if latest_posting_date is None:
+        return None
+    return f"apq:{historical_data_version()}:{canonical_code}:{latest_posting_date.isoformat()}:{transaction_count}"
+
+
+# --- get_sku_description_map ---
 def get_sku_description_map(sku_list: list) -> dict:
     if not sku_list:
         return {}
@@ -32,26 +106,43 @@ def get_sku_description_map(sku_list: list) -> dict:
     if not valid_skus_for_query:
         return {str(s).strip(): "Description N/A" for s in sku_list if s and str(s).strip()}
 
+    # Serve what the cache has (including SKUs known to have no description); only query the rest
+    now = time.monotonic()
+    cached = {}
+    with _sku_desc_cache_lock:
+        for sku in valid_skus_for_query:
+            entry = _sku_desc_cache.get(sku)
+            if entry is not None and now - entry[1] < SKU_DESC_CACHE_TTL:
+                cached[sku] = entry[0]
+    if len(cached) == len(valid_skus_for_query):
+        return {sku: cached[sku] or "Description N/A" for sku in valid_skus_for_query}
+    all_requested_skus = valid_skus_for_query
+    valid_skus_for_query = [sku for sku in valid_skus_for_query if sku not in cached]
+
     fetched_sku_to_desc = {}
     try:
-        # --- SIMPLIFIED AND MORE ROBUST QUERY ---
-        # This subquery finds the most recent transaction for each SKU that has a valid description.
-        subq = select(
-            Transaction.item_code,
-            Transaction.description,
-            func.row_number().over(
-                partition_by=Transaction.item_code,
-                order_by=Transaction.posting_date.desc()  # Order by the most recent date
-            ).label('rn')
-        ).where(
+        # Latest description per SKU. Picking one row per SKU with ROW_NUMBER() makes the database rank every
+        # matching transaction; instead take MAX(posting_date) per SKU (an index probe on
+        # idx_transaction_item_date) and join back, or DISTINCT ON (item_code) on PostgreSQL.
+        has_description = (
             Transaction.item_code.in_(valid_skus_for_query),
             Transaction.description.isnot(None),
             Transaction.description != ''
-        ).subquery()
+        )
+        if db.engine.dialect.name == 'postgresql':
+            stmt = select(Transaction.item_code, Transaction.description).where(*has_description).distinct(
+                Transaction.item_code
+            ).order_by(Transaction.item_code, Transaction.posting_date.desc())
+        else:
+            latest = select(
+                Transaction.item_code,
+                func.max(Transaction.posting_date).label('latest_date')
+            ).where(*has_description).group_by(Transaction.item_code).subquery()
+            stmt = select(Transaction.item_code, Transaction.description).join(
+                latest,
+                (Transaction.item_code == latest.c.item_code) & (Transaction.posting_date == latest.c.latest_date)
+            ).where(*has_description)
 
-        # Final query selects only the top row for each SKU (the most recent one)
-        stmt = select(subq.c.item_code, subq.c.description).where(subq.c.rn == 1)
-        
         results = db.session.execute(stmt).fetchall()
         for sku, description in results:
             fetched_sku_to_desc[str(sku).strip()] = description
@@ -59,101 +150,146 @@ def get_sku_description_map(sku_list: list) -> dict:
 
     except Exception as e:
         logger.error(f"Error fetching SKU descriptions map with new query: {e}", exc_info=True)
-        # Fallback to returning N/A for all on error
-        return {sku: "Description N/A" for sku in valid_skus_for_query}
+        # Fallback to returning N/A for the uncached SKUs on error (and cache nothing)
+        return {sku: cached.get(sku) or "Description N/A" for sku in all_requested_skus}
 
-    # Final mapping to ensure all requested SKUs get a value
-    final_map = {}
-    for clean_sku in valid_skus_for_query:
-        final_map[clean_sku] = fetched_sku_to_desc.get(clean_sku, "Description N/A")
+    # Remember the fetched descriptions, and None for SKUs without one
+    _remember_sku_descriptions(fetched_sku_to_desc, valid_skus_for_query, now)
+
+    # Final mapping to ensure all requested SKUs get a value: N/A for all of them (built in C), then overlay the
+    # cached and fetched descriptions (the query only returns non-empty ones, for requested SKUs)
+    final_map = dict.fromkeys(all_requested_skus, "Description N/A")
+    final_map.update((sku, description) for sku, description in cached.items() if description)
+    final_map.update(fetched_sku_to_desc)
         
     return final_map
 
-# --- get_detailed_product_history_by_quarter (remains the same) ---
+def _fetch_monthly_aggregates_with_descriptions(canonical_code: str, extra_skus: set):
+    """
+    PostgreSQL only: the account's monthly per-SKU aggregates plus the latest description of every SKU involved
+    (the aggregated ones and `extra_skus` from the prediction) in a single round-trip.
+
+    `monthly` aggregates the account's transactions, `desc_src` picks the latest description per SKU with
+    DISTINCT ON, and a FULL JOIN keeps both the monthly rows (year set) and the description-only rows of
+    prediction SKUs the account never bought (year NULL, sorted last).
+    Returns (monthly rows, {sku: description}) like the stmt_monthly_aggregates + get_sku_description_map pair.
+    """
+    month_val = extract('month', Transaction.posting_date)
+    monthly = select(
+        Transaction.year, month_val.label('month_val'), Transaction.item_code,
+        func.sum(Transaction.quantity).label('sum_quantity'),
+        func.sum(Transaction.revenue).label('sum_revenue')
+    ).where(
+        Transaction.canonical_code == canonical_code, Transaction.item_code.isnot(None), Transaction.item_code != ''
+    ).group_by(
+        Transaction.year, month_val, Transaction.item_code
+    ).cte('monthly')
+
+    desc_src = select(Transaction.item_code, Transaction.description).where(
+        or_(Transaction.item_code.in_(select(monthly.c.item_code)), Transaction.item_code.in_(list(extra_skus))),
+        Transaction.description.isnot(None),
+        Transaction.description != ''
+    ).distinct(
+        Transaction.item_code
+    ).order_by(Transaction.item_code, Transaction.posting_date.desc()).cte('desc_src')
+
+    stmt = select(
+        monthly.c.year, monthly.c.month_val,
+        func.coalesce(monthly.c.item_code, desc_src.c.item_code).label('item_code'),
+        monthly.c.sum_quantity, monthly.c.sum_revenue, desc_src.c.description
+    ).select_from(
+        monthly.join(desc_src, monthly.c.item_code == desc_src.c.item_code, full=True)
+    ).order_by(
+        monthly.c.year.asc(), monthly.c.month_val.asc(), monthly.c.item_code
+    )
+
+    monthly_aggregate_results = []
+    fetched_sku_to_desc = {}
+    all_skus = set(extra_skus)
+    for row in db.session.execute(stmt).fetchall():
+        sku = str(row.item_code).strip()
+        if row.description:
+            fetched_sku_to_desc[sku] = row.description
+        if row.year is not None:
+            monthly_aggregate_results.append(row)
+            if sku:
+                all_skus.add(sku)
+
+    _remember_sku_descriptions(fetched_sku_to_desc, all_skus)
+    master_sku_desc_map = {sku: fetched_sku_to_desc.get(sku, "Description N/A") for sku in all_skus}
+    return monthly_aggregate_results, master_sku_desc_map
+
+
+# --- get_detailed_product_history_by_quarter ---
+QUARTER_KEYS = ("Q1", "Q2", "Q3", "Q4")
+# Sort keys as C-level getters rather than a lambda call per element
+_by_revenue = operator.itemgetter("revenue")
+_by_description = operator.itemgetter("description")
+
+
 def get_detailed_product_history_by_quarter( monthly_aggregate_results: list, master_sku_desc_map: dict, top_30_skus_set: set, canonical_code_for_logging: str ):
     logger.info(f"Processing detailed product history for {canonical_code_for_logging} using pre-fetched monthly aggregates and master SKU descriptions.")
-    quarterly_sku_aggregates = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: { "total_quantity": 0, "total_revenue": 0.0 })))
+    # (year_str, quarter) -> sku -> [total_quantity, total_revenue]; the rows arrive ordered by year and month,
+    # so consecutive rows share a quarter and its dict is only looked up when the quarter changes
+    quarterly_sku_aggregates = {}
+    quarter_key = None; quarter_skus = None
     for row in monthly_aggregate_results:
-        year_str = str(row.year)
         try:
-            month_int = int(row.month_val) 
-            if 1 <= month_int <= 3: quarter_key = "Q1"
-            elif 4 <= month_int <= 6: quarter_key = "Q2"
-            elif 7 <= month_int <= 9: quarter_key = "Q3"
-            elif 10 <= month_int <= 12: quarter_key = "Q4"
-            else: continue
+            month_int = int(row.month_val)
         except (ValueError, TypeError): continue
-        sku = str(row.item_code); agg_data = quarterly_sku_aggregates[year_str][quarter_key][sku]
-        agg_data["total_quantity"] += int(row.sum_quantity or 0); agg_data["total_revenue"] += float(row.sum_revenue or 0.0)
+        if not 1 <= month_int <= 12: continue
+        row_quarter_key = (str(row.year), QUARTER_KEYS[(month_int - 1) // 3])
+        if row_quarter_key != quarter_key:
+            quarter_key = row_quarter_key
+            quarter_skus = quarterly_sku_aggregates.setdefault(quarter_key, {})
+        sku = str(row.item_code); qty = int(row.sum_quantity or 0); rev = float(row.sum_revenue or 0.0)
+        agg_data = quarter_skus.get(sku)
+        if agg_data is None: quarter_skus[sku] = [qty, rev]
+        else: agg_data[0] += qty; agg_data[1] += rev
     
-    final_response_structure = OrderedDict(); sorted_years = sorted(quarterly_sku_aggregates.keys(), key=int)
+    final_response_structure = OrderedDict(); sorted_years = sorted({year_str for year_str, _ in quarterly_sku_aggregates}, key=int)
     data_from_absolute_previous_quarter_for_qoq = {}
     
+    # One pass per quarter: each SKU is classified against the previous quarter (added / repurchased) as its
+    # product row is built, instead of re-walking set differences and re-resolving descriptions afterwards
     for year_str in sorted_years:
-        final_response_structure[year_str] = OrderedDict(); year_data_for_quarters = quarterly_sku_aggregates[year_str]
-        for q_key in ["Q1", "Q2", "Q3", "Q4"]:
-            current_quarter_sku_details_map = year_data_for_quarters.get(q_key, {}); current_quarter_product_list_frontend = []
-            current_quarter_skus_set_for_metrics = set(current_quarter_sku_details_map.keys()); qty_top_30_this_qtr = 0; rev_total_this_qtr = 0.0; carried_top_30_details_this_qtr = []
+        final_response_structure[year_str] = OrderedDict()
+        for q_key in QUARTER_KEYS:
+            current_quarter_sku_details_map = quarterly_sku_aggregates.get((year_str, q_key), {}); current_quarter_product_list_frontend = []
+            added_skus_details = []; repurchased_skus_details_list = []; carried_top_30_details_this_qtr = []
+            qty_top_30_this_qtr = 0; qty_repurchased_this_qtr = 0; rev_total_this_qtr = 0.0
             
-            for sku, details in current_quarter_sku_details_map.items():
-                chosen_description = master_sku_desc_map.get(sku, "Description N/A"); is_top_30_val = bool(sku in top_30_skus_set)
-                current_qty = details["total_quantity"]; current_rev = details["total_revenue"]
-                status_in_qtr_vs_prev_q = "Repurchased"; 
-                if sku not in data_from_absolute_previous_quarter_for_qoq: status_in_qtr_vs_prev_q = "Newly Added this Qtr (vs Prev Qtr)"
+            for sku, (current_qty, current_rev) in current_quarter_sku_details_map.items():
+                chosen_description = master_sku_desc_map.get(sku, "Description N/A"); is_top_30_val = sku in top_30_skus_set
+                # Shared by the added / repurchased / top 30 lists (read-only from here on)
+                sku_summary = { "sku": sku, "description": chosen_description, "quantity": current_qty, "revenue": round(current_rev, 2) }
                 
                 qoq_qty_pct_change, qoq_rev_pct_change = None, None; prev_q_sku_data = data_from_absolute_previous_quarter_for_qoq.get(sku)
-                if prev_q_sku_data:
-                    prev_qty = prev_q_sku_data["total_quantity"]; prev_rev = prev_q_sku_data["total_revenue"]
+                if prev_q_sku_data is None:
+                    status_in_qtr_vs_prev_q = "Newly Added this Qtr (vs Prev Qtr)"
+                    added_skus_details.append(sku_summary)
+                else:
+                    status_in_qtr_vs_prev_q = "Repurchased"
+                    prev_qty, prev_rev = prev_q_sku_data
                     if prev_qty > 0: qoq_qty_pct_change = round(((current_qty - prev_qty) / prev_qty) * 100, 1)
-                    elif current_qty > 0 : qoq_qty_pct_change = None 
                     if prev_rev > 0: qoq_rev_pct_change = round(((current_rev - prev_rev) / prev_rev) * 100, 1)
-                    elif current_rev > 0 : qoq_rev_pct_change = None 
-                elif current_qty > 0 or current_rev > 0 : qoq_qty_pct_change = None; qoq_rev_pct_change = None 
+                    repurchased_skus_details_list.append(sku_summary)
+                    qty_repurchased_this_qtr += current_qty
                 
-                current_quarter_product_list_frontend.append({ "sku": sku, "description": chosen_description, "quantity": current_qty, "revenue": round(current_rev, 2), "is_top_30": is_top_30_val, "status_in_qtr": status_in_qtr_vs_prev_q, "qoq_qty_pct_change": qoq_qty_pct_change, "qoq_rev_pct_change": qoq_rev_pct_change })
+                current_quarter_product_list_frontend.append({ "sku": sku, "description": chosen_description, "quantity": current_qty, "revenue": sku_summary["revenue"], "is_top_30": is_top_30_val, "status_in_qtr": status_in_qtr_vs_prev_q, "qoq_qty_pct_change": qoq_qty_pct_change, "qoq_rev_pct_change": qoq_rev_pct_change })
                 rev_total_this_qtr += current_rev
                 if is_top_30_val: 
                     qty_top_30_this_qtr += current_qty
-                    carried_top_30_details_this_qtr.append({ "sku": sku, "description": chosen_description, "quantity": current_qty, "revenue": round(current_rev, 2) })
-            
-            current_quarter_product_list_frontend.sort(key=lambda x: x["revenue"], reverse=True)
-            
-            previous_quarter_skus_set = set(data_from_absolute_previous_quarter_for_qoq.keys())
+                    carried_top_30_details_this_qtr.append(sku_summary)
             
-            added_skus_from_set_diff = list(current_quarter_skus_set_for_metrics - previous_quarter_skus_set)
-            added_skus_details = []
-            for s_added in added_skus_from_set_diff:
-                details = current_quarter_sku_details_map.get(s_added)
-                if details:
-                    added_skus_details.append({
-                        "sku": s_added,
-                        "description": master_sku_desc_map.get(s_added, "Description N/A"),
-                        "quantity": details.get("total_quantity", 0),
-                        "revenue": round(details.get("total_revenue", 0.0), 2)
-                    })
-            added_skus_details.sort(key=lambda x: x["revenue"], reverse=True) # Optional sort
-
-            dropped_skus_from_set_diff = list(previous_quarter_skus_set - current_quarter_skus_set_for_metrics)
-            dropped_skus_details = [ {"sku": s, "description": master_sku_desc_map.get(s, "Description N/A")} for s in dropped_skus_from_set_diff ]
-            dropped_skus_details.sort(key=lambda x: x["description"]) # Optional sort by description
-
-            repurchased_skus_set = current_quarter_skus_set_for_metrics.intersection(previous_quarter_skus_set)
-            qty_repurchased_this_qtr = sum(current_quarter_sku_details_map.get(sku, {}).get("total_quantity", 0) for sku in repurchased_skus_set)
-            
-            repurchased_skus_details_list = []
-            for sku_repurchased in repurchased_skus_set:
-                details = current_quarter_sku_details_map.get(sku_repurchased)
-                if details:
-                    repurchased_skus_details_list.append({
-                        "sku": sku_repurchased,
-                        "description": master_sku_desc_map.get(sku_repurchased, "Description N/A"),
-                        "quantity": details.get("total_quantity", 0),
-                        "revenue": round(details.get("total_revenue", 0.0), 2)
-                    })
-            repurchased_skus_details_list.sort(key=lambda x: x["revenue"], reverse=True)
+            current_quarter_product_list_frontend.sort(key=_by_revenue, reverse=True)
+            added_skus_details.sort(key=_by_revenue, reverse=True) # Optional sort
+            repurchased_skus_details_list.sort(key=_by_revenue, reverse=True)
+            carried_top_30_details_this_qtr.sort(key=_by_revenue, reverse=True)
 
-            # Sort carried_top_30_details_this_qtr (already populated with SKU, desc, qty, rev)
-            carried_top_30_details_this_qtr.sort(key=lambda x: x["revenue"], reverse=True)
+            # keys() views diff as sets in C; when nothing was dropped (the common case) this is one pass, no dicts
+            dropped_skus_details = [ {"sku": s, "description": master_sku_desc_map.get(s, "Description N/A")} for s in data_from_absolute_previous_quarter_for_qoq.keys() - current_quarter_sku_details_map.keys() ]
+            dropped_skus_details.sort(key=_by_description) # Optional sort by description
 
             final_response_structure[year_str][q_key] = { 
                 "products": current_quarter_product_list_frontend, 
@@ -162,7 +298,7 @@ def get_detailed_product_history_by_quarter( monthly_aggregate_results: list, ma
                     "total_revenue_in_quarter": round(rev_total_this_qtr, 2), 
                     "items_added_details": added_skus_details, # Now includes qty/rev
                     "items_dropped_details": dropped_skus_details, 
-                    "items_repurchased_count": len(repurchased_skus_set), 
+                    "items_repurchased_count": len(repurchased_skus_details_list), 
                     "quantity_repurchased": qty_repurchased_this_qtr, 
                     "repurchased_skus_details": repurchased_skus_details_list, # ADDED
                     "top_30_skus_carried_details": carried_top_30_details_this_qtr, # Already includes qty/rev
@@ -170,23 +306,41 @@ def get_detailed_product_history_by_quarter( monthly_aggregate_results: list, ma
                     "quantity_top_30_carried": qty_top_30_this_qtr 
                 } 
             }
-            data_from_absolute_previous_quarter_for_qoq = current_quarter_sku_details_map.copy() if current_quarter_sku_details_map else {}
+            data_from_absolute_previous_quarter_for_qoq = current_quarter_sku_details_map
     return final_response_structure
 
-# --- get_strategic_accounts_data (remains the same) ---
+# --- get_strategic_accounts_data ---
+ACCOUNTS_PAGE_SIZE = 100
+ACCOUNTS_MAX_PAGE_SIZE = 500
+# What is_growth_opportunity_api reads (plus the missing products), for counting over accounts outside the page
+GROWTH_OPPORTUNITY_COLUMNS = (
+    AccountPrediction.health_score, AccountPrediction.pace_vs_ly, AccountPrediction.py_total_revenue,
+    AccountPrediction.rfm_segment, AccountPrediction.next_expected_purchase_date, AccountPrediction.missing_top_products_json,
+)
+
 @api_strategic_bp.route('/accounts', methods=['GET'])
 def get_strategic_accounts_data():
-    """Get strategic accounts data with filtering and summary statistics."""
+    """
+    Get strategic accounts data with filtering and summary statistics.
+
+    Optional pagination: page (1-based) and/or page_size (default ACCOUNTS_PAGE_SIZE, max ACCOUNTS_MAX_PAGE_SIZE)
+    return one page of accounts ordered by enhanced_priority_score (highest first); summary_stats always cover
+    every matching account. Without either argument all matching accounts are returned, as before.
+    """
     logger.info("Received request for strategic accounts data")
-    from config import HEALTH_POOR_THRESHOLD, PRIORITY_PACE_DECLINE_PCT_THRESHOLD, GROWTH_PACE_INCREASE_PCT_THRESHOLD 
     
     sales_rep_id = request.args.get('sales_rep')
     distributor = request.args.get('distributor')
     health_category = request.args.get('health_category')
     rfm_segment = request.args.get('rfm_segment')
+    paginate = 'page' in request.args or 'page_size' in request.args
+    page = max(request.args.get('page', 1, type=int) or 1, 1)
+    page_size = min(max(request.args.get('page_size', ACCOUNTS_PAGE_SIZE, type=int) or ACCOUNTS_PAGE_SIZE, 1), ACCOUNTS_MAX_PAGE_SIZE)
     
     try:
-        stmt = select(AccountPrediction)
+        # Every column is returned, so instead of deferring any, skip ORM hydration: plain rows of the table's
+        # columns (attribute access by column name, like the model) are much cheaper to load and to turn into dicts
+        stmt = select(AccountPrediction.__table__)
         conditions = []
         
         if distributor: 
@@ -202,60 +356,96 @@ def get_strategic_accounts_data():
             
         if conditions: 
             stmt = stmt.where(*conditions)
+        if paginate:
+            # id breaks ties so pages do not overlap
+            stmt = stmt.order_by(
+                AccountPrediction.enhanced_priority_score.desc().nullslast(), AccountPrediction.id
+            ).limit(page_size).offset((page - 1) * page_size)
             
-        accounts = db.session.execute(stmt).scalars().all()
+        accounts = db.session.execute(stmt).all()
         
-        # --- CORRECTED LOGIC from your original file ---
+        # The summary_stats counts and averages are plain column predicates, so the database computes them
+        # over the same filters; only the growth opportunities (they need the parsed missing products) stay in Python
+        today = datetime.utcnow().date()
+        priority_score = AccountPrediction.enhanced_priority_score
+        coverage = AccountPrediction.product_coverage_percentage
+        health_score = AccountPrediction.health_score
+        next_purchase_day = func.date(AccountPrediction.next_expected_purchase_date)
+        has_pace = and_(AccountPrediction.pace_vs_ly.isnot(None), AccountPrediction.py_total_revenue > 0)
+        pace_percent = AccountPrediction.pace_vs_ly / AccountPrediction.py_total_revenue * 100
+        summary_stmt = select(
+            func.count().label('total_accounts'),
+            func.coalesce(func.sum(AccountPrediction.yep_revenue), 0).label('total_yep'),
+            func.count(case((AccountPrediction.days_overdue > 0, 1))).label('overdue'),
+            func.avg(coverage).label('avg_coverage'),
+            func.count(coverage).label('coverage_known'),
+            func.count(case((coverage < 20, 1))).label('coverage_low'),
+            func.count(case((and_(coverage >= 20, coverage < 50), 1))).label('coverage_medium'),
+            func.count(case((coverage >= 50, 1))).label('coverage_high'),
+            func.avg(priority_score).label('avg_priority'),
+            func.count(case((priority_score >= 75, 1))).label('priority1'),
+            func.count(case((and_(priority_score >= 50, priority_score < 75), 1))).label('priority2'),
+            func.avg(health_score).label('avg_health'),
+            func.count(case((and_(health_score != 0, health_score < HEALTH_POOR_THRESHOLD), 1))).label('low_health'),
+            func.count(case((and_(next_purchase_day >= today, next_purchase_day <= today + timedelta(days=7)), 1))).label('due_this_week'),
+            func.count(case((and_(has_pace, pace_percent < PRIORITY_PACE_DECLINE_PCT_THRESHOLD), 1))).label('low_pace'),
+            func.count(case((and_(has_pace, pace_percent > GROWTH_PACE_INCREASE_PCT_THRESHOLD), 1))).label('high_pace')
+        )
+        if conditions:
+            summary_stmt = summary_stmt.where(*conditions)
+        summary_row = db.session.execute(summary_stmt).one()
+
+        # Parse each product list (JSON text columns) once and collect the SKUs to describe
         all_skus_needed = set()
+        parsed_product_lists = []
+        count_growth_opps = 0
         for acc in accounts:
-            all_skus_needed.update(str(s).strip() for s in (acc.carried_top_products or []) if str(s).strip())
-            # This is the corrected block for missing_top_products
-            for item in (acc.missing_top_products or []):
-                if isinstance(item, dict) and item.get('sku'):
-                    all_skus_needed.add(str(item['sku']).strip())
-        # --- END CORRECTION ---
+            carried_top_products = _load_json_list(acc.carried_top_products_json) or []
+            missing_top_products = _load_json_list(acc.missing_top_products_json) or []
+            # SKUs are normalised (str + strip) once here and reused for the descriptions below
+            carried_skus = [str(s).strip() for s in carried_top_products]
+            missing_skus = [
+                (str(item['sku']).strip(), item.get('placeholder_insight', 'Missing Top 30 Product'))
+                for item in missing_top_products if isinstance(item, dict) and item.get('sku')
+            ]
+            parsed_product_lists.append((carried_skus, missing_skus))
+            all_skus_needed.update(sku for sku in carried_skus if sku)
+            all_skus_needed.update(sku for sku, _ in missing_skus)
+            if not paginate and is_growth_opportunity_api(acc, missing_products_list=missing_top_products, today=today):
+                count_growth_opps += 1
+        if paginate:
+            # The page is only a slice; the growth check needs a few columns of every matching account
+            growth_stmt = select(*GROWTH_OPPORTUNITY_COLUMNS)
+            if conditions:
+                growth_stmt = growth_stmt.where(*conditions)
+            count_growth_opps = sum(
+                1 for row in db.session.execute(growth_stmt)
+                if is_growth_opportunity_api(row, missing_products_list=_load_json_list(row.missing_top_products_json) or [], today=today)
+            )
 
         master_sku_desc_map = get_sku_description_map(list(all_skus_needed))
         
-        # (The rest of the function from your original file is correct and can be used as-is)
-        total_yep = sum(acc.yep_revenue for acc in accounts if acc.yep_revenue)
-        overdue_count = sum(1 for acc in accounts if acc.days_overdue and acc.days_overdue > 0)
-        avg_coverage = None
-        distribution = {'low': 0, 'medium': 0, 'high': 0, 'unknown': 0}
-        coverages = [acc.product_coverage_percentage for acc in accounts if acc.product_coverage_percentage is not None]
-        
-        if coverages:
-            avg_coverage = round(sum(coverages) / len(coverages), 1)
-            distribution['low'] = sum(1 for c in coverages if c < 20)
-            distribution['medium'] = sum(1 for c in coverages if 20 <= c < 50)
-            distribution['high'] = sum(1 for c in coverages if c >= 50)
-        distribution['unknown'] = len(accounts) - len(coverages)
-        
-        active_enhanced_priority_sum = sum(acc.enhanced_priority_score for acc in accounts if acc.enhanced_priority_score is not None)
-        active_enhanced_priority_count = sum(1 for acc in accounts if acc.enhanced_priority_score is not None)
-        avg_priority_score_summary = round(active_enhanced_priority_sum / active_enhanced_priority_count, 1) if active_enhanced_priority_count > 0 else None
-        
-        health_scores = [acc.health_score for acc in accounts if acc.health_score is not None]
-        avg_health_score_summary = round(sum(health_scores) / len(health_scores), 1) if health_scores else None
+        distribution = {
+            'low': summary_row.coverage_low, 'medium': summary_row.coverage_medium, 'high': summary_row.coverage_high,
+            'unknown': summary_row.total_accounts - summary_row.coverage_known
+        }
+        avg_coverage = round(summary_row.avg_coverage, 1) if summary_row.avg_coverage is not None else None
+        avg_priority_score_summary = round(summary_row.avg_priority, 1) if summary_row.avg_priority is not None else None
+        avg_health_score_summary = round(summary_row.avg_health, 1) if summary_row.avg_health is not None else None
         
         output_list = []
-        for acc in accounts:
+        for acc, (carried_skus, missing_skus) in zip(accounts, parsed_product_lists):
             described_carried = [
-                {"sku": str(s).strip(), "description": master_sku_desc_map.get(str(s).strip(), "Description N/A")} 
-                for s in (acc.carried_top_products or [])
+                {"sku": sku, "description": master_sku_desc_map.get(sku, "Description N/A")} 
+                for sku in carried_skus
             ]
             
-            described_missing = []
-            for item in (acc.missing_top_products or []):
-                if isinstance(item, dict) and item.get('sku'):
-                    sku = str(item['sku']).strip()
-                    described_missing.append({
-                        "sku": sku, 
-                        "description": master_sku_desc_map.get(sku, "Description N/A"), 
-                        "reason": item.get('placeholder_insight', 'Missing Top 30 Product')
-                    })
+            described_missing = [
+                {"sku": sku, "description": master_sku_desc_map.get(sku, "Description N/A"), "reason": reason}
+                for sku, reason in missing_skus
+            ]
             
-            acc_data = {col.name: getattr(acc, col.name) for col in acc.__table__.columns}
+            acc_data = dict(acc._mapping)
             acc_data['carried_top_products'] = described_carried
             acc_data['missing_top_products'] = described_missing
             
@@ -265,43 +455,69 @@ def get_strategic_accounts_data():
                     
             output_list.append(acc_data)
         
-        return jsonify({
+        response_data = {
             "accounts": output_list, 
             "summary_stats": {
-                "total_accounts": len(accounts),
-                "total_yep": total_yep,
-                "overdue_count": overdue_count,
+                "total_accounts": summary_row.total_accounts,
+                "total_yep": summary_row.total_yep,
+                "overdue_count": summary_row.overdue,
                 "average_coverage": avg_coverage,
                 "coverage_distribution": distribution,
                 "avg_priority_score": avg_priority_score_summary,
                 "avg_health_score": avg_health_score_summary,
-                "count_priority1": sum(1 for acc in accounts if acc.enhanced_priority_score and acc.enhanced_priority_score >= 75),
-                "count_priority2": sum(1 for acc in accounts if acc.enhanced_priority_score and 50 <= acc.enhanced_priority_score < 75),
-                "count_due_this_week": sum(1 for acc in accounts if acc.next_expected_purchase_date and 0 <= (acc.next_expected_purchase_date.date() - datetime.utcnow().date()).days <= 7),
-                "count_overdue": overdue_count,
-                "count_low_health": sum(1 for acc in accounts if acc.health_score and acc.health_score < HEALTH_POOR_THRESHOLD),
-                "count_low_pace": sum(1 for acc in accounts if acc.pace_vs_ly is not None and acc.py_total_revenue is not None and acc.py_total_revenue > 0 and (acc.pace_vs_ly / acc.py_total_revenue * 100) < PRIORITY_PACE_DECLINE_PCT_THRESHOLD),
-                "count_high_pace": sum(1 for acc in accounts if acc.pace_vs_ly is not None and acc.py_total_revenue is not None and acc.py_total_revenue > 0 and (acc.pace_vs_ly / acc.py_total_revenue * 100) > GROWTH_PACE_INCREASE_PCT_THRESHOLD),
-                "count_growth_opps": sum(1 for acc in accounts if is_growth_opportunity_api(acc)),
+                "count_priority1": summary_row.priority1,
+                "count_priority2": summary_row.priority2,
+                "count_due_this_week": summary_row.due_this_week,
+                "count_overdue": summary_row.overdue,
+                "count_low_health": summary_row.low_health,
+                "count_low_pace": summary_row.low_pace,
+                "count_high_pace": summary_row.high_pace,
+                "count_growth_opps": count_growth_opps,
             }
-        })
+        }
+        if paginate:
+            response_data["pagination"] = {
+                "page": page, "page_size": page_size, "total_accounts": summary_row.total_accounts,
+                "total_pages": math.ceil(summary_row.total_accounts / page_size)
+            }
+        return _json_response(response_data)
         
     except Exception as e:
         logger.error(f"Error fetching strategic accounts data: {str(e)}", exc_info=True)
         return jsonify({"error": "An internal server error occurred."}), 500
 
-# --- is_growth_opportunity_api (remains the same) ---
-def is_growth_opportunity_api(account_prediction_obj):
-    from config import GROWTH_HEALTH_THRESHOLD, GROWTH_PACE_INCREASE_PCT_THRESHOLD, GROWTH_MISSING_PRODUCTS_THRESHOLD
+def _loads_json(raw: str, nan_as_null: bool = False):
+    """
+    json.loads, but decoded by orjson (C) when available. orjson rejects what is not strict JSON, e.g. the NaN
+    that older pipeline runs wrote, so those strings take the previous path (optionally with ': NaN' -> null).
+    Raises json.JSONDecodeError either way (orjson's error subclasses it).
+    """
+    if ORJSON_AVAILABLE:
+        try: return orjson.loads(raw)
+        except orjson.JSONDecodeError: pass
+    if nan_as_null: raw = raw.replace(': NaN', ': null')
+    return json.loads(raw)
+
+
+def _load_json_list(raw):
+    """Same parsing as the AccountPrediction product list properties, for plain (non-ORM) rows."""
+    if not raw: return []
+    try: return _loads_json(raw)
+    except json.JSONDecodeError: return []
+
+
+# --- is_growth_opportunity_api ---
+def is_growth_opportunity_api(account_prediction_obj, missing_products_list=None, today=None):
+    """missing_products_list / today let a caller looping over many accounts pass what it already has."""
     acc = account_prediction_obj 
     if (acc.health_score or 0) < GROWTH_HEALTH_THRESHOLD: return False
     if acc.pace_vs_ly is not None and acc.py_total_revenue is not None and acc.py_total_revenue > 0:
         pace_percent = (acc.pace_vs_ly / acc.py_total_revenue) * 100
         if pace_percent >= GROWTH_PACE_INCREASE_PCT_THRESHOLD: return True
-    missing_products_list = acc.missing_top_products 
+    if missing_products_list is None: missing_products_list = acc.missing_top_products 
     if isinstance(missing_products_list, list) and len(missing_products_list) >= GROWTH_MISSING_PRODUCTS_THRESHOLD: return True
     if acc.rfm_segment in ["Champions", "Loyal Customers"] and acc.next_expected_purchase_date:
-        days_until_due = (acc.next_expected_purchase_date.date() - datetime.utcnow().date()).days
+        days_until_due = (acc.next_expected_purchase_date.date() - (today or datetime.utcnow().date())).days
         if 0 <= days_until_due <= 14: return True
     return False
 
@@ -314,8 +530,10 @@ def get_account_details(canonical_code):
         return jsonify({"error": "Canonical code is required."}), 400
 
     try:
-        prediction_stmt = select(AccountPrediction).where(AccountPrediction.canonical_code == canonical_code)
-        prediction = db.session.execute(prediction_stmt).scalar_one_or_none()
+        # Every column ends up in the response, so (like /accounts) read a plain row of the table instead of
+        # hydrating an ORM object; the lookup is served by the unique index on canonical_code
+        prediction_stmt = select(AccountPrediction.__table__).where(AccountPrediction.canonical_code == canonical_code)
+        prediction = db.session.execute(prediction_stmt).one_or_none()
 
         if not prediction:
             return jsonify({"error": f"Account with canonical code '{canonical_code}' not found."}), 404
@@ -324,64 +542,85 @@ def get_account_details(canonical_code):
         rolling_sku_analysis_list = []
         if prediction.rolling_sku_analysis_json:
             try:
-                json_string_safe = prediction.rolling_sku_analysis_json.replace(': NaN', ': null')
-                rolling_sku_analysis_list = json.loads(json_string_safe)
+                rolling_sku_analysis_list = _loads_json(prediction.rolling_sku_analysis_json, nan_as_null=True)
             except json.JSONDecodeError:
                 logger.warning(f"Could not decode rolling_sku_analysis_json for {canonical_code}")
         # +++ END NEW +++
 
         # --- Collect SKUs for Description Fetching ---
-        all_skus_for_descriptions = set()
-        if prediction.carried_top_products:
-            all_skus_for_descriptions.update(str(s).strip() for s in prediction.carried_top_products if str(s).strip())
-        if prediction.missing_top_products:
-             # missing_top_products is a list of dicts, so we extract the 'sku' value
-            for item in (prediction.missing_top_products or []):
-                if isinstance(item, dict) and item.get('sku'):
-                    all_skus_for_descriptions.add(str(item['sku']).strip())
+        # Each product list is parsed and its SKUs normalised (str + strip) once; the described lists below reuse them
+        carried_skus = [str(s).strip() for s in (_load_json_list(prediction.carried_top_products_json) or [])]
+        missing_skus = []
+        raw_missing_list_of_dicts = _load_json_list(prediction.missing_top_products_json) or []
+        if isinstance(raw_missing_list_of_dicts, list):
+            # missing_top_products is a list of dicts, so we extract the 'sku' value
+            for item_dict in raw_missing_list_of_dicts:
+                if isinstance(item_dict, dict) and 'sku' in item_dict:
+                    sku = str(item_dict.get('sku', '')).strip()
+                    if sku:
+                        missing_skus.append((sku, item_dict.get('placeholder_insight', 'Missing Top 30 Product')))
+        all_skus_for_descriptions = {sku for sku in carried_skus if sku}
+        all_skus_for_descriptions.update(sku for sku, _ in missing_skus)
 
         products_purchased_sku_list_cleaned = []
         if prediction.products_purchased:
             try:
-                parsed_list = json.loads(prediction.products_purchased)
+                parsed_list = _loads_json(prediction.products_purchased)
                 if isinstance(parsed_list, list):
                     products_purchased_sku_list_cleaned = [str(s).strip() for s in parsed_list if str(s).strip()]
             except json.JSONDecodeError:
                 logger.warning(f"Could not decode products_purchased for {canonical_code}")
         all_skus_for_descriptions.update(products_purchased_sku_list_cleaned)
 
+        recommended_skus = []
         if prediction.recommended_products_next_purchase_json:
             try:
-                recs_list_raw = json.loads(prediction.recommended_products_next_purchase_json)
+                recs_list_raw = _loads_json(prediction.recommended_products_next_purchase_json)
                 if isinstance(recs_list_raw, list):
                     for item_raw in recs_list_raw:
                         if isinstance(item_raw, dict) and item_raw.get("sku"):
-                            all_skus_for_descriptions.add(str(item_raw.get("sku")).strip())
+                            recommended_skus.append((str(item_raw.get("sku")).strip(), item_raw.get("reason", "Recommended")))
             except json.JSONDecodeError:
-                logger.warning(f"Could not decode recommended_products_next_purchase_json for SKU collection for {canonical_code}")
+                logger.warning(f"Could not decode recommended_products_next_purchase_json for {canonical_code}")
+        all_skus_for_descriptions.update(sku for sku, _ in recommended_skus)
         
-        stmt_monthly_aggregates = select(
-            Transaction.year, extract('month', Transaction.posting_date).label('month_val'),
-            Transaction.item_code, func.sum(Transaction.quantity).label('sum_quantity'),
-            func.sum(Transaction.revenue).label('sum_revenue')
-        ).where(
-            Transaction.canonical_code == canonical_code, Transaction.item_code.isnot(None), Transaction.item_code != ''
-        ).group_by(
-            Transaction.year, extract('month', Transaction.posting_date), Transaction.item_code
-        ).order_by(
-            Transaction.year.asc(), extract('month', Transaction.posting_date).asc(), Transaction.item_code
-        )
-        monthly_aggregate_results = db.session.execute(stmt_monthly_aggregates).fetchall()
-        for row in monthly_aggregate_results:
-            if row.item_code and str(row.item_code).strip():
-                all_skus_for_descriptions.add(str(row.item_code).strip())
-
-        master_sku_desc_map = {}
-        if all_skus_for_descriptions:
-            master_sku_desc_map = get_sku_description_map(list(all_skus_for_descriptions))
+        # On a product history cache hit the monthly aggregates are not needed at all; the cached entry carries
+        # the descriptions of the account's SKUs and only the prediction SKUs are looked up
+        product_history_cache_key = _product_history_cache_key(canonical_code)
+        cached_product_history = cache.get(product_history_cache_key) if product_history_cache_key else None
+        if cached_product_history is not None:
+            monthly_aggregate_results = []
+            master_sku_desc_map = dict(cached_product_history['sku_descriptions'])
+            undescribed_skus = all_skus_for_descriptions.difference(master_sku_desc_map)
+            if undescribed_skus:
+                master_sku_desc_map.update(get_sku_description_map(list(undescribed_skus)))
+        elif db.engine.dialect.name == 'postgresql':
+            monthly_aggregate_results, master_sku_desc_map = _fetch_monthly_aggregates_with_descriptions(
+                canonical_code, all_skus_for_descriptions
+            )
+        else:
+            stmt_monthly_aggregates = select(
+                Transaction.year, extract('month', Transaction.posting_date).label('month_val'),
+                Transaction.item_code, func.sum(Transaction.quantity).label('sum_quantity'),
+                func.sum(Transaction.revenue).label('sum_revenue')
+            ).where(
+                Transaction.canonical_code == canonical_code, Transaction.item_code.isnot(None), Transaction.item_code != ''
+            ).group_by(
+                Transaction.year, extract('month', Transaction.posting_date), Transaction.item_code
+            ).order_by(
+                Transaction.year.asc(), extract('month', Transaction.posting_date).asc(), Transaction.item_code
+            )
+            monthly_aggregate_results = db.session.execute(stmt_monthly_aggregates).fetchall()
+            for row in monthly_aggregate_results:
+                if row.item_code and str(row.item_code).strip():
+                    all_skus_for_descriptions.add(str(row.item_code).strip())
+
+            master_sku_desc_map = {}
+            if all_skus_for_descriptions:
+                master_sku_desc_map = get_sku_description_map(list(all_skus_for_descriptions))
 
         # --- Prepare prediction_data_dict (with fix for missing_top_products) ---
-        prediction_data_dict = {col.name: getattr(prediction, col.name) for col in prediction.__table__.columns}
+        prediction_data_dict = dict(prediction._mapping)
         date_fields = ['last_purchase_date', 'next_expected_purchase_date', 'rep_last_order_date', 'reminder_sent_at', 'notified_last_purchase_date']
         for field in date_fields:
             if prediction_data_dict.get(field) and isinstance(prediction_data_dict[field], (datetime, date)):
@@ -389,43 +628,16 @@ def get_account_details(canonical_code):
             elif prediction_data_dict.get(field) is not None:
                 prediction_data_dict[field] = None
         
-        prediction_data_dict['carried_top_products'] = [ {"sku": str(s).strip(), "description": master_sku_desc_map.get(str(s).strip(), "Description N/A")} for s in (prediction.carried_top_products or []) ]
-        
-        described_missing_list = []
-        raw_missing_list_of_dicts = prediction.missing_top_products or [] 
-        if isinstance(raw_missing_list_of_dicts, list):
-            for item_dict in raw_missing_list_of_dicts:
-                if isinstance(item_dict, dict) and 'sku' in item_dict:
-                    sku = str(item_dict.get('sku', '')).strip()
-                    if sku:
-                        described_missing_list.append({
-                            'sku': sku,
-                            'description': master_sku_desc_map.get(sku, "Description N/A"),
-                            'reason': item_dict.get('placeholder_insight', 'Missing Top 30 Product')
-                        })
-        prediction_data_dict['missing_top_products'] = described_missing_list
-        
-        described_products_purchased = []
-        if prediction.products_purchased:
-            try:
-                parsed_list = json.loads(prediction.products_purchased)
-                if isinstance(parsed_list, list):
-                    described_products_purchased = [ {"sku": str(s).strip(), "description": master_sku_desc_map.get(str(s).strip(), "Description N/A")} for s in parsed_list if str(s).strip() ]
-            except json.JSONDecodeError: pass
-        prediction_data_dict['products_purchased'] = described_products_purchased
-
-        described_recommended_products_for_growth_engine = []
-        raw_recommended_json = prediction_data_dict.get('recommended_products_next_purchase_json')
-        if raw_recommended_json:
-            try:
-                recs_list_raw = json.loads(raw_recommended_json)
-                if isinstance(recs_list_raw, list):
-                    for item_raw in recs_list_raw:
-                        if isinstance(item_raw, dict) and item_raw.get("sku"):
-                            sku_val = str(item_raw.get("sku")).strip()
-                            described_recommended_products_for_growth_engine.append({ "sku": sku_val, "description": master_sku_desc_map.get(sku_val, "Description N/A"), "reason": item_raw.get("reason", "Recommended") })
-            except json.JSONDecodeError:
-                logger.warning(f"Could not decode recommended_products_next_purchase_json for description: {canonical_code}")
+        prediction_data_dict['carried_top_products'] = [ {"sku": sku, "description": master_sku_desc_map.get(sku, "Description N/A")} for sku in carried_skus ]
+        prediction_data_dict['missing_top_products'] = [
+            {'sku': sku, 'description': master_sku_desc_map.get(sku, "Description N/A"), 'reason': reason}
+            for sku, reason in missing_skus
+        ]
+        prediction_data_dict['products_purchased'] = [ {"sku": sku, "description": master_sku_desc_map.get(sku, "Description N/A")} for sku in products_purchased_sku_list_cleaned ]
+        described_recommended_products_for_growth_engine = [
+            { "sku": sku, "description": master_sku_desc_map.get(sku, "Description N/A"), "reason": reason }
+            for sku, reason in recommended_skus
+        ]
 
         # --- Historical Summary & Analysis Data ---
         hist_summary_stmt = select( AccountHistoricalRevenue.year, AccountHistoricalRevenue.total_revenue.label('revenue'), AccountHistoricalRevenue.transaction_count.label('transactions') ).where(AccountHistoricalRevenue.canonical_code == canonical_code).order_by(AccountHistoricalRevenue.year.asc())
@@ -461,10 +673,10 @@ def get_account_details(canonical_code):
         revenue_history_data_dict = {"years": [str(h['year']) for h in historical_summary_list], "revenues": [h['revenue'] for h in historical_summary_list]}
         current_year = datetime.utcnow().year; previous_year = current_year - 1
         
-        def get_daily_timeline(target_year):
+        def get_daily_timelines(target_years):
             """
             Enhanced timeline with order details and distributor information.
-            Returns timeline points with drill-down details for tooltips.
+            Returns {year: timeline points} with drill-down details for tooltips; all years come from one query.
             """
             rows = db.session.execute(
                 select(
@@ -476,7 +688,7 @@ def get_account_details(canonical_code):
                 )
                 .where(
                     Transaction.canonical_code == canonical_code,
-                    extract('year', Transaction.posting_date) == target_year,
+                    extract('year', Transaction.posting_date).in_(target_years),
                     Transaction.distributor.isnot(None), 
                     Transaction.distributor != "",
                 )
@@ -488,11 +700,12 @@ def get_account_details(canonical_code):
                 .order_by(func.date(Transaction.posting_date))
             ).mappings().all()
 
-            timeline_points = {}
+            timeline_points_by_year = {target_year: {} for target_year in target_years}
             for row in rows:
                 date_key = row["purchase_date"]
                 distributor_clean = _clean_distributor(row["distributor"])
                 point_key = (date_key, distributor_clean)
+                timeline_points = timeline_points_by_year[date_key.year]
                 
                 if point_key not in timeline_points:
                     timeline_points[point_key] = {
@@ -511,10 +724,12 @@ def get_account_details(canonical_code):
                     "revenue": float(row["total_rev"] or 0.0)
                 })
             
-            return list(timeline_points.values())
+            return {target_year: list(points.values()) for target_year, points in timeline_points_by_year.items()}
 
-        cy_timeline_data_list = get_daily_timeline(current_year)
-        py_timeline_data_list = get_daily_timeline(previous_year)
+        # Both years in one round-trip instead of one query per year
+        timelines_by_year = get_daily_timelines([current_year, previous_year])
+        cy_timeline_data_list = timelines_by_year[current_year]
+        py_timeline_data_list = timelines_by_year[previous_year]
         
         # --- Data Freshness Indicator (Global Distributor Upload Tracking) ---
         distributor_uploads_query = select(
@@ -525,7 +740,13 @@ def get_account_details(canonical_code):
             Transaction.distributor != ""
         ).group_by(Transaction.distributor)
         
-        distributor_upload_rows = db.session.execute(distributor_uploads_query).all()
+        # Global (every account shows the same rows) and a full pass over transactions, so it is cached until the
+        # next load bumps the historical namespace version
+        distributor_uploads_cache_key = f"distributor_uploads:{historical_data_version()}"
+        distributor_upload_rows = cache.get(distributor_uploads_cache_key)
+        if distributor_upload_rows is None:
+            distributor_upload_rows = [tuple(row) for row in db.session.execute(distributor_uploads_query).all()]
+            cache.set(distributor_uploads_cache_key, distributor_upload_rows, timeout=HISTORICAL_CACHE_VERSION_TIMEOUT)
         
         # --- NEW: Add the distributor cadence map ---
         DISTRIBUTOR_CADENCE_MAP = {
@@ -556,34 +777,46 @@ def get_account_details(canonical_code):
                 "cadence": DISTRIBUTOR_CADENCE_MAP.get(clean_dist, 'unknown') # <-- ADD THIS LINE
             })
         
-        detailed_product_history = get_detailed_product_history_by_quarter( monthly_aggregate_results, master_sku_desc_map, TOP_30_SET, canonical_code )
-
-        # +++ MODIFICATION: Add is_top_30 flag to yearly product summary +++
-        yearly_product_aggregates_raw = defaultdict(lambda: defaultdict(lambda: {"total_quantity_year": 0, "total_revenue_year": 0.0}))
-        for row_monthly_agg in monthly_aggregate_results:
-            year_str = str(row_monthly_agg.year)
-            sku = str(row_monthly_agg.item_code).strip()
-            if sku:
-                yearly_product_aggregates_raw[year_str][sku]["total_quantity_year"] += int(row_monthly_agg.sum_quantity or 0)
-                yearly_product_aggregates_raw[year_str][sku]["total_revenue_year"] += float(row_monthly_agg.sum_revenue or 0.0)
-
-        yearly_product_summary_final = OrderedDict()
-        sorted_years_for_summary = sorted(yearly_product_aggregates_raw.keys(), key=int) 
-
-        for year_str in sorted_years_for_summary:
-            skus_data_for_year = yearly_product_aggregates_raw[year_str]
-            product_list_for_year_table = []
-            for sku, data in skus_data_for_year.items():
-                product_list_for_year_table.append({
-                    "sku": sku,
-                    "description": master_sku_desc_map.get(sku, "Description N/A"),
-                    "total_quantity_year": data["total_quantity_year"],
-                    "total_revenue_year": round(data["total_revenue_year"], 2),
-                    "is_top_30": sku in TOP_30_SET  # <-- THE NEW LINE
-                })
-            product_list_for_year_table.sort(key=lambda x: x["total_revenue_year"], reverse=True)
-            yearly_product_summary_final[year_str] = product_list_for_year_table
-        # +++ END MODIFICATION +++
+        if cached_product_history is not None:
+            detailed_product_history = cached_product_history['detailed_product_history']
+            yearly_product_summary_final = cached_product_history['yearly_product_summary']
+        else:
+            detailed_product_history = get_detailed_product_history_by_quarter( monthly_aggregate_results, master_sku_desc_map, TOP_30_SET, canonical_code )
+
+            # +++ MODIFICATION: Add is_top_30 flag to yearly product summary +++
+            yearly_product_aggregates_raw = defaultdict(lambda: defaultdict(lambda: {"total_quantity_year": 0, "total_revenue_year": 0.0}))
+            for row_monthly_agg in monthly_aggregate_results:
+                year_str = str(row_monthly_agg.year)
+                sku = str(row_monthly_agg.item_code).strip()
+                if sku:
+                    yearly_product_aggregates_raw[year_str][sku]["total_quantity_year"] += int(row_monthly_agg.sum_quantity or 0)
+                    yearly_product_aggregates_raw[year_str][sku]["total_revenue_year"] += float(row_monthly_agg.sum_revenue or 0.0)
+
+            yearly_product_summary_final = OrderedDict()
+            sorted_years_for_summary = sorted(yearly_product_aggregates_raw.keys(), key=int) 
+
+            for year_str in sorted_years_for_summary:
+                skus_data_for_year = yearly_product_aggregates_raw[year_str]
+                product_list_for_year_table = []
+                for sku, data in skus_data_for_year.items():
+                    product_list_for_year_table.append({
+                        "sku": sku,
+                        "description": master_sku_desc_map.get(sku, "Description N/A"),
+                        "total_quantity_year": data["total_quantity_year"],
+                        "total_revenue_year": round(data["total_revenue_year"], 2),
+                        "is_top_30": sku in TOP_30_SET  # <-- THE NEW LINE
+                    })
+                product_list_for_year_table.sort(key=operator.itemgetter("total_revenue_year"), reverse=True)
+                yearly_product_summary_final[year_str] = product_list_for_year_table
+            # +++ END MODIFICATION +++
+
+            if product_history_cache_key:
+                account_skus = {str(row.item_code).strip() for row in monthly_aggregate_results}
+                cache.set(product_history_cache_key, {
+                    "detailed_product_history": detailed_product_history,
+                    "yearly_product_summary": yearly_product_summary_final,
+                    "sku_descriptions": {sku: master_sku_desc_map.get(sku, "Description N/A") for sku in account_skus if sku},
+                }, timeout=PRODUCT_HISTORY_CACHE_TIMEOUT)
 
         # +++ Add is_top_30 flag to rolling SKU analysis +++
         for sku_item in rolling_sku_analysis_list:
@@ -5,7 +5,7 @@ import hmac
 import time
 import threading
 from functools import wraps
-from flask import Blueprint, request, jsonify, current_app, abort, Flask
+from flask import Blueprint, request, jsonify, current_app, abort
 import logging
 import pandas as pd
 import numpy as np
@@ -21,7 +21,8 @@ from sqlalchemy.dialects.postgresql import insert as pg_insert
 try:
     from pipeline import (recalculate_predictions_and_metrics, clean_data, 
                           aggregate_item_codes, safe_json_dumps,
-                          generate_canonical_code, get_base_card_code, _normalize_upc)
+                          generate_canonical_code, get_base_card_code, _normalize_upc,
+                          get_transaction_hash_constructor, duplicate_key_hashes)
 except ImportError as e:
     logging.error(f"CRITICAL: Could not import required pipeline/mapper functions: {e}", exc_info=True)
     def recalculate_predictions_and_metrics(*args, **kwargs): logging.error("Fallback: recalc not imported!"); return pd.DataFrame()
@@ -30,8 +31,14 @@ except ImportError as e:
     def safe_json_dumps(data, *args, **kwargs): logging.warning("Fallback: safe_json_dumps not imported!"); return None
     def generate_canonical_code(*args, **kwargs): logging.error("Fallback: generate_canonical_code not imported!"); return None
     def get_base_card_code(*args, **kwargs): logging.error("Fallback: get_base_card_code not imported!"); return None
+    def get_transaction_hash_constructor(*args, **kwargs): return hashlib.sha256
+    def duplicate_key_hashes(df, cols):
+        key = df[cols].apply(lambda s: s + 0.0 if pd.api.types.is_float_dtype(s) else s)  # -0.0 -> 0.0, as in pipeline
+        return pd.util.hash_pandas_object(key, index=False).to_numpy()
 
-from models import db, AccountPrediction, AccountHistoricalRevenue, Transaction 
+from models import db, AccountPrediction, AccountHistoricalRevenue, Transaction, refresh_sales_rep_rollup 
+from extensions import clear_dashboard_cache, clear_historical_cache
+from routes.api_routes_strategic import clear_sku_description_cache
 
 logger = logging.getLogger(__name__)
 webhook_bp = Blueprint('webhook', __name__, url_prefix='/webhook')
@@ -148,16 +155,23 @@ def require_hmac_signature(f):
 
 from sqlalchemy import func, extract
 
-def process_file_async(app_instance_config, filepath):
+def clear_cached_views():
+    """
+    Drops the cached views that read uploaded data: rep list / manager overview, the historical views
+    (and the distributor upload stamps keyed by their version) and SKU descriptions. Must run in the
+    serving app's context, since Flask-Caching keeps one backend per app.
+    """
+    clear_dashboard_cache()
+    clear_historical_cache()
+    clear_sku_description_cache()
+
+def process_file_async(app, filepath):
     thread_id = threading.get_ident()
     logger.info(f"[Thread:{thread_id}] Starting V9 (Final Corrected) processing for file: {filepath}")
     
-    # Create a new app instance for the thread to have its own context
-    thread_app = Flask(__name__)
-    thread_app.config.update(app_instance_config)
-    db.init_app(thread_app)
-
-    with thread_app.app_context():
+    # Push a context of the serving app itself (not a copy): Flask-Caching keeps one backend per app,
+    # so the cache clears at the end must go through this app to reach what its views read
+    with app.app_context():
         # Use a single session and transaction for the entire operation
         session = db.session
         try:
@@ -284,13 +298,24 @@ def process_file_async(app_instance_config, filepath):
                 if col not in cleaned_weekly_df.columns: cleaned_weekly_df[col] = None
 
             cleaned_weekly_df.sort_values(by=duplicate_check_cols, inplace=True, na_position='first')
-            cleaned_weekly_df['duplicate_rank'] = cleaned_weekly_df.groupby(duplicate_check_cols).cumcount()
+            # Group on one uint64 per row instead of a 5-column groupby. groupby(cols) drops rows with a
+            # missing key (NaN rank, float column); that is kept so hashes match reprocess_history.py,
+            # which hashes the key with the same helper (-0.0 and 0.0 are one key, as in groupby)
+            key_hash = duplicate_key_hashes(cleaned_weekly_df, duplicate_check_cols)
+            duplicate_rank = cleaned_weekly_df.groupby(key_hash, sort=False).cumcount()
+            missing_key = cleaned_weekly_df[duplicate_check_cols].isna().any(axis=1)
+            if missing_key.any():
+                duplicate_rank = duplicate_rank.astype(float).mask(missing_key)
+            cleaned_weekly_df['duplicate_rank'] = duplicate_rank
+
+            # Same algorithm (TRANSACTION_HASH_ALGO) as reprocess_history.py / backfill_hashes.py
+            hash_constructor = get_transaction_hash_constructor()
 
             def generate_hash(row):
                 unique_string = (f"{row.get('canonical_code', '')}|{row.get('posting_date', '')}|"
                                  f"{row.get('item_code', '')}|{row.get('revenue', '')}|{row.get('quantity', '')}|"
                                  f"{row.get('duplicate_rank', '')}")
-                return hashlib.sha256(unique_string.encode()).hexdigest()
+                return hash_constructor(unique_string.encode()).hexdigest()
 
             cleaned_weekly_df['transaction_hash'] = cleaned_weekly_df.apply(generate_hash, axis=1)
 
@@ -405,6 +430,14 @@ def process_file_async(app_instance_config, filepath):
 
             session.commit()
             logger.info(f"[Thread:{thread_id}] Processing complete and committed for {filepath}")
+            # Rebuild the per-rep yearly rollup behind /sales_rep_performance (PostgreSQL only)
+            try:
+                if refresh_sales_rep_rollup(session):
+                    session.commit()
+            except Exception as rollup_err:
+                session.rollback()
+                logger.warning(f"[Thread:{thread_id}] Could not refresh sales rep yearly rollup: {rollup_err}")
+            clear_cached_views()
                         # ============================================
             # ADD THIS VERIFICATION SECTION RIGHT HERE
             # ============================================
@@ -482,7 +515,7 @@ def receive_sales_file():
             # start background processing
             thread = threading.Thread(
                 target=process_file_async, 
-                args=(current_app.config, file_path),
+                args=(current_app._get_current_object(), file_path),
                 daemon=True
             )
             thread.start()
@@ -519,7 +552,7 @@ def receive_sales_file():
             # start background processing
             thread = threading.Thread(
                 target=process_file_async, 
-                args=(current_app.config, temp_filepath),
+                args=(current_app._get_current_object(), temp_filepath),
                 daemon=True
             )
             thread.start()
@@ -904,6 +904,22 @@ def validate_mapping(mapping, df, exceptions_file='card_code_exceptions.csv'):
     
     return conflicts
 
+def _parsed_products_json(products_json):
+    """
+    Value for account_historical_revenues.yearly_products_parsed given the yearly_products_json text:
+    the same list re-encoded, or None when the text is missing or not a JSON list of strings.
+    """
+    if not products_json:
+        return None
+    try:
+        products = json.loads(products_json)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(products, list) or not all(isinstance(p, str) for p in products):
+        return None
+    return json.dumps(products)
+
+
 def apply_mapping_to_database(mapping):
     """Apply the mapping to update the database with proper data consolidation."""
     import json
@@ -1141,9 +1157,9 @@ def apply_mapping_to_database(mapping):
                         # Insert new consolidated record
                         insert_historical = text("""
                             INSERT INTO account_historical_revenues
-                            (card_code, year, total_revenue, transaction_count, name, sales_rep, distributor, yearly_products_json)
+                            (card_code, year, total_revenue, transaction_count, name, sales_rep, distributor, yearly_products_json, yearly_products_parsed)
                             VALUES
-                            (:card_code, :year, :total_revenue, :transaction_count, :name, :sales_rep, :distributor, :yearly_products_json)
+                            (:card_code, :year, :total_revenue, :transaction_count, :name, :sales_rep, :distributor, :yearly_products_json, :yearly_products_parsed)
                         """)
                         
                         conn.execute(insert_historical, {
@@ -1154,7 +1170,9 @@ def apply_mapping_to_database(mapping):
                             "name": agg_data[2],
                             "sales_rep": agg_data[3],
                             "distributor": agg_data[4],
-                            "yearly_products_json": agg_data[5]
+                            "yearly_products_json": agg_data[5],
+                            # Keep the parsed copy the history endpoint reads in step with the text (NULL if it is not a valid list)
+                            "yearly_products_parsed": _parsed_products_json(agg_data[5])
                         })
                         logger.info(f"Inserted consolidated record for {canonical}, year {year}")
                     
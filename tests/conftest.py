@@ -0,0 +1,6 @@
+import os
+import sys
+
+# config.py refuses to import without a database URL; the tests bring their own SQLite file per app
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,52 @@
+import pytest
+from flask import Flask
+
+from extensions import cache
+from models import db, AccountHistoricalRevenue, AccountPrediction
+from routes.api_routes_historical import api_historical_bp
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', CACHE_TYPE='NullCache')
+    db.init_app(app)
+    cache.init_app(app)
+    app.register_blueprint(api_historical_bp)
+    with app.app_context():
+        db.create_all()
+        db.session.add(AccountPrediction(canonical_code='A_1', name='a', account_total=1))
+        parsed = AccountHistoricalRevenue(canonical_code='A_1', year=2022, total_revenue=1.0, transaction_count=1)
+        parsed.set_yearly_products(['b', 'a'])
+        db.session.add(parsed)
+        # Written the way store_normalization.py / older scripts did: only the JSON text, no parsed list
+        db.session.add(AccountHistoricalRevenue(canonical_code='A_1', year=2023, total_revenue=2.0, transaction_count=1,
+                                                yearly_products_json='["c", "b"]'))
+        db.session.add(AccountHistoricalRevenue(canonical_code='A_1', year=2024, total_revenue=3.0, transaction_count=1,
+                                                yearly_products_json=''))
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+
+EXPECTED_PRODUCTS = {
+    '2022': {'all': ['a', 'b'], 'new': ['a', 'b'], 'reordered': []},
+    '2023': {'all': ['b', 'c'], 'new': ['c'], 'reordered': ['b']},
+    '2024': {'all': [], 'new': [], 'reordered': []},
+}
+
+
+def test_json_only_row_lists_its_products(app):
+    response = app.test_client().get('/api/sales-manager/accounts/A_1/history')
+    assert response.status_code == 200
+    assert response.get_json()['products_by_year'] == EXPECTED_PRODUCTS
+
+
+def test_json_only_row_lists_its_products_on_postgresql_path(app, monkeypatch):
+    # On PostgreSQL the products are categorized in SQL from the parsed column only; an account with a
+    # text-only row must take the Python path instead (which also runs on SQLite, so no server is needed)
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, 'name', 'postgresql')
+        response = app.test_client().get('/api/sales-manager/accounts/A_1/history')
+    assert response.status_code == 200
+    assert response.get_json()['products_by_year'] == EXPECTED_PRODUCTS
@@ -0,0 +1,61 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import reprocess_history
+from pipeline import duplicate_key_hashes
+
+DUPLICATE_CHECK_COLS = ['canonical_code', 'posting_date', 'item_code', 'revenue', 'quantity']
+
+
+def _baseline_hashes(df):
+    """The original row-wise path: 5-column sort, groupby cumcount, f-string key per row (generate_hash)."""
+    df = df.copy()
+    df['posting_date'] = pd.to_datetime(df['posting_date'], errors='coerce')
+    for col in ['item_code', 'revenue', 'quantity']:
+        df[col] = pd.to_numeric(df.get(col), errors='coerce').fillna(0)
+    df.sort_values(by=DUPLICATE_CHECK_COLS, inplace=True, na_position='first')
+    df['duplicate_rank'] = df.groupby(DUPLICATE_CHECK_COLS).cumcount()
+
+    def generate_hash(row):
+        unique_string = (f"{row.get('canonical_code', '')}|{row.get('posting_date', '')}|"
+                         f"{row.get('item_code', '')}|{row.get('revenue', '')}|{row.get('quantity', '')}|"
+                         f"{row.get('duplicate_rank', '')}")
+        return hashlib.sha256(unique_string.encode()).hexdigest()
+
+    return df.apply(generate_hash, axis=1).sort_index()
+
+
+def _frame(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        # wide enough that the split -0.0 / 0.0 groups rarely sit next to each other in hash order
+        'canonical_code': rng.choice([f'A_{i}' for i in range(50)], n),
+        'posting_date': rng.choice(pd.date_range('2024-01-01', periods=30), n),
+        'item_code': rng.choice([111, 222, 333], n),
+        # -0.0 and 0.0 are one key for sort/groupby but stringify differently ('-0.0' vs '0.0')
+        'revenue': rng.choice([12.5, 0.0, -0.0], n),
+        'quantity': rng.choice([1.0, -0.0, 0.0, 2.0], n),
+    })
+
+
+@pytest.fixture(autouse=True)
+def _sha256(monkeypatch):
+    monkeypatch.setattr(reprocess_history, 'TRANSACTION_HASH_ALGO', 'sha256')
+    monkeypatch.setattr(reprocess_history, 'INGEST_WORKERS', 1)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_hashes_match_row_wise_generate_hash_with_signed_zeros(seed):
+    df = _frame(3000, seed)
+    expected = _baseline_hashes(df)
+    result = reprocess_history._add_transaction_hashes(df.copy())
+    assert pd.Series(list(result['transaction_hash']), index=result.index).sort_index().equals(expected)
+
+
+def test_signed_zero_keys_share_a_hash():
+    df = pd.DataFrame({'code': ['x', 'x', 'x'], 'revenue': [0.0, -0.0, 0.0]})
+    hashes = duplicate_key_hashes(df, ['code', 'revenue'])
+    assert hashes[0] == hashes[1] == hashes[2]
@@ -0,0 +1,83 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from extensions import cache, FLASK_CACHING_AVAILABLE
+from models import db, AccountHistoricalRevenue
+import routes.webhook_routes as webhook_routes
+from routes.webhook_routes import webhook_bp
+from routes.api_routes_historical import api_historical_bp
+
+pytestmark = pytest.mark.skipif(not FLASK_CACHING_AVAILABLE, reason="Flask-Caching not installed")
+
+HMAC_SECRET = 'test-secret'
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Same wiring as create_app(), with the default per-process SimpleCache and a SQLite file the worker thread can see
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        CACHE_TYPE='SimpleCache',
+        WEBHOOK_HMAC_SECRET=HMAC_SECRET,
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+    )
+    db.init_app(app)
+    cache.init_app(app)
+    app.register_blueprint(webhook_bp)
+    app.register_blueprint(api_historical_bp)
+    with app.app_context():
+        db.create_all()
+        db.session.add(AccountHistoricalRevenue(canonical_code='A_1', year=2023, total_revenue=5.0, transaction_count=1, sales_rep='r1'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def _post_signed(client, file_path):
+    body = json.dumps({'file_path': file_path}).encode('utf-8')
+    ts = str(int(time.time()))
+    sig = hmac.new(HMAC_SECRET.encode('utf-8'), ts.encode('utf-8') + b'.' + body, hashlib.sha256).hexdigest()
+    return client.post('/webhook/sales', data=body, content_type='application/json',
+                       headers={'X-Signature': sig, 'X-Request-Timestamp': ts})
+
+
+def test_webhook_upload_invalidates_serving_app_cache(app, tmp_path, monkeypatch):
+    client = app.test_client()
+    assert client.get('/api/sales-manager/years').get_json() == {'years': [2023]}
+
+    # The CSV ingest upserts with PostgreSQL's ON CONFLICT, so it cannot run on SQLite. Stand in for it with a
+    # direct write, but keep what the route and the worker do around it: the app handed to the thread, its
+    # context, and the cache clears after the commit.
+    def fake_process_file_async(app_obj, filepath):
+        with app_obj.app_context():
+            db.session.add(AccountHistoricalRevenue(canonical_code='A_1', year=2024, total_revenue=7.0, transaction_count=1, sales_rep='r1'))
+            db.session.commit()
+            webhook_routes.clear_cached_views()
+    monkeypatch.setattr(webhook_routes, 'process_file_async', fake_process_file_async)
+
+    upload = tmp_path / 'upload.csv'
+    upload.write_text("POSTINGDATE\n")
+    running = set(threading.enumerate())
+    assert _post_signed(client, str(upload)).status_code == 202
+    for thread in set(threading.enumerate()) - running:
+        thread.join(timeout=30)
+
+    assert client.get('/api/sales-manager/years').get_json() == {'years': [2023, 2024]}
+
+
+def test_stale_until_cleared(app):
+    # Control for the test above: without the webhook's clear the cached view keeps its old answer
+    client = app.test_client()
+    assert client.get('/api/sales-manager/years').get_json() == {'years': [2023]}
+    with app.app_context():
+        db.session.add(AccountHistoricalRevenue(canonical_code='A_1', year=2024, total_revenue=7.0, transaction_count=1, sales_rep='r1'))
+        db.session.commit()
+    assert client.get('/api/sales-manager/years').get_json() == {'years': [2023]}